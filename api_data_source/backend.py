@@ -1,16 +1,44 @@
-import io
+import functools
+import gzip
+import hashlib
+from datetime import date, timedelta
+from typing import Iterable, Iterator, NamedTuple, Optional, Union
 
 import numpy as np
 import pandas as pd
 from fastapi import responses
 
-RND = np.random.default_rng(np.random.PCG64(seed=0))
+# base seed of the generated data, combined with the requested date so that
+# every date always returns the same data
+SEED = 0
+# serialized payloads kept in memory, one per (date, format)
+PAYLOAD_CACHE_SIZE = 2048
+# rows serialized and sent at a time by streaming responses
+CHUNK_ROWS = 256
+# longest range served by the range endpoints
+MAX_RANGE_DAYS = 366
+# cached payloads are compressed once, at the best compression level
+GZIP_LEVEL = 9
 
+MEDIA_TYPES = {"csv": "text/csv", "json": "application/json"}
 
-def generate_dataframe(requested_date: str) -> pd.DataFrame:
+
+class Payload(NamedTuple):
+    body: bytes
+    etag: str
+    gzip_body: bytes
+
+    @property
+    def gzip_etag(self) -> str:
+        # each encoding of a resource needs its own strong entity tag
+        return f'{self.etag[:-1]}-gzip"'
+
+
+def generate_dataframe(requested_date: Union[str, date]) -> pd.DataFrame:
     start_date = pd.Timestamp(requested_date, tz="UTC")
     end_date = start_date + pd.Timedelta(days=1)
     aggregation = "5min"
+    rnd = np.random.default_rng([SEED, start_date.toordinal()])
 
     naive_timestamps = pd.date_range(
         start=start_date,
@@ -21,28 +49,142 @@ def generate_dataframe(requested_date: str) -> pd.DataFrame:
     return pd.DataFrame(
         data={
             "Naive_Timestamp ": naive_timestamps,
-            " Variable": RND.integers(0, 1000, naive_timestamps.size),
-            "value": RND.random(naive_timestamps.size) * 100 - 50,
+            " Variable": rnd.integers(0, 1000, naive_timestamps.size),
+            "value": rnd.random(naive_timestamps.size) * 100 - 50,
             "Last Modified utc": pd.Timestamp(requested_date, tz="UTC"),
         }
     )
 
 
-def generate_csv_response(requested_date: str) -> responses.StreamingResponse:
-    df = generate_dataframe(requested_date)
-    stream = io.StringIO()
-    df.to_csv(stream, index=False)
+def get_payload(requested_date: Union[str, date], data_format: str) -> Payload:
+    """Returns the serialized data of a date in `csv` or `json`, from the cache
+    when it was requested before."""
+    if data_format not in MEDIA_TYPES:
+        raise ValueError(f"Unsupported data format: `{data_format}`")
+    return _serialize(pd.Timestamp(requested_date).date().isoformat(), data_format)
+
+
+def iter_csv_chunks(dates: Iterable[Union[str, date]]) -> Iterator[bytes]:
+    """Yields the CSV data of consecutive dates, `CHUNK_ROWS` rows at a time.
+
+    Only the data of one date is in memory at any time. The output is the
+    concatenation of the single date responses, with a single header.
+    """
+    yield _csv_header()
+    for requested_date in dates:
+        for chunk in _iter_row_chunks(generate_dataframe(requested_date)):
+            yield chunk.to_csv(header=False, index=False).encode()
+
+
+def iter_json_chunks(dates: Iterable[Union[str, date]]) -> Iterator[bytes]:
+    """Yields a JSON array of the records of consecutive dates, `CHUNK_ROWS`
+    records at a time."""
+    separator = b"["
+    for requested_date in dates:
+        for chunk in _iter_row_chunks(generate_dataframe(requested_date)):
+            # records of the chunk without the enclosing brackets
+            yield separator + chunk.to_json(orient="records")[1:-1].encode()
+            separator = b","
+    yield b"[]" if separator == b"[" else b"]"
+
+
+def _iter_row_chunks(df: pd.DataFrame) -> Iterator[pd.DataFrame]:
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start : start + CHUNK_ROWS]
+
+
+@functools.lru_cache(maxsize=1)
+def _csv_header() -> bytes:
+    return generate_dataframe("2000-01-01").head(0).to_csv(index=False).encode()
+
+
+@functools.lru_cache(maxsize=PAYLOAD_CACHE_SIZE)
+def _serialize(requested_date: str, data_format: str) -> Payload:
+    # a single date is small, it is built with the streaming serializers and
+    # kept whole in the cache
+    chunks = iter_csv_chunks if data_format == "csv" else iter_json_chunks
+    body = b"".join(chunks([requested_date]))
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    return Payload(body, etag, gzip.compress(body, GZIP_LEVEL))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Returns whether an `If-None-Match` header matches an entity tag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # weak comparison, as required for If-None-Match
+    tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag in tags
+
+
+def _payload_response(
+    requested_date: Union[str, date],
+    data_format: str,
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+) -> responses.Response:
+    payload = get_payload(requested_date, data_format)
+    headers = {"Vary": "Accept-Encoding"}
+    body, headers["ETag"] = payload.body, payload.etag
+    # sent pre-compressed, the gzip middleware leaves encoded responses alone
+    if accept_encoding and "gzip" in accept_encoding:
+        body, headers["ETag"] = payload.gzip_body, payload.gzip_etag
+        headers["Content-Encoding"] = "gzip"
+    if etag_matches(if_none_match, headers["ETag"]):
+        return responses.Response(status_code=304, headers=headers)
+    return responses.Response(body, media_type=MEDIA_TYPES[data_format], headers=headers)
+
+
+def generate_csv_response(
+    requested_date: Union[str, date],
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+) -> responses.Response:
+    response = _payload_response(requested_date, "csv", if_none_match, accept_encoding)
+    response.headers["Content-Disposition"] = f"attachment; filename={requested_date}.csv"
+    return response
+
+
+def generate_json_response(
+    requested_date: Union[str, date],
+    if_none_match: Optional[str] = None,
+    accept_encoding: Optional[str] = None,
+) -> responses.Response:
+    return _payload_response(requested_date, "json", if_none_match, accept_encoding)
+
+
+def iter_dates(from_date: date, to_date: date) -> Iterator[date]:
+    """Yields the dates from `from_date` to `to_date`, inclusive.
+
+    Raises:
+        ValueError: raised when the range is empty or longer than MAX_RANGE_DAYS
+    """
+    days = (to_date - from_date).days + 1
+    if days < 1:
+        raise ValueError("`from` date must not be after `to` date")
+    if days > MAX_RANGE_DAYS:
+        raise ValueError(f"range must not be longer than {MAX_RANGE_DAYS} days")
+    return (from_date + timedelta(days=i) for i in range(days))
+
+
+def generate_csv_range_response(
+    from_date: date, to_date: date
+) -> responses.StreamingResponse:
     response = responses.StreamingResponse(
-        content=iter([stream.getvalue()]),
-        media_type="text/csv",
+        iter_csv_chunks(iter_dates(from_date, to_date)), media_type=MEDIA_TYPES["csv"]
+    )
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename={from_date}_{to_date}.csv"
     )
-    response.headers["Content-Disposition"] = f"attachment; filename={requested_date}.csv"
-    response.headers["Content-Type"] = "text/csv"
     return response
 
 
-def generate_json_response(requested_date: str) -> responses.Response:
-    df = generate_dataframe(requested_date)
-    return responses.Response(
-        df.to_json(orient="records"), media_type="application/json"
+def generate_json_range_response(
+    from_date: date, to_date: date
+) -> responses.StreamingResponse:
+    return responses.StreamingResponse(
+        iter_json_chunks(iter_dates(from_date, to_date)),
+        media_type=MEDIA_TYPES["json"],
     )
@@ -1,17 +1,29 @@
 from datetime import date
-from typing import Any, Dict, Union
+from typing import Any, Dict, Optional, Union
 
 import uvicorn
-from fastapi import FastAPI, responses
+from fastapi import APIRouter, FastAPI, Header, HTTPException, Query, responses
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.openapi.utils import get_openapi
 
-from api_data_source.backend import generate_csv_response, generate_json_response
+from api_data_source.backend import (
+    generate_csv_range_response,
+    generate_csv_response,
+    generate_json_range_response,
+    generate_json_response,
+    iter_dates,
+)
 from api_data_source.log import configure_logging
-from api_data_source.middleware import BlockHosts
+from api_data_source.middleware import BlockHosts, LoadProfile
 
-app = FastAPI()
+# streamed responses are compressed on the fly, smaller ones are sent as is
+GZIP_MINIMUM_SIZE = 1000
+GZIP_LEVEL = 1
 
-def custom_openapi() -> Dict[str, Any]:
+router = APIRouter()
+
+
+def custom_openapi(app: FastAPI) -> Dict[str, Any]:
     if app.openapi_schema:
         return app.openapi_schema
     
@@ -29,6 +41,8 @@ This API Data Source provides a range of weather model data can be provided in a
 
 - The `requested_date` format: `YYYY-MM-DD`
 
+- Ranges of dates are streamed by `/renewables/windgen.csv` and `/renewables/solargen.json` with `from` and `to` parameters (`YYYY-MM-DD`, inclusive, at most 366 days)
+
 - Valid `api_key:ADU8S67Ddy!d7f?`
 
 
@@ -52,29 +66,80 @@ This API Data Source provides a range of weather model data can be provided in a
     return app.openapi_schema
 
 
-app.openapi = custom_openapi
-app.add_middleware(BlockHosts)
-
-
-@app.get("/status", tags=["Health Check"])
+@router.get("/status", tags=["Health Check"])
 def status():
     return {"status": "ok"}
 
 
-@app.get("/{requested_date}/renewables/windgen.csv", tags=["Wind"])
+@router.get("/{requested_date}/renewables/windgen.csv", tags=["Wind"])
 async def wind_generation(
     api_key: Union[str, None],
     requested_date: Union[date, None],
-) -> responses.StreamingResponse:
-    return generate_csv_response(requested_date)
+    if_none_match: Union[str, None] = Header(default=None),
+    accept_encoding: Union[str, None] = Header(default=None),
+) -> responses.Response:
+    return generate_csv_response(requested_date, if_none_match, accept_encoding)
 
 
-@app.get("/{requested_date}/renewables/solargen.json", tags=["Solar"])
+@router.get("/{requested_date}/renewables/solargen.json", tags=["Solar"])
 async def solar_generation(
     api_key: Union[str, None],
     requested_date: Union[date, None],
+    if_none_match: Union[str, None] = Header(default=None),
+    accept_encoding: Union[str, None] = Header(default=None),
 ) -> responses.Response:
-    return generate_json_response(requested_date)
+    return generate_json_response(requested_date, if_none_match, accept_encoding)
+
+
+@router.get("/renewables/windgen.csv", tags=["Wind"])
+async def wind_generation_range(
+    api_key: Union[str, None],
+    from_date: date = Query(alias="from"),
+    to_date: date = Query(alias="to"),
+) -> responses.StreamingResponse:
+    _validate_range(from_date, to_date)
+    return generate_csv_range_response(from_date, to_date)
+
+
+@router.get("/renewables/solargen.json", tags=["Solar"])
+async def solar_generation_range(
+    api_key: Union[str, None],
+    from_date: date = Query(alias="from"),
+    to_date: date = Query(alias="to"),
+) -> responses.StreamingResponse:
+    _validate_range(from_date, to_date)
+    return generate_json_range_response(from_date, to_date)
+
+
+def _validate_range(from_date: date, to_date: date) -> None:
+    try:
+        iter_dates(from_date, to_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+
+
+def create_app(
+    throttle_rate: Optional[float] = None, load: Optional[LoadProfile] = None
+) -> FastAPI:
+    """Returns the api, `throttle_rate` is the share of requests answered with 429
+    (defaults to the `API_THROTTLE_RATE` environment variable or 0.19) and `load`
+    the latency, faults and concurrency cap of the api (defaults to the
+    `LoadProfile.from_env` environment variables, no load)."""
+    app = FastAPI()
+    app.include_router(router)
+    app.openapi = lambda: custom_openapi(app)
+    # compresses responses of clients sending `Accept-Encoding: gzip`, cached
+    # payloads of single dates are compressed in advance
+    app.add_middleware(
+        GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE, compresslevel=GZIP_LEVEL
+    )
+    # outermost, rejected requests are not compressed and faults such as
+    # truncated bodies apply to the bytes sent on the wire
+    app.add_middleware(BlockHosts, throttle_rate=throttle_rate, load=load)
+    return app
+
+
+app = create_app()
 
 
 if __name__ == "__main__":
@@ -1,38 +1,225 @@
-from fastapi.requests import Request
+import asyncio
+import math
+import os
+from dataclasses import dataclass
+from random import Random
+from typing import Optional
+
 from fastapi.responses import Response
-from starlette.middleware.base import (BaseHTTPMiddleware,
-                                       RequestResponseEndpoint)
-from starlette.types import ASGIApp
-from random import randrange
+from starlette.datastructures import QueryParams
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# share of authorized requests answered with 429, overridden by the
+# API_THROTTLE_RATE environment variable (0 disables throttling)
+THROTTLE_RATE = 0.19
+# endpoints that are neither authenticated, throttled nor slowed down
+PUBLIC_PATHS = ("/status", "/openapi.json", "/docs")
+NOT_SO_SAFE_API_KEY = "ADU8S67Ddy!d7f?"
+
+# distributions of the latency added before a request is handled
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+# statuses of the injected server errors
+ERROR_STATUSES = (500, 502, 503, 504)
+# dripped responses are sent in chunks of this size, one per `drip_delay_ms`
+DRIP_CHUNK_BYTES = 1024
+
+
+def get_throttle_rate() -> float:
+    return float(os.getenv("API_THROTTLE_RATE", THROTTLE_RATE))
+
+
+def _get_env(name: str, default, cast=float):
+    value = os.getenv(name)
+    return default if value is None or value == "" else cast(value)
+
+
+@dataclass(frozen=True)
+class LoadProfile:
+    """Behavior of the api under load, to test clients against a provider that
+    is slow, fails and limits concurrency. Every fault is disabled by default.
+
+    Attributes:
+        latency_ms (float): Mean latency added before handling a request
+        latency_distribution (str): Distribution of the latency: constant,
+            uniform (between 0 and twice the mean), exponential or lognormal
+        latency_sigma (float): Shape of the lognormal distribution, the p99
+            latency is about 5 times the mean with the default of 1
+        error_rate (float): Share of requests answered with a 5xx status
+        truncate_rate (float): Share of responses whose connection is closed
+            halfway through the body
+        drip_rate (float): Share of responses sent slowly, in chunks of
+            DRIP_CHUNK_BYTES
+        drip_delay_ms (float): Delay between the chunks of dripped responses
+        max_concurrency (int): Requests handled at the same time, requests
+            above it are answered with 429. Unlimited when not set
+        seed (int): Seed of the random faults, for reproducible benchmarks
+    """
+
+    latency_ms: float = 0.0
+    latency_distribution: str = "constant"
+    latency_sigma: float = 1.0
+    error_rate: float = 0.0
+    truncate_rate: float = 0.0
+    drip_rate: float = 0.0
+    drip_delay_ms: float = 20.0
+    max_concurrency: Optional[int] = None
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        if self.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(
+                f"unsupported latency distribution: `{self.latency_distribution}`"
+            )
+        if self.latency_ms < 0 or self.latency_sigma <= 0 or self.drip_delay_ms < 0:
+            raise ValueError("latencies and delays must be positive")
+        rates = (self.error_rate, self.truncate_rate, self.drip_rate)
+        if not all(0 <= rate <= 1 for rate in rates) or sum(rates) > 1:
+            raise ValueError(f"fault rates must be within [0, 1] in total: {rates}")
+        if self.max_concurrency is not None and self.max_concurrency < 1:
+            raise ValueError("max concurrency must be at least 1")
 
+    @classmethod
+    def from_env(cls) -> "LoadProfile":
+        """Returns the profile set by the API_LATENCY_MS, API_LATENCY_DISTRIBUTION,
+        API_LATENCY_SIGMA, API_ERROR_RATE, API_TRUNCATE_RATE, API_DRIP_RATE,
+        API_DRIP_DELAY_MS, API_MAX_CONCURRENCY and API_LOAD_SEED environment
+        variables, defaults for the ones that are not set."""
+        return cls(
+            latency_ms=_get_env("API_LATENCY_MS", cls.latency_ms),
+            latency_distribution=_get_env(
+                "API_LATENCY_DISTRIBUTION", cls.latency_distribution, str
+            ),
+            latency_sigma=_get_env("API_LATENCY_SIGMA", cls.latency_sigma),
+            error_rate=_get_env("API_ERROR_RATE", cls.error_rate),
+            truncate_rate=_get_env("API_TRUNCATE_RATE", cls.truncate_rate),
+            drip_rate=_get_env("API_DRIP_RATE", cls.drip_rate),
+            drip_delay_ms=_get_env("API_DRIP_DELAY_MS", cls.drip_delay_ms),
+            max_concurrency=_get_env("API_MAX_CONCURRENCY", None, int),
+            seed=_get_env("API_LOAD_SEED", None, int),
+        )
 
-class BlockHosts(BaseHTTPMiddleware):
-    def __init__(self, app: ASGIApp):
-        super().__init__(app)
+    def sample_latency(self, rng: Random) -> float:
+        """Returns a latency in seconds drawn from the distribution."""
+        mean = self.latency_ms / 1000
+        if not mean:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return rng.uniform(0, 2 * mean)
+        if self.latency_distribution == "exponential":
+            return rng.expovariate(1 / mean)
+        if self.latency_distribution == "lognormal":
+            # mu of the underlying normal distribution giving this mean
+            mu = math.log(mean) - self.latency_sigma**2 / 2
+            return rng.lognormvariate(mu, self.latency_sigma)
+        return mean
 
-    async def dispatch(
-        self, request: Request, call_next: RequestResponseEndpoint
-    ) -> Response:
+
+class BlockHosts:
+    """Authenticates, throttles and applies the load profile to api requests.
+
+    Implemented as a pure ASGI middleware, without the request and response
+    wrapping of `BaseHTTPMiddleware`.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        throttle_rate: Optional[float] = None,
+        load: Optional[LoadProfile] = None,
+    ):
+        if throttle_rate is None:
+            throttle_rate = get_throttle_rate()
+        if not 0 <= throttle_rate <= 1:
+            raise ValueError(f"throttle rate must be within [0, 1]: {throttle_rate}")
+        self.app = app
+        self.throttle_rate = throttle_rate
+        self.load = load if load is not None else LoadProfile.from_env()
+        self.in_flight = 0
+        self._random = Random(self.load.seed)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         # Do not authenticate or throttle the following endpoints:
-        if request.url.path in ("/status", "/openapi.json", "/docs"):
-            return await call_next(request)
+        if scope["type"] != "http" or scope["path"] in PUBLIC_PATHS:
+            await self.app(scope, receive, send)
+            return
 
         # Authenticate not so safe api_key is valid.
-        not_so_safe_api_key = "ADU8S67Ddy!d7f?"
-        if "api_key" not in request.query_params._dict \
-            or request.query_params._dict["api_key"] != not_so_safe_api_key:
-            return Response(
-                content="Forbidden",
-                status_code=403
-            )
+        api_key = QueryParams(scope["query_string"]).get("api_key")
+        if api_key != NOT_SO_SAFE_API_KEY:
+            response = Response(content="Forbidden", status_code=403)
+            await response(scope, receive, send)
+            return
 
         # Mimic an unreliable API connection.
-        mimic_throttle_rate = randrange(0, 100)
-        throttle_threshold = 80
-        if mimic_throttle_rate > throttle_threshold:
-            return Response(
-                content="Too many requests",
-                status_code=429
+        load = self.load
+        if (
+            load.max_concurrency is not None and self.in_flight >= load.max_concurrency
+        ) or self._random.random() < self.throttle_rate:
+            response = Response(content="Too many requests", status_code=429)
+            await response(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            latency = load.sample_latency(self._random)
+            if latency:
+                await asyncio.sleep(latency)
+            # a single draw picks at most one fault
+            fault = self._random.random()
+            if fault < load.error_rate:
+                status_code = self._random.choice(ERROR_STATUSES)
+                response = Response(content="Server error", status_code=status_code)
+                await response(scope, receive, send)
+            elif fault < load.error_rate + load.truncate_rate:
+                await self.app(scope, receive, _truncate(send))
+            elif fault < load.error_rate + load.truncate_rate + load.drip_rate:
+                await self.app(scope, receive, _drip(send, load.drip_delay_ms / 1000))
+            else:
+                await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+def _truncate(send: Send) -> Send:
+    """Sends the first half of the first body chunk and nothing after it. The
+    response is left incomplete, so the server closes the connection."""
+    truncated = False
+
+    async def send_truncated(message: Message) -> None:
+        nonlocal truncated
+        if truncated:
+            return
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            message = {
+                "type": "http.response.body",
+                "body": body[: len(body) // 2],
+                "more_body": True,
+            }
+            truncated = True
+        await send(message)
+
+    return send_truncated
+
+
+def _drip(send: Send, delay: float) -> Send:
+    """Sends the body in chunks of DRIP_CHUNK_BYTES, waiting between them."""
+
+    async def send_dripped(message: Message) -> None:
+        if message["type"] != "http.response.body":
+            await send(message)
+            return
+        body = message.get("body", b"")
+        for start in range(0, len(body), DRIP_CHUNK_BYTES):
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": body[start : start + DRIP_CHUNK_BYTES],
+                    "more_body": True,
+                }
             )
+            await asyncio.sleep(delay)
+        if not message.get("more_body", False):
+            await send({"type": "http.response.body", "body": b""})
 
-        return await call_next(request)
+    return send_dripped
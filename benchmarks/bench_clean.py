@@ -0,0 +1,102 @@
+"""Compares the parse and clean stage with the previous implementation.
+
+Responses are parsed one day at a time, like in the extraction pipeline, with
+the pandas readers and, when pyarrow is installed, with the arrow readers.
+
+The previous implementation parsed JSON timestamps in the reader and again in
+`clean_columns` with format inference, keeping int64/float64 columns.
+
+Usage:
+    python -m benchmarks.bench_clean --days 90
+"""
+
+import io
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+
+import pandas as pd
+
+from api_data_source.backend import generate_dataframe
+from extractors import weather
+from extractors.parsers import ReaderEngine, arrow_available
+
+
+def legacy_clean_columns(df: pd.DataFrame) -> pd.DataFrame:
+    column_mapping = {
+        "Naive_Timestamp ": "timestamp",
+        " Variable": "variable",
+        "Last Modified utc": "last_modified_utc",
+    }
+    df = df.rename(columns=column_mapping)
+    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
+    df["last_modified_utc"] = pd.to_datetime(df["last_modified_utc"], utc=True)
+    return df
+
+
+def run_legacy(csv_days, json_days):
+    timestamp_columns = ["Naive_Timestamp ", "Last Modified utc"]
+    wind = [pd.read_csv(io.BytesIO(body)) for body in csv_days]
+    solar = [
+        pd.read_json(io.BytesIO(body), convert_dates=timestamp_columns)
+        for body in json_days
+    ]
+    return [
+        legacy_clean_columns(pd.concat(frames).reset_index(drop=True))
+        for frames in (wind, solar)
+    ]
+
+
+def run_current(csv_days, json_days, compact_values=False, engine=ReaderEngine.PANDAS):
+    results = []
+    for extraction_type, days in (
+        (weather.WeatherExtractionType.WIND, csv_days),
+        (weather.WeatherExtractionType.SOLAR, json_days),
+    ):
+        reader, kwargs = weather._get_reader(extraction_type, engine)
+        frames = [reader(io.BytesIO(body), **kwargs) for body in days]
+        df = pd.concat(frames, ignore_index=True)
+        results.append(weather.clean_columns(df, compact_values))
+    return results
+
+
+def parquet_size(df: pd.DataFrame) -> int:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "data.parquet")
+        df.to_parquet(path)
+        return os.path.getsize(path)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--days", type=int, default=90)
+    args = parser.parse_args()
+
+    dates = [date(2024, 6, 20) - timedelta(days=i) for i in range(args.days)]
+    days = [generate_dataframe(d.isoformat()) for d in dates]
+    csv_days = [df.to_csv(index=False).encode() for df in days]
+    json_days = [df.to_json(orient="records").encode() for df in days]
+
+    print(f"{'stage':>16} {'seconds':>8} {'memory KB':>10} {'parquet KB':>10}")
+    stages = {
+        "legacy": lambda: run_legacy(csv_days, json_days),
+        "current": lambda: run_current(csv_days, json_days),
+        "current float32": lambda: run_current(csv_days, json_days, True),
+    }
+    if arrow_available():
+        stages["current arrow"] = lambda: run_current(
+            csv_days, json_days, engine=ReaderEngine.ARROW
+        )
+    for name, stage in stages.items():
+        start = time.perf_counter()
+        frames = stage()
+        elapsed = time.perf_counter() - start
+        memory_kb = sum(df.memory_usage(deep=True).sum() for df in frames) / 1024
+        parquet_kb = sum(parquet_size(df) for df in frames) / 1024
+        print(f"{name:>16} {elapsed:>8.3f} {memory_kb:>10.0f} {parquet_kb:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
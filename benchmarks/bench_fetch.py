@@ -0,0 +1,59 @@
+"""Compares sequential and concurrent fetching against the local api data source.
+
+Usage:
+    python -m benchmarks.bench_fetch --days 30 --concurrency 8
+"""
+
+import asyncio
+import logging as log
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+
+from benchmarks.server import API_KEY, serve_api
+from extractors import weather
+from extractors.core import DateInterval
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument(
+        "--concurrency", type=int, default=weather.MAX_CONCURRENT_REQUESTS
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    log.basicConfig(level=log.ERROR)
+    to_date = date(2024, 6, 20)
+    timespan = DateInterval(to_date - timedelta(days=args.days - 1), to_date)
+    extraction_types = [
+        weather.WeatherExtractionType.SOLAR,
+        weather.WeatherExtractionType.WIND,
+    ]
+
+    with serve_api(args.port) as endpoint:
+        weather.WEATHER_API_ENDPOINT = endpoint
+
+        start = time.perf_counter()
+        weather.run_solar_extraction(timespan, API_KEY)
+        weather.run_wind_extraction(timespan, API_KEY)
+        sync_sec = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(
+            weather.run_extractions_async(
+                extraction_types, timespan, API_KEY, args.concurrency
+            )
+        )
+        async_sec = time.perf_counter() - start
+
+    requests = args.days * len(extraction_types)
+    print(f"requests: {requests}")
+    print(f"sync:  {sync_sec:8.2f}s ({requests / sync_sec:7.1f} req/s)")
+    print(f"async: {async_sec:8.2f}s ({requests / async_sec:7.1f} req/s)")
+    print(f"speedup: {sync_sec / async_sec:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Measures the import time of the extractors package and the CLI startup time.
+
+Each target is imported in a fresh interpreter with `python -X importtime`, the
+cumulative time of the target and the heavy dependencies it loaded are
+reported. With `--max-ms` the benchmark fails when a light target is slower or
+loads a heavy dependency, which can guard the startup time in CI.
+
+Usage:
+    python -m benchmarks.bench_import --repeat 5
+    python -m benchmarks.bench_import --max-ms 150
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+from typing import List, Tuple
+
+# dependencies that only the stages processing data may load
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "fastparquet", "httpx", "structlog")
+# targets that must stay light, and targets measured for reference
+LIGHT_TARGETS = ("extractors", "extractors.options", "extractors.manifest")
+REFERENCE_TARGETS = ("extractors.weather",)
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)")
+
+
+def measure_import(module: str) -> Tuple[float, List[str]]:
+    """Imports a module in a fresh interpreter.
+
+    Returns:
+        Tuple[float, List[str]]: Cumulative import time in milliseconds, and the
+            heavy modules that were loaded
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=ROOT_DIR,
+    )
+    cumulative_us = 0
+    loaded = set()
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        name = match.group(4)
+        if name == module:
+            cumulative_us = int(match.group(2))
+        if name.split(".")[0] in HEAVY_MODULES:
+            loaded.add(name.split(".")[0])
+    return cumulative_us / 1000, sorted(loaded)
+
+
+def measure_cli_help() -> float:
+    """Returns the wall time of `python main.py --help` in milliseconds."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "main.py", "--help"],
+        capture_output=True,
+        check=True,
+        cwd=ROOT_DIR,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        help="fail when importing a light target takes longer (median)",
+    )
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'target':<24} {'median ms':>10} {'min ms':>8}  heavy modules")
+    for target in LIGHT_TARGETS + REFERENCE_TARGETS:
+        runs = [measure_import(target) for _ in range(args.repeat)]
+        times = [elapsed for elapsed, _ in runs]
+        loaded = runs[0][1]
+        median = statistics.median(times)
+        print(
+            f"{target:<24} {median:>10.1f} {min(times):>8.1f}  "
+            f"{', '.join(loaded) or '-'}"
+        )
+        if target in LIGHT_TARGETS and args.max_ms is not None:
+            if loaded:
+                failures.append(f"{target} loads {', '.join(loaded)}")
+            if median > args.max_ms:
+                failures.append(f"{target} takes {median:.1f}ms")
+
+    times = [measure_cli_help() for _ in range(args.repeat)]
+    print(
+        f"{'main.py --help (wall)':<24} {statistics.median(times):>10.1f} "
+        f"{min(times):>8.1f}"
+    )
+
+    if failures:
+        print("\n".join(["import time guard failed:", *failures]))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
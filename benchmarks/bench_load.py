@@ -0,0 +1,109 @@
+"""Runs the extraction against the local api data source under load: added
+latency, server errors, truncated and dripped responses and a concurrency cap.
+
+Every fetch mode and client concurrency is run against the same load profile,
+showing how the retries, backoff and concurrency of the extractor cope with a
+slow and unreliable provider, without network access.
+
+Usage:
+    python -m benchmarks.bench_load --days 14 --latency-ms 80 --distribution lognormal
+    python -m benchmarks.bench_load --error-rate 0.05 --truncate-rate 0.02 \\
+        --drip-rate 0.05 --max-concurrency 4 --concurrency 2 4 8 16
+"""
+
+import logging as log
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+
+from api_data_source.middleware import LATENCY_DISTRIBUTIONS, LoadProfile
+from benchmarks.server import API_KEY, serve_api
+from extractors import weather
+from extractors.core import DateInterval
+from extractors.error import ResourceDownError
+from extractors.options import ExtractionOptions, FetchMode
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument(
+        "--fetch-mode",
+        choices=[mode.value for mode in FetchMode],
+        nargs="+",
+        default=[mode.value for mode in FetchMode],
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="in-flight requests of the extractor",
+        type=int,
+        nargs="+",
+        default=[weather.MAX_CONCURRENT_REQUESTS],
+    )
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument(
+        "--distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--drip-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--max-concurrency", help="requests handled at once by the api", type=int
+    )
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    log.basicConfig(level=log.ERROR)
+    to_date = date(2024, 6, 20)
+    timespan = DateInterval(to_date - timedelta(days=args.days - 1), to_date)
+    load = LoadProfile(
+        latency_ms=args.latency_ms,
+        latency_distribution=args.distribution,
+        error_rate=args.error_rate,
+        truncate_rate=args.truncate_rate,
+        drip_rate=args.drip_rate,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed,
+    )
+    print(load)
+
+    with serve_api(args.port, args.throttle_rate, load) as endpoint:
+        weather.WEATHER_API_ENDPOINT = endpoint
+        print(
+            f"{'mode':>5} {'conc':>4} {'seconds':>8} {'requests':>8} {'retries':>7} "
+            f"{'429s':>5} {'p50 ms':>7} {'p99 ms':>7} result"
+        )
+        for fetch_mode in args.fetch_mode:
+            for concurrency in args.concurrency:
+                options = ExtractionOptions(
+                    fetch_mode=FetchMode(fetch_mode), max_concurrency=concurrency
+                )
+                with tempfile.TemporaryDirectory() as output_dir:
+                    weather.OUTPUT_DIR = output_dir
+                    start = time.perf_counter()
+                    try:
+                        summary = weather.run_weather_extractors(
+                            timespan, API_KEY, options
+                        )
+                        result = "ok"
+                    except ResourceDownError as e:
+                        summary, result = None, f"failed: {e}"
+                    elapsed = time.perf_counter() - start
+
+                if summary is None:
+                    print(f"{fetch_mode:>5} {concurrency:>4} {elapsed:>8.2f} {result}")
+                    continue
+                requests = summary.requests
+                print(
+                    f"{fetch_mode:>5} {concurrency:>4} {elapsed:>8.2f} "
+                    f"{requests['requests']:>8} {requests['retries']:>7} "
+                    f"{requests['throttled']:>5} {requests['latency_p50'] * 1e3:>7.1f} "
+                    f"{requests['latency_p99'] * 1e3:>7.1f} {result}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Measures peak memory of a run with and without batched (streaming) extraction.
+
+Responses are generated in-process by the api data source backend so that long
+ranges run without network or throttling. Every measurement runs in a fresh
+process, peak RSS is read from the operating system.
+
+Usage:
+    python -m benchmarks.bench_memory --years 1 3 --batch-days 7
+"""
+
+import logging as log
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+from typing import Optional
+from unittest.mock import patch
+
+from api_data_source.backend import generate_dataframe
+from extractors import weather
+from extractors.core import DateInterval
+
+
+def _generated_df_from_url(client, url: str, *args, **kwargs):
+    # e.g. http://localhost:8000/2024-06-20/renewables/windgen.csv
+    return generate_dataframe(url.split("/")[3])
+
+
+def _measure(days: int, batch_days: Optional[int], queue: multiprocessing.Queue):
+    log.basicConfig(level=log.ERROR)
+    to_date = date(2024, 6, 20)
+    timespan = DateInterval(to_date - timedelta(days=days - 1), to_date)
+    options = weather.ExtractionOptions(batch_days=batch_days)
+    with tempfile.TemporaryDirectory() as output_dir:
+        weather.OUTPUT_DIR = output_dir
+        with patch.object(weather, "_get_df_from_url", _generated_df_from_url):
+            start = time.perf_counter()
+            weather.run_weather_extractors(timespan, "apikey", options)
+            elapsed = time.perf_counter() - start
+
+    # kilobytes on linux, bytes on macos
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    max_rss_mb = max_rss / 1024 ** (2 if sys.platform == "darwin" else 1)
+    queue.put((elapsed, max_rss_mb))
+
+
+def measure(days: int, batch_days: Optional[int]):
+    """Runs an extraction in a fresh process, returns elapsed seconds and peak MB."""
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure, args=(days, batch_days, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--batch-days", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'days':>6} {'mode':>12} {'seconds':>8} {'peak MB':>8}")
+    for years in args.years:
+        days = years * 365
+        for batch_days in (None, args.batch_days):
+            elapsed, max_rss_mb = measure(days, batch_days)
+            mode = f"batch={batch_days}" if batch_days else "all at once"
+            print(f"{days:>6} {mode:>12} {elapsed:>8.1f} {max_rss_mb:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
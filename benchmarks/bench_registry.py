@@ -0,0 +1,82 @@
+"""Runs dozens of synthetic data types registered against the local api data
+source through the shared extraction engine.
+
+Synthetic types reuse the solar (json) and wind (csv) endpoints under their own
+names, so every type has its own pipeline, output directory and metrics. The
+time per request shows whether the engine overhead grows with the number of
+registered types.
+
+Usage:
+    python -m benchmarks.bench_registry --types 2 12 48 --days 7
+    python -m benchmarks.bench_registry --types 48 --fetch-mode async --throttle-rate 0
+"""
+
+import logging as log
+import tempfile
+import time
+from argparse import ArgumentParser
+from datetime import date, timedelta
+
+from benchmarks.server import API_KEY, serve_api
+from extractors import weather
+from extractors.core import DateInterval
+from extractors.options import ExtractionOptions, FetchMode
+from extractors.registry import ExtractorSpec, register_extractor
+
+ENDPOINTS = (
+    ("{date}/renewables/solargen.json", "json"),
+    ("{date}/renewables/windgen.csv", "csv"),
+)
+
+
+def register_synthetic_types(count: int):
+    for i in range(count):
+        path, wire_format = ENDPOINTS[i % len(ENDPOINTS)]
+        spec = ExtractorSpec(
+            name=f"synthetic{i:03d}", path=path, wire_format=wire_format
+        )
+        register_extractor(spec, replace=True)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--types", type=int, nargs="+", default=[2, 12, 48])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument(
+        "--fetch-mode", choices=[mode.value for mode in FetchMode], default="sync"
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--throttle-rate", help="share of requests answered with 429", type=float
+    )
+    args = parser.parse_args()
+
+    log.basicConfig(level=log.ERROR)
+    to_date = date(2024, 6, 20)
+    timespan = DateInterval(to_date - timedelta(days=args.days - 1), to_date)
+    register_synthetic_types(max(args.types))
+
+    with serve_api(args.port, args.throttle_rate) as endpoint:
+        weather.WEATHER_API_ENDPOINT = endpoint
+        print(f"{'types':>6} {'requests':>9} {'elapsed':>9} {'ms/request':>11} rows/s")
+        for count in args.types:
+            options = ExtractionOptions(
+                extractors=[f"synthetic{i:03d}" for i in range(count)],
+                fetch_mode=FetchMode(args.fetch_mode),
+            )
+            with tempfile.TemporaryDirectory() as output_dir:
+                weather.OUTPUT_DIR = output_dir
+                start = time.perf_counter()
+                summary = weather.run_weather_extractors(timespan, API_KEY, options)
+                elapsed = time.perf_counter() - start
+
+            requests = summary.requests["requests"]
+            rows = summary.stages["write"].rows
+            print(
+                f"{count:>6} {requests:>9} {elapsed:>8.2f}s "
+                f"{elapsed / requests * 1000:>11.2f} {rows / elapsed:,.0f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""End to end benchmark of the extraction pipeline against the local api data source.
+
+Each range is extracted by `run_weather_extractors` in a fresh process, talking
+over http to the api data source served on a local port, and measured for
+throughput, request latency, peak memory and output size. Results are written
+to a JSON file that can be compared with the results of an earlier run.
+
+Usage:
+    python -m benchmarks.bench_suite --days 7 90 365 --output bench.json
+    python -m benchmarks.bench_suite --throttle-rate 0 --baseline bench.json
+    python -m benchmarks.bench_suite --days 1826 --workers 4
+"""
+
+import dataclasses
+import datetime
+import json
+import logging as log
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Dict, List, Optional
+
+from benchmarks.server import API_KEY, serve_api
+from extractors import backfill, weather
+from extractors.core import DateInterval
+from extractors.parsers import ReaderEngine
+
+TO_DATE = datetime.date(2024, 6, 20)
+# interval at which a run is checked for having died without a result
+POLL_SEC = 1.0
+# metrics compared with the baseline, and whether higher is better
+COMPARED_METRICS = {
+    "elapsed_sec": False,
+    "rows_per_sec": True,
+    "latency_p50": False,
+    "latency_p99": False,
+    "peak_rss_mb": False,
+    "output_bytes": False,
+}
+
+
+def _run(endpoint: str, days: int, options: dict, results: multiprocessing.Queue):
+    log.basicConfig(level=log.ERROR)
+    weather.WEATHER_API_ENDPOINT = endpoint
+    timespan = DateInterval(TO_DATE - datetime.timedelta(days=days - 1), TO_DATE)
+    workers = options.get("workers")
+    options = weather.ExtractionOptions(
+        fetch_mode=weather.FetchMode(options["fetch_mode"]),
+        batch_days=options["batch_days"],
+        reader_engine=ReaderEngine(options["reader_engine"]),
+    )
+    with tempfile.TemporaryDirectory() as output_dir:
+        weather.OUTPUT_DIR = output_dir
+        start = time.perf_counter()
+        if workers:
+            summary = backfill.run_backfill(timespan, API_KEY, options, workers).summary
+        else:
+            summary = weather.run_weather_extractors(timespan, API_KEY, options)
+        elapsed = time.perf_counter() - start
+        output_bytes = _dir_size(output_dir)
+
+    # nothing is written when every day was extracted already
+    write = summary.stages.get("write")
+    rows = write.rows if write else 0
+    results.put(
+        {
+            "days": days,
+            "elapsed_sec": elapsed,
+            "rows": rows,
+            "rows_per_sec": rows / elapsed,
+            "requests_per_sec": summary.requests["requests"] / elapsed,
+            **summary.requests,
+            "peak_rss_mb": _max_rss_mb(),
+            "output_bytes": output_bytes,
+            "stages": {
+                name: dataclasses.asdict(stage)
+                for name, stage in summary.stages.items()
+            },
+        }
+    )
+
+
+def measure(endpoint: str, days: int, options: dict) -> dict:
+    """Extracts `days` days in a fresh process and returns its measurements."""
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    process = ctx.Process(target=_run, args=(endpoint, days, options, results))
+    process.start()
+    try:
+        while process.exitcode is None:
+            try:
+                return results.get(timeout=POLL_SEC)
+            except queue.Empty:
+                continue
+        # the result may have been sent right before the process exited
+        try:
+            return results.get(timeout=POLL_SEC)
+        except queue.Empty:
+            raise RuntimeError(
+                f"benchmark of {days} days exited with code {process.exitcode} "
+                "without a result"
+            ) from None
+    finally:
+        process.join()
+
+
+def compare(results: List[dict], baseline: List[dict]) -> Dict[int, Dict[str, float]]:
+    """Returns the relative change of the compared metrics of each range.
+
+    Positive changes are regressions, e.g. 0.1 is 10% slower or 10% more memory.
+    """
+    baseline_runs = {run["days"]: run for run in baseline}
+    changes = {}
+    for run in results:
+        base = baseline_runs.get(run["days"])
+        if not base:
+            continue
+        changes[run["days"]] = {
+            name: (
+                base[name] - run[name] if higher_is_better else run[name] - base[name]
+            )
+            / base[name]
+            for name, higher_is_better in COMPARED_METRICS.items()
+            if base.get(name)
+        }
+    return changes
+
+
+def _dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+
+def _max_rss_mb() -> float:
+    # kilobytes on linux, bytes on macos. Worker processes of a backfill count
+    # with their largest worker
+    max_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return max_rss / 1024 ** (2 if sys.platform == "darwin" else 1)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 90, 365])
+    parser.add_argument(
+        "--fetch-mode",
+        choices=[mode.value for mode in weather.FetchMode],
+        default=weather.FetchMode.SYNC.value,
+    )
+    parser.add_argument("--batch-days", type=int)
+    parser.add_argument(
+        "--workers", type=int, help="backfill with this many worker processes"
+    )
+    parser.add_argument(
+        "--reader",
+        choices=[engine.value for engine in ReaderEngine],
+        default=ReaderEngine.PANDAS.value,
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        help="share of requests throttled by the api, api default when not set",
+    )
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", default="bench_suite.json")
+    parser.add_argument("--baseline", help="results of an earlier run to compare to")
+    args = parser.parse_args()
+
+    options = {
+        "fetch_mode": args.fetch_mode,
+        "batch_days": args.batch_days,
+        "reader_engine": args.reader,
+        "workers": args.workers,
+    }
+    results = []
+    print(
+        f"{'days':>5} {'seconds':>8} {'rows/s':>9} {'req/s':>7} {'p50 ms':>7} "
+        f"{'p99 ms':>7} {'429s':>5} {'peak MB':>8} {'output MB':>9}"
+    )
+    with serve_api(args.port, args.throttle_rate) as endpoint:
+        for days in args.days:
+            run = measure(endpoint, days, options)
+            results.append(run)
+            print(
+                f"{days:>5} {run['elapsed_sec']:>8.2f} {run['rows_per_sec']:>9.0f} "
+                f"{run['requests_per_sec']:>7.1f} {run['latency_p50'] * 1e3:>7.1f} "
+                f"{run['latency_p99'] * 1e3:>7.1f} {run['throttled']:>5} "
+                f"{run['peak_rss_mb']:>8.1f} {run['output_bytes'] / 1e6:>9.2f}"
+            )
+
+    report = {
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "throttle_rate": args.throttle_rate,
+        "options": options,
+        "runs": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"compared to {args.baseline} (revision {baseline.get('revision')}):")
+        for days, changes in compare(results, baseline["runs"]).items():
+            deltas = " ".join(f"{k}:{v:+.1%}" for k, v in changes.items())
+            print(f"{days:>5} {deltas}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import contextlib
+import threading
+import time
+from typing import Iterator, Optional
+
+import uvicorn
+
+from api_data_source.main import create_app
+from api_data_source.middleware import LoadProfile
+
+API_KEY = "ADU8S67Ddy!d7f?"
+
+
+@contextlib.contextmanager
+def serve_api(
+    port: int = 8765,
+    throttle_rate: Optional[float] = None,
+    load: Optional[LoadProfile] = None,
+) -> Iterator[str]:
+    """Runs the local api data source in a background thread.
+
+    Args:
+        port (int, optional): Local port to listen on, 0 picks a free port
+        throttle_rate (float, optional): Share of requests answered with 429,
+            the api default is used when not provided
+        load (LoadProfile, optional): Latency, faults and concurrency cap of
+            the api, the environment variables are used when not provided
+
+    Yields:
+        str: Base url of the running api, usable as `WEATHER_API_ENDPOINT`
+    """
+    app = create_app(throttle_rate, load)
+    config = uvicorn.Config(app, port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.should_exit = True
+        thread.join()
@@ -1,12 +1,76 @@
-from .core import DateInterval
-from .weather import run_weather_extractors, run_solar_extraction, run_wind_extraction
-from .error import ResourceDownError, InvalidDateError
-
-__all__ = [
-    "DateInterval",
-    "run_weather_extractors",
-    "run_solar_extraction",
-    "run_wind_extraction",
-    "ResourceDownError",
-    "InvalidDateError",
-]
+import importlib
+from typing import TYPE_CHECKING
+
+# public names mapped to the module defining them. Modules are imported on first
+# access (PEP 562), so that importing the package does not load pandas or httpx
+# until a stage needs them.
+_EXPORTS = {
+    "DateInterval": ".core",
+    "WriterOptions": ".core",
+    "ExtractionOptions": ".options",
+    "FetchMode": ".options",
+    "run_extraction": ".weather",
+    "run_extractions_async": ".weather",
+    "run_weather_extractors": ".weather",
+    "run_solar_extraction": ".weather",
+    "run_wind_extraction": ".weather",
+    "run_backfill": ".backfill",
+    "BackfillResult": ".backfill",
+    "compact_output": ".compaction",
+    "CompactionStats": ".compaction",
+    "WeatherDataset": ".dataset",
+    "DatasetFilter": ".dataset",
+    "ExtractionService": ".service",
+    "ExtractorSpec": ".registry",
+    "register_extractor": ".registry",
+    "ReaderEngine": ".parsers",
+    "RequestScheduler": ".scheduler",
+    "RequestStats": ".scheduler",
+    "RunSummary": ".metrics",
+    "StageMetrics": ".metrics",
+    "ResourceDownError": ".error",
+    "AuthorizationError": ".error",
+    "InvalidDateError": ".error",
+    "SchemaError": ".error",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .backfill import BackfillResult, run_backfill
+    from .compaction import CompactionStats, compact_output
+    from .core import DateInterval, WriterOptions
+    from .dataset import DatasetFilter, WeatherDataset
+    from .error import (
+        AuthorizationError,
+        InvalidDateError,
+        ResourceDownError,
+        SchemaError,
+    )
+    from .metrics import RunSummary, StageMetrics
+    from .options import ExtractionOptions, FetchMode
+    from .parsers import ReaderEngine
+    from .registry import ExtractorSpec, register_extractor
+    from .scheduler import RequestScheduler, RequestStats
+    from .service import ExtractionService
+    from .weather import (
+        run_extraction,
+        run_extractions_async,
+        run_solar_extraction,
+        run_weather_extractors,
+        run_wind_extraction,
+    )
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # cache the value, later lookups do not go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
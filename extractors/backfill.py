@@ -0,0 +1,251 @@
+import dataclasses
+import datetime
+import logging as log
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from .core import DateInterval
+from .error import AuthorizationError, ResourceDownError
+from .manifest import Manifest
+from .metrics import RunMetrics, RunSummary
+from .options import ExtractionOptions, get_pending_dates
+from .registry import get_extractors
+from .scheduler import RequestStats
+
+# days extracted by one worker task, small enough to balance the load between
+# workers and to keep the days redone by a retry few
+SHARD_DAYS = 30
+# attempts of a shard, including the first one
+MAX_SHARD_ATTEMPTS = 3
+
+
+@dataclass
+class ShardResult:
+    """Outcome of the extraction of one shard of a backfill.
+
+    Attributes:
+        shard (DateInterval): Days of the shard
+        attempts (int): Number of times the shard was submitted
+        summary (RunSummary): Metrics of the last successful attempt
+        error (str): Error of the last attempt, if it failed
+    """
+
+    shard: DateInterval
+    attempts: int = 0
+    summary: Optional[RunSummary] = None
+    error: Optional[str] = None
+
+    @property
+    def succeeded(self) -> bool:
+        return self.error is None and self.summary is not None
+
+
+@dataclass
+class BackfillResult:
+    """Outcome of a backfill.
+
+    Attributes:
+        summary (RunSummary): Metrics of all shards combined, extractor times are
+            summed over shards and latency percentiles are computed over the
+            successful requests of every shard
+        shards (List[ShardResult]): Status of each extracted shard, in date order
+    """
+
+    summary: RunSummary
+    shards: List[ShardResult] = field(default_factory=list)
+
+    @property
+    def failed_shards(self) -> List[ShardResult]:
+        return [shard for shard in self.shards if not shard.succeeded]
+
+
+def split_timespan(timespan: DateInterval, shard_days: int) -> List[DateInterval]:
+    """Splits a timespan into consecutive shards of at most `shard_days` days.
+
+    Args:
+        timespan (DateInterval): Timespan with date range
+        shard_days (int): Max days of each shard
+
+    Returns:
+        List[DateInterval]: Shards covering the timespan, in date order
+    """
+    if shard_days < 1:
+        raise ValueError("shard_days must be at least 1")
+    shards = []
+    from_date = timespan.from_date
+    while from_date <= timespan.to_date:
+        to_date = min(
+            timespan.to_date, from_date + datetime.timedelta(days=shard_days - 1)
+        )
+        shards.append(DateInterval(from_date, to_date))
+        from_date = to_date + datetime.timedelta(days=1)
+    return shards
+
+
+def run_backfill(
+    timespan: DateInterval,
+    api_key: str,
+    options: Optional[ExtractionOptions] = None,
+    workers: Optional[int] = None,
+    shard_days: int = SHARD_DAYS,
+    max_attempts: int = MAX_SHARD_ATTEMPTS,
+) -> BackfillResult:
+    """Extracts a long timespan in shards processed by a pool of processes.
+
+    Each worker runs the whole pipeline (fetch, parse, clean, write) for one
+    shard at a time and writes its own day partitions, so parsing and cleaning
+    are not limited to one core. Days are recorded in the shared manifest as
+    they are written, appends to the manifest are atomic across processes.
+    Shards that fail on a transient error (the API being down, a worker that
+    died) are resubmitted up to `max_attempts` times; with a manifest a retry
+    only extracts the days the failed attempt did not record. Other errors, e.g.
+    a rejected API key, fail the shard without retrying it.
+
+    The initial request rate of `options` is split between the workers, so that
+    the API sees the same initial rate as from a single process run.
+
+    Args:
+        timespan (DateInterval): Timespan with date range
+        api_key (str): API key to use to fetch data
+        options (ExtractionOptions, optional): Pipeline options of every shard,
+            defaults are used when not provided
+        workers (int, optional): Number of worker processes, defaults to the
+            number of cores
+        shard_days (int, optional): Max days of each shard
+        max_attempts (int, optional): Attempts of each shard, including the first
+
+    Returns:
+        BackfillResult: Combined metrics and the status of each shard
+    """
+    from . import weather
+
+    options = options or ExtractionOptions()
+    workers = workers or os.cpu_count() or 1
+    metrics = RunMetrics()
+    request_stats = RequestStats()
+
+    shards = _pending_shards(timespan, shard_days, options)
+    workers = max(1, min(workers, len(shards)))
+    log.info(
+        f"backfilling timespan: {timespan} in {len(shards)} shards "
+        f"of up to {shard_days} days with {workers} workers"
+    )
+    # processes replace the thread and process pools of a single run, and each
+    # worker takes its share of the request rate
+    shard_options = dataclasses.replace(
+        options,
+        use_processes=False,
+        max_request_rate=options.max_request_rate / workers,
+        metrics_json_path=None,
+        metrics_prometheus_path=None,
+    )
+    results = [ShardResult(shard) for shard in shards]
+    pending = list(results)
+    for attempt in range(1, max_attempts + 1):
+        if not pending:
+            break
+        if attempt > 1:
+            log.warning(f"retrying {len(pending)} failed shards, attempt {attempt}")
+        # a new pool per attempt, a worker that died breaks its pool
+        with ProcessPoolExecutor(
+            workers,
+            initializer=weather.init_worker,
+            initargs=(
+                weather.OUTPUT_DIR,
+                weather.WEATHER_API_ENDPOINT,
+                get_extractors(options.extractors),
+            ),
+        ) as pool:
+            futures = {
+                pool.submit(
+                    _extract_shard, result.shard, api_key, shard_options
+                ): result
+                for result in pending
+            }
+            retried = []
+            for future in as_completed(futures):
+                result = futures[future]
+                result.attempts += 1
+                try:
+                    result.summary = future.result()
+                    result.error = None
+                    _merge_summary(metrics, request_stats, result.summary)
+                    log.info(
+                        f"shard {result.shard} done in "
+                        f"{result.summary.elapsed_sec:.2f}s"
+                    )
+                except Exception as e:
+                    result.error = f"{type(e).__name__}: {e}"
+                    if _is_transient(e):
+                        log.warning(f"shard {result.shard} failed: {result.error}")
+                        retried.append(result)
+                    else:
+                        log.error(
+                            f"shard {result.shard} failed, not retried: "
+                            f"{result.error}"
+                        )
+        pending = retried
+
+    for result in pending:
+        log.error(
+            f"shard {result.shard} failed after {result.attempts} attempts: "
+            f"{result.error}"
+        )
+    summary = metrics.summary(request_stats)
+    log.info(
+        f"backfill done in {summary.elapsed_sec:.2f}s, "
+        f"{sum(result.succeeded for result in results)} of {len(results)} shards "
+        "extracted"
+    )
+    summary.log()
+    summary.write(options.metrics_json_path, options.metrics_prometheus_path)
+    return BackfillResult(summary, results)
+
+
+def _pending_shards(
+    timespan: DateInterval, shard_days: int, options: ExtractionOptions
+) -> List[DateInterval]:
+    """Returns the shards of the timespan with days missing from the manifest."""
+    shards = split_timespan(timespan, shard_days)
+    if options.full_refresh or options.refresh or not options.manifest_path:
+        return shards
+    manifest = Manifest(options.manifest_path)
+    extractors = get_extractors(options.extractors)
+    pending = get_pending_dates(extractors, timespan, manifest)
+    pending_dates = set().union(*pending.values())
+    return [
+        shard
+        for shard in shards
+        if any(date in pending_dates for date in shard.iter_dates())
+    ]
+
+
+def _is_transient(error: Exception) -> bool:
+    """Returns whether a shard failed on an error that a retry may not hit."""
+    if isinstance(error, AuthorizationError):
+        return False
+    return isinstance(error, (ResourceDownError, BrokenProcessPool))
+
+
+def _extract_shard(
+    shard: DateInterval, api_key: str, options: ExtractionOptions
+) -> RunSummary:
+    from . import weather
+
+    return weather.run_weather_extractors(shard, api_key, options)
+
+
+def _merge_summary(metrics: RunMetrics, stats: RequestStats, summary: RunSummary):
+    """Adds the metrics of a shard to the metrics of the backfill."""
+    for name, stage in summary.stages.items():
+        metrics.record(name, stage)
+    for name, seconds in summary.extractors.items():
+        metrics.record_extractor(name, metrics.extractors.get(name, 0.0) + seconds)
+    for name in ("requests", "successes", "retries", "throttled", "failures"):
+        setattr(stats, name, getattr(stats, name) + summary.requests[name])
+    stats.sleep_sec += summary.requests["sleep_sec"]
+    stats.latencies.extend(summary.url_latencies.values())
+    stats.url_latencies.update(summary.url_latencies)
@@ -0,0 +1,165 @@
+import hashlib
+import logging as log
+import os
+import threading
+import time
+import uuid
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# raw frames are small and read back rarely, zstd is worth its write time
+CACHE_COMPRESSION = "zstd"
+CACHE_SUFFIX = ".parquet"
+
+
+class RawCache:
+    """On-disk cache of the raw frames returned by the API, one file per request.
+
+    Entries are keyed by the sha256 of the request url without its query string
+    (which holds the api key), so the same day of the same endpoint always maps
+    to the same file, e.g. `ab/ab12...ef.parquet`. Frames are stored as they
+    were parsed, before `clean_columns`, in zstd compressed parquet, so outputs
+    can be rebuilt without fetching the API again after the cleaning or the
+    output format changed.
+
+    Entries older than `ttl_sec` are treated as missing, unless the cache is
+    read with `ignore_ttl` (e.g. offline runs). When the size of the cache goes
+    above `max_bytes` the least recently used entries are deleted; reading an
+    entry refreshes its access time, while its modification time stays the time
+    it was fetched, which the ttl is measured from. Files are replaced
+    atomically, so processes can share a cache directory. The size tracked by
+    each process is corrected from disk whenever it evicts.
+
+    A `write_only` cache is not read from: every request goes to the API and
+    its response replaces the cached entry, e.g. for runs that must see the
+    current upstream data.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        ttl_sec: Optional[float] = None,
+        max_bytes: Optional[int] = None,
+        write_only: bool = False,
+    ):
+        self.directory = directory
+        self.ttl_sec = ttl_sec
+        self.max_bytes = max_bytes
+        self.write_only = write_only
+        self._lock = threading.Lock()
+        self._size = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Returns the cache key of a request url, ignoring its query string."""
+        return hashlib.sha256(url.split("?", 1)[0].encode()).hexdigest()
+
+    def path(self, url: str) -> str:
+        key = self.key(url)
+        return os.path.join(self.directory, key[:2], f"{key}{CACHE_SUFFIX}")
+
+    def contains(self, url: str, ignore_ttl: bool = False) -> bool:
+        """Returns whether a fresh (or any, with `ignore_ttl`) entry exists."""
+        try:
+            mtime = os.path.getmtime(self.path(url))
+        except OSError:
+            return False
+        return ignore_ttl or not self._expired(mtime)
+
+    def get(self, url: str, ignore_ttl: bool = False) -> Optional["pd.DataFrame"]:
+        """Returns the cached frame of a request url, if any.
+
+        Args:
+            url (str): Request url
+            ignore_ttl (bool, optional): Return entries older than the ttl
+
+        Returns:
+            Optional[pd.DataFrame]: Raw frame, or None when missing, expired or
+                the cache is write only
+        """
+        import pandas as pd
+
+        path = self.path(url)
+        if self.write_only or not self.contains(url, ignore_ttl):
+            return None
+        try:
+            df = pd.read_parquet(path)
+            # the entry was used recently, evicted last. Its modification time
+            # is kept, the ttl is measured from it
+            os.utime(path, ns=(time.time_ns(), os.stat(path).st_mtime_ns))
+        except (OSError, ValueError) as e:
+            # removed by another process, or a corrupted file
+            log.warning(f"cannot read raw cache entry {path}: {e}")
+            return None
+        return df
+
+    def put(self, url: str, df: "pd.DataFrame") -> int:
+        """Stores the raw frame of a request url.
+
+        Returns:
+            int: Size of the entry in bytes
+        """
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4()}.tmp"
+        try:
+            df.to_parquet(tmp_path, compression=CACHE_COMPRESSION, index=False)
+            size = os.path.getsize(tmp_path)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._size += size - replaced
+            if self.max_bytes is not None and self._size > self.max_bytes:
+                self._evict()
+        return size
+
+    @property
+    def size(self) -> int:
+        """Size of the cache in bytes, as known by this process."""
+        return self._size
+
+    def _expired(self, mtime: float) -> bool:
+        return self.ttl_sec is not None and time.time() - mtime > self.ttl_sec
+
+    def _evict(self):
+        # must be called with the lock held. Sizes are read again from disk,
+        # other processes may have added or evicted entries
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        evicted = 0
+        for _, path, size in entries:
+            if self._size <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            evicted += 1
+        log.info(f"evicted {evicted} raw cache entries, {self._size} bytes left")
+
+    def _entries(self) -> List[Tuple[float, str, int]]:
+        """Returns (access time, path, size) of every entry."""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(CACHE_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, path, stat.st_size))
+        return entries
@@ -0,0 +1,252 @@
+import datetime
+import glob
+import logging as log
+import os
+import uuid
+from dataclasses import dataclass
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from .core import WriterOptions, write_to_file
+from .options import OUTPUT_DIR
+from .registry import ExtractorType, get_extractors
+
+# size aimed for by compacted files, the last file of a partition is smaller
+TARGET_FILE_BYTES = 128 * 2**20
+# rows identifying a measurement, duplicates keep the latest `last_modified_utc`
+DEDUPE_COLUMNS = ["timestamp", "variable"]
+
+
+@dataclass
+class CompactionStats:
+    """Totals of a compaction run.
+
+    Attributes:
+        partitions (int): Month partitions that were compacted
+        files_in (int): Files merged
+        files_out (int): Files written
+        rows_in (int): Rows read
+        rows_out (int): Rows written, after removing duplicates
+        bytes_in (int): Size of the merged files
+        bytes_out (int): Size of the written files
+    """
+
+    partitions: int = 0
+    files_in: int = 0
+    files_out: int = 0
+    rows_in: int = 0
+    rows_out: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+
+    def add(self, other: "CompactionStats"):
+        for name in self.__dataclass_fields__:
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+
+def compact_output(
+    output_dir: str = OUTPUT_DIR,
+    extraction_types: Optional[Iterable[ExtractorType]] = None,
+    target_bytes: int = TARGET_FILE_BYTES,
+    min_files: int = 2,
+    writer: Optional[WriterOptions] = None,
+) -> CompactionStats:
+    """Merges the files of each `year=/month=` partition of the output.
+
+    Args:
+        output_dir (str, optional): Output directory of the extractors
+        extraction_types (Iterable[ExtractorType], optional): Types to
+            compact, every registered type by default
+        target_bytes (int, optional): Size aimed for by each compacted file
+        min_files (int, optional): Partitions with fewer files are left as is
+        writer (WriterOptions, optional): Codec and row group options of the
+            compacted files, which are always parquet
+
+    Returns:
+        CompactionStats: Totals of all compacted partitions
+    """
+    extraction_types = extraction_types or get_extractors()
+    stats = CompactionStats()
+    for extraction_type in extraction_types:
+        pattern = os.path.join(output_dir, extraction_type.value, "year=*", "month=*")
+        for partition_dir in sorted(glob.glob(pattern)):
+            if len(_partition_files(partition_dir)) < min_files:
+                continue
+            stats.add(compact_partition(partition_dir, target_bytes, writer))
+    log.info(
+        f"compacted {stats.partitions} partitions: {stats.files_in} files "
+        f"({stats.rows_in} rows) into {stats.files_out} files ({stats.rows_out} rows)"
+    )
+    return stats
+
+
+def compact_partition(
+    partition_dir: str,
+    target_bytes: int = TARGET_FILE_BYTES,
+    writer: Optional[WriterOptions] = None,
+) -> CompactionStats:
+    """Merges every data file of a partition into files of about `target_bytes`.
+
+    Day files (`day=DD/data.parquet`) and files of earlier compactions are read,
+    rows are deduplicated on (timestamp, variable) keeping the latest
+    `last_modified_utc`, sorted by timestamp and written to
+    `part-<id>-<n>.parquet` files in the partition directory.
+
+    Each new file is moved in place atomically before any merged file is
+    removed, so readers never miss rows; they may read rows twice until the
+    swap is done. A day file that was replaced while compacting (e.g. a day
+    extracted again) is kept, and its day is removed from the new files.
+
+    Args:
+        partition_dir (str): Directory of a `year=/month=` partition
+        target_bytes (int, optional): Size aimed for by each compacted file
+        writer (WriterOptions, optional): Codec and row group options of the
+            compacted files
+
+    Returns:
+        CompactionStats: Totals of the partition
+    """
+    sources = [(path, _file_version(path)) for path in _partition_files(partition_dir)]
+    stats = CompactionStats(partitions=1, files_in=len(sources))
+    if not sources:
+        return stats
+    stats.bytes_in = sum(version[1] for _, version in sources)
+
+    df = pd.concat([pd.read_parquet(path) for path, _ in sources], ignore_index=True)
+    stats.rows_in = len(df)
+    df = (
+        df.sort_values("last_modified_utc", kind="stable")
+        .drop_duplicates(DEDUPE_COLUMNS, keep="last")
+        .sort_values(DEDUPE_COLUMNS, kind="stable")
+        .reset_index(drop=True)
+    )
+    stats.rows_out = len(df)
+
+    # merged files compress better than small ones, the estimate errs small
+    bytes_per_row = max(stats.bytes_in / max(stats.rows_in, 1), 1)
+    rows_per_file = max(1, int(target_bytes / bytes_per_row))
+    compaction_id = uuid.uuid4().hex[:8]
+    for n, start in enumerate(range(0, len(df), rows_per_file)):
+        path = os.path.join(partition_dir, f"part-{compaction_id}-{n:04d}.parquet")
+        chunk = df.iloc[start : start + rows_per_file].reset_index(drop=True)
+        stats.bytes_out += write_to_file(
+            path, chunk, filetype="parquet", options=writer
+        )
+        stats.files_out += 1
+
+    for path, version in sources:
+        # compacted files only change when a day is removed from them, the new
+        # files hold their rows
+        compacted = os.path.dirname(path) == partition_dir
+        if _file_version(path) != version and not compacted:
+            log.warning(f"{path} changed while compacting, kept")
+            continue
+        os.remove(path)
+        _remove_empty_dirs(os.path.dirname(path), partition_dir)
+    # days written while compacting are only read from their day files
+    remove_compacted_days(_partition_files(partition_dir), writer)
+    log.info(
+        f"compacted {partition_dir}: {stats.files_in} files into {stats.files_out}, "
+        f"{stats.rows_in - stats.rows_out} duplicate rows removed"
+    )
+    return stats
+
+
+def remove_compacted_days(
+    day_files: Iterable[str], writer: Optional[WriterOptions] = None
+) -> int:
+    """Removes the rows of days written again from the compacted files.
+
+    A day extracted after its month was compacted is written to its day file
+    again, its rows are then removed from the `part-*.parquet` files of the
+    month so that readers only see the new ones. Compacted files are replaced
+    atomically, after the day files were written.
+
+    Args:
+        day_files (Iterable[str]): Written day files, e.g.
+            `wind/year=2024/month=06/day=20/data.parquet`; other files of the
+            partitions are ignored
+        writer (WriterOptions, optional): Codec and row group options of the
+            rewritten files
+
+    Returns:
+        int: Rows removed from the compacted files
+    """
+    dates_by_partition = {}
+    for path in day_files:
+        day_dir = os.path.dirname(path)
+        date = _partition_date(day_dir)
+        if date is not None:
+            partition_dir = os.path.dirname(day_dir)
+            dates_by_partition.setdefault(partition_dir, set()).add(date)
+
+    removed = 0
+    for partition_dir, dates in dates_by_partition.items():
+        for path in _compacted_files(partition_dir):
+            timestamps = pd.read_parquet(path, columns=["timestamp"])["timestamp"]
+            day_rows = timestamps.dt.date.isin(dates).to_numpy()
+            if not day_rows.any():
+                continue
+            df = pd.read_parquet(path)[~day_rows].reset_index(drop=True)
+            if len(df):
+                write_to_file(path, df, filetype="parquet", options=writer)
+            else:
+                os.remove(path)
+            removed += int(day_rows.sum())
+            log.info(f"removed {day_rows.sum()} rows of days written again from {path}")
+    return removed
+
+
+def _partition_files(partition_dir: str) -> List[str]:
+    """Returns the data files of a partition, hidden files are ignored."""
+    files = []
+    for root, dirs, names in os.walk(partition_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith((".", "_")))
+        files.extend(
+            os.path.join(root, name)
+            for name in sorted(names)
+            if name.endswith(".parquet") and not name.startswith((".", "_"))
+        )
+    return files
+
+
+def _compacted_files(partition_dir: str) -> List[str]:
+    """Returns the files written by compactions, at the root of a partition."""
+    if not os.path.isdir(partition_dir):
+        return []
+    return [
+        os.path.join(partition_dir, name)
+        for name in sorted(os.listdir(partition_dir))
+        if name.endswith(".parquet") and not name.startswith((".", "_"))
+    ]
+
+
+def _partition_date(day_dir: str) -> Optional[datetime.date]:
+    """Returns the date of a `year=/month=/day=` directory, None for others."""
+    parts = {}
+    for key in ("day", "month", "year"):
+        prefix, _, value = os.path.basename(day_dir).partition("=")
+        if prefix != key or not value.isdigit():
+            return None
+        parts[key] = int(value)
+        day_dir = os.path.dirname(day_dir)
+    return datetime.date(parts["year"], parts["month"], parts["day"])
+
+
+def _file_version(path: str) -> Tuple[int, int]:
+    """Returns (modification time, size) of a file, (0, 0) when it is missing."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return 0, 0
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _remove_empty_dirs(path: str, stop_dir: str):
+    while os.path.abspath(path) != os.path.abspath(stop_dir):
+        try:
+            os.rmdir(path)
+        except OSError:
+            return
+        path = os.path.dirname(path)
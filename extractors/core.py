@@ -1,51 +1,251 @@
+import dataclasses
 import datetime
+import json
 import logging as log
 import os
+import uuid
 from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, List, Optional
 
-import pandas as pd
+from .parsers import arrow_available
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 DATE_FMT = "%Y-%m-%d"
 
+# output formats, feather is the Arrow IPC file format
+FILETYPES = ("json", "parquet", "feather")
+# compression codecs of parquet and feather files, "none" writes uncompressed
+# files (required to memory map feather files without copying)
+CODECS = ("snappy", "zstd", "lz4", "gzip", "none")
+FEATHER_CODECS = ("zstd", "lz4", "none")
+# default codec of each format, and codecs that take a compression level
+DEFAULT_CODECS = {"parquet": "snappy", "feather": "lz4"}
+LEVEL_CODECS = {"parquet": ("zstd", "gzip"), "feather": ("zstd", "lz4")}
+PARQUET_ENGINES = ("auto", "pyarrow", "fastparquet")
+# fastparquet names of codecs that differ, its "lz4" is the deprecated hadoop codec
+FASTPARQUET_CODECS = {"lz4": "LZ4_RAW"}
+
 
 @dataclass
 class DateInterval:
     from_date: datetime.date
     to_date: datetime.date
 
-    def get_date_range(self) -> pd.DatetimeIndex:
+    def get_date_range(self) -> "pd.DatetimeIndex":
         """Returns a pandas date range between from_date and to_date inclusive.
 
         Returns:
             pd.DatetimeIndex: date range
         """
+        import pandas as pd
+
         return pd.date_range(self.from_date, self.to_date)
 
+    def iter_dates(self) -> Iterator[datetime.date]:
+        """Iterates over dates between from_date and to_date inclusive.
+
+        Returns:
+            Iterator[datetime.date]: dates in ascending order
+        """
+        for days in range((self.to_date - self.from_date).days + 1):
+            yield self.from_date + datetime.timedelta(days=days)
+
     def __str__(self):
         return f"`{self.from_date.strftime(DATE_FMT)}` -> `{self.to_date.strftime(DATE_FMT)}`"
 
 
-def write_to_file(path: str, df: pd.DataFrame, filetype: str = "json"):
+@dataclass
+class WriterOptions:
+    """Options of the files written by `write_to_file`.
+
+    Attributes:
+        filetype (str): Format of the extractor output: parquet, feather (Arrow
+            IPC, requires pyarrow) or json
+        compression (str): Codec of parquet and feather files: snappy, zstd,
+            lz4, gzip or none. Feather supports zstd, lz4 and none. The default
+            of the format is used when not set (snappy, or lz4 for feather)
+        compression_level (int): Level of the codec, codec default when not set
+        row_group_size (int): Max rows of each parquet row group or feather
+            record batch, writer default when not set
+        sort_by (List[str]): Columns the rows are sorted by before writing,
+            pyarrow records the order in the parquet metadata
+        statistics (bool): Write min/max statistics of parquet column chunks
+        page_index (bool): Write the parquet page index (pyarrow only), which
+            lets readers skip pages within a row group
+        dictionary (bool): Dictionary encode parquet columns (pyarrow only)
+        engine (str): Parquet engine: auto (pyarrow when installed), pyarrow or
+            fastparquet
+    """
+
+    filetype: str = "parquet"
+    compression: Optional[str] = None
+    compression_level: Optional[int] = None
+    row_group_size: Optional[int] = None
+    sort_by: Optional[List[str]] = None
+    statistics: bool = True
+    page_index: bool = False
+    dictionary: bool = True
+    engine: str = "auto"
+
+    def __post_init__(self):
+        if self.filetype not in FILETYPES:
+            raise ValueError(f"Unsupported output format: `{self.filetype}`")
+        if self.compression is not None and self.compression not in CODECS:
+            raise ValueError(f"Unsupported compression: `{self.compression}`")
+        if self.engine not in PARQUET_ENGINES:
+            raise ValueError(f"Unsupported parquet engine: `{self.engine}`")
+        if self.filetype == "feather":
+            if not arrow_available():
+                raise ValueError("feather output requires pyarrow")
+            if self.compression is not None and self.compression not in FEATHER_CODECS:
+                raise ValueError(f"feather does not support `{self.compression}`")
+        codec = self.compression or DEFAULT_CODECS.get(self.filetype)
+        if self.compression_level is not None and self.filetype != "json":
+            if codec not in LEVEL_CODECS[self.filetype]:
+                raise ValueError(f"`{codec}` does not take a compression level")
+        if self.row_group_size is not None and self.row_group_size < 1:
+            raise ValueError("row_group_size must be at least 1")
+        if self.filetype == "parquet" and self.parquet_engine == "fastparquet":
+            if self.page_index or not self.dictionary:
+                log.warning("page index and dictionary options need pyarrow, ignored")
+
+    @property
+    def parquet_engine(self) -> str:
+        """Parquet engine used for writing, resolving `auto`."""
+        if self.engine == "auto":
+            return "pyarrow" if arrow_available() else "fastparquet"
+        return self.engine
+
+    @classmethod
+    def from_dict(cls, values: dict) -> "WriterOptions":
+        """Returns options from a dict of field values, e.g. a parsed config file.
+
+        Raises:
+            ValueError: raised on unknown fields or invalid values
+        """
+        fields = {f.name for f in dataclasses.fields(cls)}
+        unknown = set(values).difference(fields)
+        if unknown:
+            raise ValueError(f"Unknown writer options: {sorted(unknown)}")
+        return cls(**values)
+
+    @classmethod
+    def from_file(cls, path: str) -> "WriterOptions":
+        """Returns options from a JSON file holding an object of field values."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def write_to_file(
+    path: str,
+    df: "pd.DataFrame",
+    filetype: str = "json",
+    options: Optional[WriterOptions] = None,
+) -> int:
     """Write a dataframe to file path.
 
+    The file is written next to its destination first and then moved in place,
+    so an existing file is replaced atomically and readers never see partial
+    files.
+
     Args:
         path (str): Filepath on local filesystem
         df (pd.DataFrame): Dataframe to write
-        filetype (str, optional): Output filetype parquet or json (default)
+        filetype (str, optional): Output filetype parquet, feather or json
+            (default)
+        options (WriterOptions, optional): Codec, row group and sort options of
+            parquet and feather files, defaults of the format when not provided
 
     Raises:
         ValueError: raised when provided filetype is not recognized
+
+    Returns:
+        int: Size of the written file in bytes
     """
     # create directories if not exist
     path_dir = os.path.dirname(path)
     if path_dir:
         os.makedirs(path_dir, exist_ok=True)
 
-    log.info(f"writing {df.shape[0]} rows to {path}")
-    if filetype == "json":
-        return df.to_json(path)
-    elif filetype == "parquet":
-        return df.to_parquet(path)
-    else:
+    if filetype not in FILETYPES:
         raise ValueError(f"Unsupported output format: `{filetype}`")
+    options = options or WriterOptions()
+    if options.sort_by:
+        df = df.sort_values(options.sort_by, kind="stable", ignore_index=True)
+
+    log.info(f"writing {df.shape[0]} rows to {path}")
+    # hidden temporary file, ignored by dataset readers
+    filename = os.path.basename(path)
+    tmp_path = os.path.join(path_dir, f".{filename}.{uuid.uuid4()}.tmp")
+    try:
+        if filetype == "json":
+            df.to_json(tmp_path)
+        elif filetype == "feather":
+            # feather stores no index
+            df.reset_index(drop=True).to_feather(tmp_path, **_feather_kwargs(options))
+        else:
+            df.to_parquet(tmp_path, **_parquet_kwargs(options, df))
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return size
+
+
+def _parquet_kwargs(options: WriterOptions, df: "pd.DataFrame") -> dict:
+    """Returns the `DataFrame.to_parquet` arguments of the parquet engine."""
+    engine = options.parquet_engine
+    codec = options.compression or DEFAULT_CODECS["parquet"]
+    if engine == "pyarrow":
+        kwargs = {
+            "engine": engine,
+            "compression": None if codec == "none" else codec,
+            "compression_level": options.compression_level,
+            "row_group_size": options.row_group_size,
+            "write_statistics": options.statistics,
+            "write_page_index": options.page_index,
+            "use_dictionary": options.dictionary,
+        }
+        if options.sort_by:
+            import pyarrow.parquet as pq
+
+            kwargs["sorting_columns"] = [
+                pq.SortingColumn(df.columns.get_loc(name)) for name in options.sort_by
+            ]
+        return kwargs
+
+    compression = None if codec == "none" else FASTPARQUET_CODECS.get(codec, codec)
+    if compression and options.compression_level is not None:
+        compression = {
+            "_default": {
+                "type": compression,
+                "args": {"level": options.compression_level},
+            }
+        }
+    kwargs = {
+        "engine": engine,
+        "compression": compression,
+        # "auto" leaves out statistics of string columns, like fastparquet does
+        "stats": "auto" if options.statistics else False,
+    }
+    if options.row_group_size:
+        kwargs["row_group_offsets"] = options.row_group_size
+    return kwargs
+
+
+def _feather_kwargs(options: WriterOptions) -> dict:
+    """Returns the `DataFrame.to_feather` arguments."""
+    kwargs = {}
+    if options.compression:
+        kwargs["compression"] = (
+            "uncompressed" if options.compression == "none" else options.compression
+        )
+    if options.compression_level is not None:
+        kwargs["compression_level"] = options.compression_level
+    if options.row_group_size:
+        kwargs["chunksize"] = options.row_group_size
+    return kwargs
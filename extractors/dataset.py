@@ -0,0 +1,296 @@
+import calendar
+import datetime
+import logging as log
+import os
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Iterator, List, Optional, Sequence
+
+from .options import OUTPUT_DIR, WeatherExtractionType
+from .parsers import arrow_available
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+# rows of the record batches and frames returned while scanning
+BATCH_ROWS = 64 * 1024
+# file formats of the output, by file suffix
+FORMATS = {".parquet": "parquet", ".feather": "feather"}
+
+
+@dataclass
+class DatasetFilter:
+    """Rows selected from the extracted dataset, every row when nothing is set.
+
+    Attributes:
+        from_date (datetime.date): First day (UTC) of the selected timestamps
+        to_date (datetime.date): Last day (UTC) of the selected timestamps
+        variables (Sequence[int]): Selected variables
+        min_value (float): Smallest selected value
+        max_value (float): Largest selected value
+    """
+
+    from_date: Optional[datetime.date] = None
+    to_date: Optional[datetime.date] = None
+    variables: Optional[Sequence[int]] = None
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+
+    def overlaps(self, first_day: datetime.date, last_day: datetime.date) -> bool:
+        """Returns whether a partition of the given days may hold selected rows."""
+        if self.from_date and last_day < self.from_date:
+            return False
+        if self.to_date and first_day > self.to_date:
+            return False
+        return True
+
+    def conditions(self) -> List[tuple]:
+        """Returns the filter as (column, operator, value) conditions, all of
+        which must hold. Timestamps are compared to UTC datetimes."""
+        conditions = []
+        if self.from_date:
+            conditions.append(("timestamp", ">=", _day_start(self.from_date)))
+        if self.to_date:
+            next_day = self.to_date + datetime.timedelta(days=1)
+            conditions.append(("timestamp", "<", _day_start(next_day)))
+        if self.variables is not None:
+            conditions.append(("variable", "in", list(self.variables)))
+        if self.min_value is not None:
+            conditions.append(("value", ">=", self.min_value))
+        if self.max_value is not None:
+            conditions.append(("value", "<=", self.max_value))
+        return conditions
+
+    def to_expression(self) -> Optional["ds.Expression"]:
+        """Returns the filter as an arrow expression, pushed down to row groups."""
+        import pyarrow.dataset as ds
+
+        expression = None
+        for column, op, value in self.conditions():
+            condition = _compare(ds.field(column), op, value)
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def to_parquet_filters(self) -> List[tuple]:
+        """Returns the filter in the format of fastparquet's `filters`."""
+        import numpy as np
+
+        # fastparquet compares to the naive (UTC) timestamps of its statistics
+        return [
+            (
+                column,
+                op,
+                (
+                    np.datetime64(value.replace(tzinfo=None), "ns")
+                    if isinstance(value, datetime.datetime)
+                    else value
+                ),
+            )
+            for column, op, value in self.conditions()
+        ]
+
+    def apply(self, df: "pd.DataFrame") -> "pd.DataFrame":
+        """Returns the selected rows of a frame."""
+        mask = None
+        for column, op, value in self.conditions():
+            condition = _compare(df[column], op, value)
+            mask = condition if mask is None else mask & condition
+        return df if mask is None else df[mask]
+
+
+class WeatherDataset:
+    """Lazy reader of the partitioned output of one extraction type.
+
+    Only the files of the `year=/month=/day=` partitions overlapping the date
+    range of a filter are opened. The remaining conditions are pushed down to
+    the parquet reader, which skips row groups whose min/max statistics cannot
+    match (pyarrow, or fastparquet when pyarrow is not installed), and rows are
+    streamed back in chunks instead of loading the whole history.
+
+    A day extracted again after a compaction is removed from the compacted
+    files of its month (`remove_compacted_days`), its rows are only read from
+    its day file.
+
+    Example:
+        dataset = WeatherDataset(WeatherExtractionType.WIND)
+        june = DatasetFilter(date(2024, 6, 1), date(2024, 6, 30), variables=[991])
+        for df in dataset.iter_frames(june, columns=["timestamp", "value"]):
+            ...
+    """
+
+    def __init__(
+        self, extraction_type: WeatherExtractionType, output_dir: str = OUTPUT_DIR
+    ):
+        self.extraction_type = extraction_type
+        self.directory = os.path.join(output_dir, extraction_type.value)
+
+    def files(self, filter: Optional[DatasetFilter] = None) -> List[str]:
+        """Returns the data files of the partitions that may hold selected rows.
+
+        Args:
+            filter (DatasetFilter, optional): Selected rows
+
+        Returns:
+            List[str]: File paths, in partition order
+        """
+        filter = filter or DatasetFilter()
+        files = []
+        for year, year_dir in _partitions(self.directory, "year"):
+            if not filter.overlaps(
+                datetime.date(year, 1, 1), datetime.date(year, 12, 31)
+            ):
+                continue
+            for month, month_dir in _partitions(year_dir, "month"):
+                last_day = calendar.monthrange(year, month)[1]
+                first, last = datetime.date(year, month, 1), datetime.date(
+                    year, month, last_day
+                )
+                if not filter.overlaps(first, last):
+                    continue
+                # files of compactions, then files of single days
+                files.extend(_data_files(month_dir))
+                for day, day_dir in _partitions(month_dir, "day"):
+                    date = datetime.date(year, month, day)
+                    if filter.overlaps(date, date):
+                        files.extend(_data_files(day_dir))
+        log.debug(f"{self.extraction_type}: {len(files)} files match {filter}")
+        return files
+
+    def iter_batches(
+        self,
+        filter: Optional[DatasetFilter] = None,
+        columns: Optional[List[str]] = None,
+        batch_rows: int = BATCH_ROWS,
+    ) -> Iterator["pa.RecordBatch"]:
+        """Streams the selected rows as arrow record batches, requires pyarrow.
+
+        Args:
+            filter (DatasetFilter, optional): Selected rows, every row when not
+                provided
+            columns (List[str], optional): Selected columns, every column when
+                not provided
+            batch_rows (int, optional): Max rows of each batch
+
+        Raises:
+            ImportError: raised when pyarrow is not installed
+
+        Returns:
+            Iterator[pa.RecordBatch]: Batches of selected rows, empty batches are
+                left out
+        """
+        if not arrow_available():
+            raise ImportError("arrow record batches require pyarrow")
+        import pyarrow.dataset as ds
+
+        filter = filter or DatasetFilter()
+        expression = filter.to_expression()
+        files = self.files(filter)
+        for suffix, file_format in FORMATS.items():
+            format_files = [path for path in files if path.endswith(suffix)]
+            if not format_files:
+                continue
+            dataset = ds.dataset(format_files, format=file_format)
+            for batch in dataset.to_batches(
+                columns=columns, filter=expression, batch_size=batch_rows
+            ):
+                if batch.num_rows:
+                    yield batch
+
+    def iter_frames(
+        self,
+        filter: Optional[DatasetFilter] = None,
+        columns: Optional[List[str]] = None,
+        batch_rows: int = BATCH_ROWS,
+    ) -> Iterator["pd.DataFrame"]:
+        """Streams the selected rows as pandas frames.
+
+        Frames are converted from arrow record batches, or read file by file
+        with fastparquet when pyarrow is not installed (feather files need
+        pyarrow and are skipped).
+
+        Args:
+            filter (DatasetFilter, optional): Selected rows, every row when not
+                provided
+            columns (List[str], optional): Selected columns, every column when
+                not provided
+            batch_rows (int, optional): Max rows of each frame read with pyarrow
+
+        Returns:
+            Iterator[pd.DataFrame]: Frames of selected rows
+        """
+        if arrow_available():
+            for batch in self.iter_batches(filter, columns, batch_rows):
+                yield batch.to_pandas()
+            return
+
+        import pandas as pd
+
+        filter = filter or DatasetFilter()
+        filters = filter.to_parquet_filters() or None
+        for path in self.files(filter):
+            if not path.endswith(".parquet"):
+                log.warning(f"skipping {path}, reading feather files requires pyarrow")
+                continue
+            # fastparquet only skips row groups, rows are filtered here
+            df = filter.apply(
+                pd.read_parquet(path, engine="fastparquet", filters=filters)
+            )
+            if columns:
+                df = df[columns]
+            if len(df):
+                yield df.reset_index(drop=True)
+
+    def to_pandas(
+        self,
+        filter: Optional[DatasetFilter] = None,
+        columns: Optional[List[str]] = None,
+    ) -> "pd.DataFrame":
+        """Returns the selected rows as one frame."""
+        import pandas as pd
+
+        frames = list(self.iter_frames(filter, columns))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)
+
+
+def _compare(operand, op: str, value):
+    """Compares an arrow expression or pandas series to a value."""
+    if op == "in":
+        return operand.isin(value)
+    if op == ">=":
+        return operand >= value
+    if op == "<":
+        return operand < value
+    return operand <= value
+
+
+def _day_start(date: datetime.date) -> datetime.datetime:
+    return datetime.datetime(
+        date.year, date.month, date.day, tzinfo=datetime.timezone.utc
+    )
+
+
+def _partitions(directory: str, key: str) -> List[tuple]:
+    """Returns (value, path) of the `key=value` partitions of a directory."""
+    partitions = []
+    if not os.path.isdir(directory):
+        return partitions
+    for name in os.listdir(directory):
+        prefix, _, value = name.partition("=")
+        if prefix != key or not value.isdigit():
+            continue
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            partitions.append((int(value), path))
+    return sorted(partitions)
+
+
+def _data_files(directory: str) -> List[str]:
+    """Returns the data files directly in a directory, hidden files are ignored."""
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.endswith(tuple(FORMATS)) and not name.startswith((".", "_"))
+    )
@@ -2,5 +2,13 @@ class InvalidDateError(ValueError):
     pass
 
 
+class SchemaError(ValueError):
+    pass
+
+
 class ResourceDownError(RuntimeError):
     pass
+
+
+class AuthorizationError(ResourceDownError):
+    pass
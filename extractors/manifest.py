@@ -0,0 +1,130 @@
+import datetime
+import json
+import logging as log
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+
+class Manifest:
+    """Record of the (extraction type, date) pairs that were extracted successfully.
+
+    The manifest is an append-only JSON lines file, one entry per extracted day.
+    Appending a single line is atomic, so concurrent runs (threads or processes)
+    can record days to the same manifest, and a run that fails half way keeps
+    every day recorded before the failure. When a day is recorded multiple times
+    the last entry wins.
+
+    Entries hold the watermarks of the extracted version of a day: its latest
+    `last_modified_utc` and the ETag of its response, when the API sent one.
+
+    Example entry:
+        {"type": "solar", "date": "2024-06-18", "last_modified_utc": "...",
+         "etag": "..."}
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._entries: Dict[Tuple[str, str], dict] = {}
+        self.reload()
+
+    def reload(self):
+        """(Re)loads entries from the manifest file, if it exists."""
+        self._entries = {}
+        self._needs_newline = False
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path) as f:
+            for line_no, line in enumerate(f, start=1):
+                self._needs_newline = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                    self._entries[(entry["type"], entry["date"])] = entry
+                except (ValueError, KeyError):
+                    # a partially written line from an interrupted run
+                    log.warning(f"skipping invalid manifest line {line_no}")
+
+    def is_extracted(self, extraction_type: str, date: datetime.date) -> bool:
+        return (extraction_type, date.isoformat()) in self._entries
+
+    def missing_dates(
+        self, extraction_type: str, dates: Iterable[datetime.date]
+    ) -> List[datetime.date]:
+        """Returns the dates that were not extracted yet for an extraction type.
+
+        Args:
+            extraction_type (str): Extraction type name
+            dates (Iterable[datetime.date]): Dates to check
+
+        Returns:
+            List[datetime.date]: Dates missing from the manifest, in input order
+        """
+        return [d for d in dates if not self.is_extracted(extraction_type, d)]
+
+    def get(self, extraction_type: str, date: datetime.date) -> Optional[dict]:
+        """Returns the manifest entry of an extracted day, if any."""
+        return self._entries.get((extraction_type, date.isoformat()))
+
+    def record(
+        self,
+        extraction_type: str,
+        date: datetime.date,
+        last_modified_utc: Optional[str] = None,
+        **fields,
+    ):
+        """Records that a day was extracted successfully.
+
+        Args:
+            extraction_type (str): Extraction type name
+            date (datetime.date): Extracted date
+            last_modified_utc (str, optional): Last modified timestamp of the data
+            **fields: Additional fields to store with the entry
+        """
+        entry = {
+            "type": extraction_type,
+            "date": date.isoformat(),
+            "last_modified_utc": last_modified_utc,
+            **fields,
+        }
+        path_dir = os.path.dirname(self.path)
+        if path_dir:
+            os.makedirs(path_dir, exist_ok=True)
+        line = (json.dumps(entry) + "\n").encode()
+        if self._needs_newline:
+            # terminate the partial line left by an interrupted run
+            line = b"\n" + line
+            self._needs_newline = False
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+        self._entries[(extraction_type, entry["date"])] = entry
+
+
+@dataclass
+class Watermarks:
+    """Versions of the days of a run, used to skip the days that did not change.
+
+    Days are keyed by their url without query string. The ETags of `sent` are
+    sent as `If-None-Match`, days answered with 304 Not Modified are added to
+    `unchanged` and neither parsed nor written. Days whose data is not more
+    recent than their `last_modified` watermark are parsed but not written.
+
+    Attributes:
+        sent (Dict[str, str]): ETag of the extracted version of each day
+        last_modified (Dict[str, str]): Latest `last_modified_utc` of the
+            extracted version of each day
+        received (Dict[str, str]): ETag of each fetched response
+        unchanged (Set[str]): Days answered with 304 Not Modified
+    """
+
+    sent: Dict[str, str] = field(default_factory=dict)
+    last_modified: Dict[str, str] = field(default_factory=dict)
+    received: Dict[str, str] = field(default_factory=dict)
+    unchanged: Set[str] = field(default_factory=set)
+
+    def request_headers(self, key: str) -> Dict[str, str]:
+        """Returns the conditional request headers of a day."""
+        etag = self.sent.get(key)
+        return {"If-None-Match": etag} if etag else {}
@@ -0,0 +1,259 @@
+import contextlib
+import datetime
+import json
+import logging as log
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from .profiling import profile_stage
+
+if TYPE_CHECKING:
+    from .scheduler import RequestStats
+
+# pipeline stages, in order. Days found in the raw cache skip fetch and parse
+STAGES = ("cache_read", "fetch", "parse", "cache_write", "clean", "write", "rollup")
+METRIC_PREFIX = "weather_etl"
+
+
+@dataclass
+class StageMetrics:
+    """Totals of one pipeline stage during a run."""
+
+    calls: int = 0
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+
+
+@dataclass
+class RunSummary:
+    """Metrics of one extraction run.
+
+    Attributes:
+        started_at (str): ISO timestamp of the start of the run
+        elapsed_sec (float): Wall time of the run
+        extractors (Dict[str, float]): Wall time of each extractor pipeline
+        stages (Dict[str, StageMetrics]): Totals per stage: cache_read (lookups
+            and rows read from the raw cache), fetch (http requests and bytes
+            downloaded), parse, cache_write, clean, write (rows and bytes
+            written) and rollup (rows and bytes of rollups written)
+        requests (Dict[str, float]): Request counts and latency percentiles
+        url_latencies (Dict[str, float]): Latency of the successful request of
+            each url, in seconds
+    """
+
+    started_at: str
+    elapsed_sec: float
+    extractors: Dict[str, float]
+    stages: Dict[str, StageMetrics]
+    requests: Dict[str, float]
+    url_latencies: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    def log(self):
+        """Logs the summary as one structured event, without per url latencies."""
+        # imported on use, structlog takes longer to import than a no-op run
+        import structlog
+
+        # rendered as JSON and sent through standard logging, so that the event
+        # honours the logging configuration of the application
+        logger = structlog.wrap_logger(
+            log.getLogger(__name__), processors=[structlog.processors.JSONRenderer()]
+        )
+        summary = self.to_dict()
+        summary.pop("url_latencies")
+        logger.info("extraction_run", **summary)
+
+    def write(
+        self, json_path: Optional[str] = None, prometheus_path: Optional[str] = None
+    ):
+        """Writes the summary to the given JSON and Prometheus text files."""
+        if json_path:
+            self.write_json(json_path)
+        if prometheus_path:
+            self.write_prometheus(prometheus_path)
+
+    def write_json(self, path: str):
+        """Writes the summary to a JSON file."""
+        _write_atomic(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str):
+        """Writes the summary in the Prometheus text format.
+
+        The file is replaced atomically, as expected by the node exporter textfile
+        collector.
+        """
+        _write_atomic(path, self.to_prometheus())
+
+    def to_prometheus(self) -> str:
+        lines = []
+
+        def metric(name: str, help_text: str, samples: Dict[str, float]):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            for labels, value in samples.items():
+                lines.append(f"{METRIC_PREFIX}_{name}{labels} {value}")
+
+        started_at = datetime.datetime.fromisoformat(self.started_at)
+        metric(
+            "last_run_timestamp_seconds",
+            "Start of the last run.",
+            {
+                "": started_at.timestamp(),
+            },
+        )
+        metric("run_seconds", "Wall time of the last run.", {"": self.elapsed_sec})
+        metric(
+            "extractor_seconds",
+            "Wall time of each extractor.",
+            {f'{{extractor="{name}"}}': sec for name, sec in self.extractors.items()},
+        )
+        for key, help_text in (
+            ("seconds", "Time spent in each stage."),
+            ("calls", "Calls of each stage."),
+            ("rows", "Rows processed by each stage."),
+            ("bytes", "Bytes downloaded (fetch) or written (write)."),
+        ):
+            metric(
+                f"stage_{key}",
+                help_text,
+                {
+                    f'{{stage="{name}"}}': getattr(stage, key)
+                    for name, stage in self.stages.items()
+                },
+            )
+        metric(
+            "requests",
+            "Requests sent to the API by outcome.",
+            {
+                f'{{outcome="{name}"}}': self.requests[name]
+                for name in ("successes", "retries", "throttled", "failures")
+            },
+        )
+        metric(
+            "request_latency_seconds",
+            "Latency percentiles of requests.",
+            {
+                '{quantile="0.5"}': self.requests["latency_p50"],
+                '{quantile="0.9"}': self.requests["latency_p90"],
+                '{quantile="0.99"}': self.requests["latency_p99"],
+            },
+        )
+        return "\n".join(lines) + "\n"
+
+
+class RunMetrics:
+    """Thread safe collector of the metrics of a run.
+
+    Collectors are picklable, stages running in other processes record to their
+    own collector which is then merged into the collector of the run.
+    """
+
+    def __init__(self):
+        self.started_at = datetime.datetime.now(datetime.timezone.utc)
+        self.stages: Dict[str, StageMetrics] = defaultdict(StageMetrics)
+        self.extractors: Dict[str, float] = {}
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[StageMetrics]:
+        """Times a block of code as one call of a stage.
+
+        Yields:
+            StageMetrics: Metrics of this call, set rows and bytes on it
+        """
+        call = StageMetrics(calls=1)
+        start = time.perf_counter()
+        try:
+            with profile_stage(name):
+                yield call
+        finally:
+            call.seconds = time.perf_counter() - start
+            self.record(name, call)
+
+    def record(self, name: str, call: StageMetrics):
+        """Adds metrics of a stage call."""
+        with self._lock:
+            stage = self.stages[name]
+            stage.calls += call.calls
+            stage.seconds += call.seconds
+            stage.rows += call.rows
+            stage.bytes += call.bytes
+
+    def record_extractor(self, name: str, seconds: float):
+        with self._lock:
+            self.extractors[name] = seconds
+
+    def merge(self, other: "RunMetrics"):
+        """Adds the stage metrics recorded by another collector."""
+        for name, call in other.stages.items():
+            self.record(name, call)
+
+    def summary(self, request_stats: Optional["RequestStats"] = None) -> RunSummary:
+        """Returns the summary of the run so far.
+
+        Args:
+            request_stats (RequestStats, optional): Statistics of the requests
+                of the run
+
+        Returns:
+            RunSummary: Summary of the run
+        """
+        if request_stats is None:
+            from .scheduler import RequestStats
+
+            request_stats = RequestStats()
+        with self._lock:
+            stages = {
+                name: StageMetrics(**asdict(self.stages[name]))
+                for name in STAGES
+                if name in self.stages
+            }
+            extractors = dict(self.extractors)
+        return RunSummary(
+            started_at=self.started_at.isoformat(),
+            elapsed_sec=time.perf_counter() - self._start,
+            extractors=extractors,
+            stages=stages,
+            requests={
+                "requests": request_stats.requests,
+                "successes": request_stats.successes,
+                "retries": request_stats.retries,
+                "throttled": request_stats.throttled,
+                "failures": request_stats.failures,
+                "sleep_sec": request_stats.sleep_sec,
+                "latency_p50": request_stats.latency_percentile(50),
+                "latency_p90": request_stats.latency_percentile(90),
+                "latency_p99": request_stats.latency_percentile(99),
+            },
+            url_latencies=dict(request_stats.url_latencies),
+        )
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["stages"] = dict(self.stages)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.stages = defaultdict(StageMetrics, self.stages)
+        self._lock = threading.Lock()
+
+
+def _write_atomic(path: str, content: str):
+    path_dir = os.path.dirname(path)
+    if path_dir:
+        os.makedirs(path_dir, exist_ok=True)
+    tmp_path = os.path.join(path_dir, f".{os.path.basename(path)}.{uuid.uuid4()}.tmp")
+    with open(tmp_path, "w") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
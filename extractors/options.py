@@ -0,0 +1,138 @@
+import datetime
+import enum
+import logging as log
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from .core import DateInterval, WriterOptions
+from .manifest import Manifest
+from .parsers import ReaderEngine
+from .registry import ExtractorType
+
+# initial request rate, adapted to throttling of the API during a run
+MAX_REQUESTS_PER_SEC = 50
+# upper bound of in-flight requests when fetching asynchronously
+MAX_CONCURRENT_REQUESTS = 8
+
+# extractor output is written to disk
+OUTPUT_DIR = "./output"
+# successfully extracted days are recorded in the manifest
+MANIFEST_PATH = f"{OUTPUT_DIR}/_manifest.jsonl"
+# profiles of the pipeline stages, skipped by the dataset reader and compaction
+PROFILE_DIR = f"{OUTPUT_DIR}/_profile"
+# raw API responses are cached here, outside of the output dataset
+CACHE_DIR = "./cache"
+
+
+class WeatherExtractionType(enum.Enum):
+    SOLAR = "solar"
+    WIND = "wind"
+
+
+class FetchMode(enum.Enum):
+    SYNC = "sync"
+    ASYNC = "async"
+
+
+@dataclass
+class ExtractionOptions:
+    """Runtime options of the extraction pipeline.
+
+    Attributes:
+        extractors (Sequence[str]): Names of the registered data types to
+            extract (see `extractors.registry`), every registered type when
+            not set
+        fetch_mode (FetchMode): Fetch days one by one (sync) or concurrently (async)
+        max_concurrency (int): Max in-flight requests when fetching asynchronously
+        parallel (bool): Run the pipelines of all extraction types at the same time
+        use_processes (bool): Clean and write in a process pool instead of the
+            thread running the pipeline
+        max_request_rate (float): Initial requests per second sent to the API
+        manifest_path (str): Manifest of extracted days, when set only days
+            missing from the manifest are extracted
+        full_refresh (bool): Extract every day even if it is in the manifest
+        refresh (bool): Check the days of the manifest for changes too. Days
+            are fetched with conditional requests and only rewritten when
+            their `last_modified_utc` watermark advanced
+        compact_values (bool): Store `value` as float32 instead of float64
+        reader_engine (ReaderEngine): Parse responses with pandas or pyarrow,
+            pandas is used when pyarrow is not installed
+        batch_days (int): Stream the extraction in batches of this many days,
+            each batch is fetched, cleaned and written before the next one so
+            that memory use does not grow with the timespan. The whole
+            timespan is processed at once when not set
+        metrics_json_path (str): Write the run summary to this JSON file
+        metrics_prometheus_path (str): Write the run summary to this file in the
+            Prometheus text format (e.g. for the node exporter textfile collector)
+        cache_dir (str): Cache raw API responses in this directory and read
+            through it, nothing is cached when not set. Online `full_refresh`
+            and `refresh` runs fetch every day from the API and only write
+            the responses to the cache
+        cache_ttl_sec (float): Refetch days cached longer ago than this
+        cache_max_bytes (int): Evict least recently used entries of the cache
+            above this size
+        offline (bool): Extract from the cache only, days that are not cached
+            are skipped. Requires `cache_dir`
+        writer (WriterOptions): Format, codec, row groups and sort order of the
+            output files
+        rollups (Sequence[str]): Granularities (hourly, daily) of the mean, min
+            and max per variable written next to the output, none by default
+        profile_dir (str): Profile the stages of the run (fetch, parse, clean,
+            write...) and write their reports to a directory per run below
+            this one, see `extractors.profiling.StageProfiler`
+    """
+
+    extractors: Optional[Sequence[str]] = None
+    fetch_mode: FetchMode = FetchMode.SYNC
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS
+    parallel: bool = True
+    use_processes: bool = False
+    max_request_rate: float = MAX_REQUESTS_PER_SEC
+    manifest_path: Optional[str] = None
+    full_refresh: bool = False
+    refresh: bool = False
+    compact_values: bool = False
+    reader_engine: ReaderEngine = ReaderEngine.PANDAS
+    batch_days: Optional[int] = None
+    metrics_json_path: Optional[str] = None
+    metrics_prometheus_path: Optional[str] = None
+    cache_dir: Optional[str] = None
+    cache_ttl_sec: Optional[float] = None
+    cache_max_bytes: Optional[int] = None
+    offline: bool = False
+    writer: WriterOptions = field(default_factory=WriterOptions)
+    rollups: Sequence[str] = ()
+    profile_dir: Optional[str] = None
+
+
+def get_pending_dates(
+    extraction_types: Iterable[ExtractorType],
+    timespan: DateInterval,
+    manifest: Optional[Manifest] = None,
+) -> Dict[ExtractorType, List[datetime.date]]:
+    """Returns the dates of the timespan that still have to be extracted.
+
+    Args:
+        extraction_types (Iterable[ExtractorType]): Weather data types, specs
+            or `WeatherExtractionType` members
+        timespan (DateInterval): Timespan with date range
+        manifest (Manifest, optional): Manifest of extracted days, every date is
+            pending when not provided
+
+    Returns:
+        Dict[ExtractorType, List[datetime.date]]: Pending dates of each
+            extraction type, types without pending dates are left out
+    """
+    dates = list(timespan.iter_dates())
+    pending = {}
+    for extraction_type in extraction_types:
+        missing = dates
+        if manifest:
+            missing = manifest.missing_dates(extraction_type.value, dates)
+            log.info(
+                f"extractor:{extraction_type} {len(dates) - len(missing)} of "
+                f"{len(dates)} days already extracted"
+            )
+        if missing:
+            pending[extraction_type] = missing
+    return pending
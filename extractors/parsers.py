@@ -0,0 +1,115 @@
+import enum
+import importlib.util
+import io
+import json
+from typing import TYPE_CHECKING, Dict, Union
+
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+
+# pandas and the optional pyarrow dependency are imported on first use, so that
+# the package loads quickly when nothing has to be parsed
+
+# schema types besides "timestamp" (UTC), named after their arrow type alias
+SCHEMA_TYPES = {"int16", "int32", "int64", "float32", "float64", "string"}
+
+Source = Union[str, bytes, io.IOBase]
+
+
+class ReaderEngine(enum.Enum):
+    PANDAS = "pandas"
+    ARROW = "arrow"
+
+
+def arrow_available() -> bool:
+    """Returns whether the optional pyarrow dependency is installed."""
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def read_csv_arrow(source: Source, schema: Dict[str, str]) -> "pd.DataFrame":
+    """Reads CSV data with pyarrow using an explicit schema.
+
+    Types are not inferred and timestamps are parsed natively by arrow.
+
+    Args:
+        source (Source): Url, raw bytes or binary file object
+        schema (Dict[str, str]): Column names mapped to types, e.g. int16,
+            float64 or timestamp
+
+    Returns:
+        pd.DataFrame: Parsed data with columns of the schema
+    """
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    convert_options = pa_csv.ConvertOptions(
+        column_types={name: _arrow_type(dtype) for name, dtype in schema.items()},
+        include_columns=list(schema),
+    )
+    table = pa_csv.read_csv(
+        pa.BufferReader(_read_bytes(source)), convert_options=convert_options
+    )
+    return table.to_pandas()
+
+
+def read_json_arrow(
+    source: Source, schema: Dict[str, str], timestamp_unit: str = "ms"
+) -> "pd.DataFrame":
+    """Reads a JSON array of records into arrow arrays using an explicit schema.
+
+    pyarrow only reads newline delimited JSON, so records are decoded with the
+    standard library and converted column by column to typed arrow arrays.
+
+    Args:
+        source (Source): Url, raw bytes or binary file object
+        schema (Dict[str, str]): Column names mapped to types, e.g. int16,
+            float64 or timestamp
+        timestamp_unit (str, optional): Unit of epoch timestamps in the records
+
+    Raises:
+        ValueError: raised when the payload is not a JSON array of records with
+            the columns of the schema
+
+    Returns:
+        pd.DataFrame: Parsed data with columns of the schema
+    """
+    import pyarrow as pa
+
+    records = json.loads(_read_bytes(source))
+    arrays = []
+    try:
+        for name, dtype in schema.items():
+            values = [record[name] for record in records]
+            if dtype == "timestamp":
+                epoch_type = pa.timestamp(timestamp_unit, tz="UTC")
+                array = pa.array(values, type=epoch_type).cast(_arrow_type(dtype))
+            else:
+                array = pa.array(values, type=_arrow_type(dtype))
+            arrays.append(array)
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"JSON records do not match schema: {e}") from e
+    return pa.Table.from_arrays(arrays, names=list(schema)).to_pandas()
+
+
+def _arrow_type(dtype: str) -> "pa.DataType":
+    import pyarrow as pa
+
+    if dtype == "timestamp":
+        return pa.timestamp("ns", tz="UTC")
+    if dtype not in SCHEMA_TYPES:
+        raise ValueError(f"Unsupported schema type: `{dtype}`")
+    return pa.type_for_alias(dtype)
+
+
+def _read_bytes(source: Source) -> bytes:
+    """Returns the content of an url, bytes or file object."""
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, str):
+        import urllib.request
+
+        # urllib errors are left to the caller, which retries them
+        with urllib.request.urlopen(source) as response:
+            return response.read()
+    return source.read()
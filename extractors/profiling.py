@@ -0,0 +1,242 @@
+import collections
+import contextlib
+import cProfile
+import datetime
+import logging as log
+import os
+import pstats
+import sys
+import threading
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# interval of the stack samples of the flame graph
+SAMPLE_INTERVAL_SEC = 0.005
+# functions listed in the text report of each stage
+REPORT_LINES = 40
+# allocation sites listed for each stage
+ALLOCATION_LINES = 15
+# snapshots of the allocation sites are slow, one is only taken when the peak
+# of a stage grows by this factor
+SNAPSHOT_PEAK_GROWTH = 1.25
+
+# profiler of the run in progress, stages are only profiled while one is active
+_active: Optional["StageProfiler"] = None
+
+
+@dataclass
+class _StageMemory:
+    calls: int = 0
+    peak_bytes: int = 0
+    # peak of the call whose allocation sites were recorded
+    snapshot_bytes: int = 0
+    # allocation sites alive at the end of a call close to the highest peak
+    top_allocations: List[str] = field(default_factory=list)
+
+
+class StageProfiler:
+    """Profiles the stages of a run: cProfile, stack samples and allocations.
+
+    Every thread entering a stage (`profile_stage`) profiles it with its own
+    cProfile session, merged per stage when the reports are written. A stage
+    entered within another one (e.g. parse within an async fetch) is profiled
+    on its own while it runs. A sampling thread records the stacks of threads
+    inside a stage for a flame graph, and tracemalloc records the peak memory
+    of each stage; peaks of stages running at the same time overlap.
+
+    Transforms running in a process pool (`use_processes`) are not profiled.
+
+    Reports, in a directory per run:
+        <stage>.pstats: cProfile statistics, e.g. for snakeviz or pstats
+        <stage>.txt: functions sorted by cumulative time
+        stacks.collapsed: folded stacks rooted at the stage, for flamegraph.pl
+            or speedscope
+        memory.txt: peak traced memory and allocation sites of each stage
+
+    Example:
+        with StageProfiler("output/_profile"):
+            run_weather_extractors(timespan, api_key, options)
+    """
+
+    def __init__(self, directory: str, memory: bool = True):
+        self.directory = directory
+        self.memory = memory
+        self.samples: Dict[str, int] = collections.Counter()
+        self._profiles: Dict[Tuple[str, int], cProfile.Profile] = {}
+        self._memory: Dict[str, _StageMemory] = collections.defaultdict(_StageMemory)
+        # stages entered by each thread, innermost last
+        self._stacks: Dict[int, List[str]] = collections.defaultdict(list)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started_tracemalloc = False
+
+    def start(self):
+        """Makes the profiler the active one and starts sampling."""
+        global _active
+        if _active is not None:
+            raise RuntimeError("another run is being profiled")
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._stop.clear()
+        self._sampler = threading.Thread(
+            target=self._sample, name="profiler", daemon=True
+        )
+        self._sampler.start()
+        _active = self
+
+    def stop(self):
+        """Stops sampling and deactivates the profiler."""
+        global _active
+        _active = None
+        self._stop.set()
+        if self._sampler:
+            self._sampler.join()
+            self._sampler = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def __enter__(self) -> "StageProfiler":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.stop()
+        self.write()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Profiles a block of code as one call of a stage, in this thread."""
+        thread_id = threading.get_ident()
+        stack = self._stacks[thread_id]
+        outer = self._profiles.get((stack[-1], thread_id)) if stack else None
+        profile = self._profile(name, thread_id)
+        if outer:
+            outer.disable()
+        memory_start = self._memory_start()
+        stack.append(name)
+        try:
+            profile.enable()
+        except ValueError:
+            # another profiler (e.g. a debugger) is active in this thread
+            profile = None
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+            stack.pop()
+            self._record_memory(name, memory_start)
+            if outer:
+                outer.enable()
+
+    def write(self) -> str:
+        """Writes the reports of the profiled stages.
+
+        Returns:
+            str: Directory of the reports
+        """
+        stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S")
+        directory = os.path.join(self.directory, f"{stamp}-{os.getpid()}")
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            profiles = dict(self._profiles)
+        stages = sorted({stage for stage, _ in profiles})
+        for stage in stages:
+            stats = None
+            for (name, _), profile in profiles.items():
+                if name != stage:
+                    continue
+                profile.create_stats()
+                if not profile.stats:
+                    continue
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            if stats is None:
+                continue
+            stats.dump_stats(os.path.join(directory, f"{stage}.pstats"))
+            with open(os.path.join(directory, f"{stage}.txt"), "w") as f:
+                stats.stream = f
+                stats.sort_stats("cumulative").print_stats(REPORT_LINES)
+        with open(os.path.join(directory, "stacks.collapsed"), "w") as f:
+            for stack, count in sorted(self.samples.items()):
+                f.write(f"{stack} {count}\n")
+        if self._memory:
+            with open(os.path.join(directory, "memory.txt"), "w") as f:
+                for stage, memory in sorted(self._memory.items()):
+                    f.write(
+                        f"{stage}: {memory.calls} calls, peak "
+                        f"{memory.peak_bytes / 2**20:.1f} MiB\n"
+                    )
+                    for line in memory.top_allocations:
+                        f.write(f"    {line}\n")
+        log.info(f"profiles of {len(stages)} stages written to {directory}")
+        return directory
+
+    def _profile(self, name: str, thread_id: int) -> cProfile.Profile:
+        with self._lock:
+            profile = self._profiles.get((name, thread_id))
+            if profile is None:
+                profile = cProfile.Profile()
+                self._profiles[(name, thread_id)] = profile
+        return profile
+
+    def _memory_start(self) -> Optional[int]:
+        if not tracemalloc.is_tracing():
+            return None
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        return current
+
+    def _record_memory(self, name: str, start: Optional[int]):
+        if start is None or not tracemalloc.is_tracing():
+            return
+        _, peak = tracemalloc.get_traced_memory()
+        peak_bytes = max(peak - start, 0)
+        with self._lock:
+            memory = self._memory[name]
+            memory.calls += 1
+            if peak_bytes <= memory.peak_bytes:
+                return
+            snapshot = peak_bytes > memory.snapshot_bytes * SNAPSHOT_PEAK_GROWTH
+            memory.peak_bytes = peak_bytes
+            if not snapshot:
+                return
+            memory.snapshot_bytes = peak_bytes
+        statistics = tracemalloc.take_snapshot().statistics("lineno")
+        top_allocations = [str(stat) for stat in statistics[:ALLOCATION_LINES]]
+        with self._lock:
+            if memory.snapshot_bytes == peak_bytes:
+                memory.top_allocations = top_allocations
+
+    def _sample(self):
+        while not self._stop.wait(SAMPLE_INTERVAL_SEC):
+            frames = sys._current_frames()
+            for thread_id, stack in list(self._stacks.items()):
+                frame = frames.get(thread_id)
+                # the stack of the thread may change while it is sampled
+                stage = stack[-1] if stack else None
+                if stage is None or frame is None:
+                    continue
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                self.samples[";".join([stage, *reversed(names)])] += 1
+
+
+@contextlib.contextmanager
+def profile_stage(name: str) -> Iterator[None]:
+    """Profiles a block of code as a stage when a run is being profiled."""
+    profiler = _active
+    if profiler is None:
+        yield
+        return
+    with profiler.stage(name):
+        yield
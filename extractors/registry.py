@@ -0,0 +1,176 @@
+import enum
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Union
+
+from .parsers import SCHEMA_TYPES
+
+# raw column names of the weather API mapped to clean column names
+COLUMN_MAPPING = {
+    "Naive_Timestamp ": "timestamp",
+    " Variable": "variable",
+    "value": "value",
+    "Last Modified utc": "last_modified_utc",
+}
+# schema of the raw API data used by the readers
+RAW_SCHEMA = {
+    "Naive_Timestamp ": "timestamp",
+    " Variable": "int16",
+    "value": "float64",
+    "Last Modified utc": "timestamp",
+}
+# columns of the clean data, every extractor is mapped to them
+CLEAN_COLUMNS = ("timestamp", "variable", "value", "last_modified_utc")
+# formats of the API responses
+WIRE_FORMATS = ("csv", "json")
+# output partitions of each day, below the directory of the extraction type.
+# Shared by every type, the rollups, compaction and `WeatherDataset` rely on it
+DAY_PARTITIONING = "year=%Y/month=%m/day=%d"
+
+
+@dataclass(frozen=True)
+class ExtractorSpec:
+    """Declarative description of a data type served by the weather API.
+
+    Every registered type runs through the same engine (`run_weather_extractors`),
+    with its fetch modes, scheduling, caching, batching, metrics and outputs.
+
+    Attributes:
+        name (str): Name of the type, used for the output directory and the
+            manifest
+        path (str): Path of the daily endpoint relative to the API, `{date}`
+            is replaced by the ISO date, e.g. `{date}/renewables/windgen.csv`
+        wire_format (str): Format of the responses, csv or json
+        schema (Mapping[str, str]): Raw columns mapped to their type (int16,
+            float64, timestamp...)
+        column_mapping (Mapping[str, str]): Raw columns mapped to the clean
+            columns (timestamp, variable, value, last_modified_utc)
+        timestamp_unit (str): Unit of epoch timestamps in JSON records
+        reader_options (Mapping[str, Any]): Extra arguments of the pandas reader
+            (`pd.read_csv` or `pd.read_json`)
+
+    Outputs are written to `OUTPUT_DIR/<name>`, partitioned by day like every
+    other type (DAY_PARTITIONING).
+    """
+
+    name: str
+    path: str
+    wire_format: str = "csv"
+    schema: Mapping[str, str] = field(default_factory=lambda: dict(RAW_SCHEMA))
+    column_mapping: Mapping[str, str] = field(
+        default_factory=lambda: dict(COLUMN_MAPPING)
+    )
+    timestamp_unit: str = "ms"
+    reader_options: Mapping[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        if not self.name or "/" in self.name:
+            raise ValueError(f"invalid extractor name: `{self.name}`")
+        if "{date}" not in self.path:
+            raise ValueError(f"endpoint path of {self.name} has no `{{date}}`")
+        if self.wire_format not in WIRE_FORMATS:
+            raise ValueError(f"unsupported wire format: `{self.wire_format}`")
+        for dtype in self.schema.values():
+            if dtype != "timestamp" and dtype not in SCHEMA_TYPES:
+                raise ValueError(f"unsupported schema type: `{dtype}`")
+        if set(self.column_mapping) != set(self.schema):
+            raise ValueError(f"column mapping of {self.name} must map the schema")
+        if sorted(self.column_mapping.values()) != sorted(CLEAN_COLUMNS):
+            raise ValueError(f"columns of {self.name} must map to {CLEAN_COLUMNS}")
+
+    # the mappings of a spec are not hashable, names are unique
+    def __hash__(self) -> int:
+        return hash(self.name)
+
+    @property
+    def value(self) -> str:
+        """Name of the type, as the `value` of `WeatherExtractionType` members,
+        so that specs are accepted wherever a member is."""
+        return self.name
+
+    @property
+    def dtypes(self) -> Dict[str, str]:
+        """Types of the raw columns that are not timestamps, applied by the pandas
+        readers. Timestamps are parsed once per batch by `clean_columns`."""
+        return {
+            name: dtype for name, dtype in self.schema.items() if dtype != "timestamp"
+        }
+
+    def __str__(self) -> str:
+        return self.name
+
+
+ExtractorType = Union[ExtractorSpec, enum.Enum, str]
+
+_registry: Dict[str, ExtractorSpec] = {}
+_lock = threading.Lock()
+
+
+def register_extractor(spec: ExtractorSpec, replace: bool = False) -> ExtractorSpec:
+    """Registers the spec of a data type, extracted by later runs.
+
+    Args:
+        spec (ExtractorSpec): Spec of the type
+        replace (bool, optional): Replace a spec registered with the same name
+
+    Raises:
+        ValueError: raised when a type of the same name is already registered
+
+    Returns:
+        ExtractorSpec: The registered spec
+    """
+    with _lock:
+        if spec.name in _registry and not replace:
+            raise ValueError(f"extractor already registered: `{spec.name}`")
+        _registry[spec.name] = spec
+    return spec
+
+
+def unregister_extractor(name: str):
+    """Removes a registered type, if any."""
+    with _lock:
+        _registry.pop(name, None)
+
+
+def get_extractor(extraction_type: ExtractorType) -> ExtractorSpec:
+    """Returns the spec of a data type.
+
+    Args:
+        extraction_type (ExtractorType): Spec, `WeatherExtractionType` member or
+            name of a registered type
+
+    Raises:
+        NotImplementedError: raised when no type of that name is registered
+
+    Returns:
+        ExtractorSpec: Spec of the type
+    """
+    if isinstance(extraction_type, ExtractorSpec):
+        return extraction_type
+    name = (
+        extraction_type.value
+        if isinstance(extraction_type, enum.Enum)
+        else extraction_type
+    )
+    spec = _registry.get(name)
+    if spec is None:
+        raise NotImplementedError(f"No registered extractor for: {extraction_type}")
+    return spec
+
+
+def get_extractors(names: Optional[Iterable[str]] = None) -> List[ExtractorSpec]:
+    """Returns the specs of the given types, every registered type by default,
+    in registration order."""
+    if names is None:
+        return list(_registry.values())
+    return [get_extractor(name) for name in names]
+
+
+register_extractor(
+    ExtractorSpec(
+        name="solar",
+        path="{date}/renewables/solargen.json",
+        wire_format="json",
+    )
+)
+register_extractor(ExtractorSpec(name="wind", path="{date}/renewables/windgen.csv"))
@@ -0,0 +1,71 @@
+import datetime
+import os
+from typing import TYPE_CHECKING
+
+from .options import OUTPUT_DIR, WeatherExtractionType
+from .registry import DAY_PARTITIONING
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# rollup granularities mapped to the period their timestamps are floored to
+ROLLUPS = {"hourly": "h", "daily": "D"}
+
+
+def compute_rollup(df: "pd.DataFrame", granularity: str) -> "pd.DataFrame":
+    """Aggregates clean data per period and variable.
+
+    Args:
+        df (pd.DataFrame): Clean data, see `clean_columns`
+        granularity (str): Rollup granularity, a key of ROLLUPS
+
+    Raises:
+        ValueError: raised when the granularity is not recognized
+
+    Returns:
+        pd.DataFrame: One row per period (start `timestamp`, UTC) and `variable`
+            with the mean, min, max and count of `value`, and the latest
+            `last_modified_utc` of the period, sorted by timestamp and variable
+    """
+    freq = ROLLUPS.get(granularity)
+    if not freq:
+        raise ValueError(f"Unsupported rollup: `{granularity}`")
+    period = df["timestamp"].dt.floor(freq)
+    return (
+        df.groupby([period, df["variable"]], sort=True)
+        .agg(
+            mean=("value", "mean"),
+            min=("value", "min"),
+            max=("value", "max"),
+            count=("value", "count"),
+            last_modified_utc=("last_modified_utc", "max"),
+        )
+        .reset_index()
+    )
+
+
+def rollup_dir(granularity: str, output_dir: str = OUTPUT_DIR) -> str:
+    """Returns the root of a rollup dataset, partitioned like the output.
+
+    `WeatherDataset` and `compact_output` take it as their output directory.
+    """
+    return os.path.join(output_dir, "rollups", granularity)
+
+
+def make_rollup_filepath(
+    date: datetime.date,
+    extraction_type: WeatherExtractionType,
+    granularity: str,
+    filetype: str,
+    output_dir: str = OUTPUT_DIR,
+) -> str:
+    """Returns the filepath of the rollup of a single day.
+
+    Paths are deterministic, extracting a day again replaces its rollups.
+
+    Example path structure:
+        rollups/hourly/solar/year=2024/month=06/day=18/data.parquet
+    """
+    day_format = date.strftime(DAY_PARTITIONING)
+    path = os.path.join(rollup_dir(granularity, output_dir), extraction_type.value)
+    return f"{path}/{day_format}/data.{filetype}"
@@ -0,0 +1,155 @@
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+# http status codes that are worth retrying, everything else fails fast
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class RequestStats:
+    """Statistics of the requests made through a scheduler during one run."""
+
+    requests: int = 0
+    successes: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failures: int = 0
+    sleep_sec: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    # latency of the successful request of each url
+    url_latencies: Dict[str, float] = field(default_factory=dict)
+
+    def latency_percentile(self, percentile: float) -> float:
+        """Returns the latency percentile (0-100) of successful requests in seconds."""
+        if not self.latencies:
+            return 0.0
+        latencies = sorted(self.latencies)
+        index = round(percentile / 100 * (len(latencies) - 1))
+        return latencies[index]
+
+    def __str__(self):
+        return (
+            f"requests:{self.requests} successes:{self.successes} "
+            f"retries:{self.retries} throttled:{self.throttled} "
+            f"failures:{self.failures} slept:{self.sleep_sec:.2f}s "
+            f"p50:{self.latency_percentile(50):.3f}s "
+            f"p99:{self.latency_percentile(99):.3f}s"
+        )
+
+
+class RequestScheduler:
+    """Shared request scheduler: adaptive token bucket plus jittered backoff.
+
+    Requests take a token from a bucket refilled at `rate` tokens per second.
+    The rate grows additively while the observed share of throttled (429)
+    responses stays under `target_throttle_ratio` and is cut multiplicatively
+    when it goes above it. Providers that throttle at random then keep the
+    full rate, while providers that throttle on load get slowed down.
+
+    The scheduler is thread safe and can be shared by sync and async callers.
+    """
+
+    def __init__(
+        self,
+        rate: float = 50.0,
+        max_rate: float = 200.0,
+        min_rate: float = 1.0,
+        max_retries: int = 5,
+        base_delay_sec: float = 0.1,
+        max_delay_sec: float = 5.0,
+        target_throttle_ratio: float = 0.35,
+    ):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.max_retries = max_retries
+        self.base_delay_sec = base_delay_sec
+        self.max_delay_sec = max_delay_sec
+        self.target_throttle_ratio = target_throttle_ratio
+        self.stats = RequestStats()
+
+        self._tokens = rate
+        self._refilled_at = time.monotonic()
+        # exponentially weighted share of throttled responses
+        self._throttle_ratio = 0.0
+        self._decreased_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request can be sent."""
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        """Waits until a request can be sent without blocking the event loop."""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def backoff(self, attempt: int) -> float:
+        """Returns the delay before retry `attempt` (0 based), using full jitter."""
+        delay = random.uniform(
+            0, min(self.max_delay_sec, self.base_delay_sec * 2**attempt)
+        )
+        with self._lock:
+            self.stats.retries += 1
+            self.stats.sleep_sec += delay
+        return delay
+
+    def record_success(self, latency: float, url: Optional[str] = None):
+        """Records a successful request, `url` should not contain credentials."""
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.successes += 1
+            self.stats.latencies.append(latency)
+            if url:
+                self.stats.url_latencies[url] = latency
+            self._update_rate(throttled=False)
+
+    def record_failure(self, status: Optional[int] = None):
+        """Records a failed attempt, `status` is the http status code if any."""
+        with self._lock:
+            self.stats.requests += 1
+            if status == 429:
+                self.stats.throttled += 1
+            self._update_rate(throttled=status == 429)
+
+    def record_giveup(self):
+        """Records a request that was abandoned after its last attempt."""
+        with self._lock:
+            self.stats.failures += 1
+
+    @staticmethod
+    def is_retryable(status: Optional[int]) -> bool:
+        """Returns whether a failure is transient, `None` means no http response."""
+        return status is None or status in RETRYABLE_STATUS_CODES
+
+    def _reserve(self) -> float:
+        """Takes a token and returns how long the caller has to wait for it."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.rate, self._tokens + (now - self._refilled_at) * self.rate
+            )
+            self._refilled_at = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def _update_rate(self, throttled: bool):
+        # must be called with the lock held
+        self._throttle_ratio = 0.9 * self._throttle_ratio + 0.1 * throttled
+        now = time.monotonic()
+        # cut the rate at most once per second so that it can take effect
+        if self._throttle_ratio > self.target_throttle_ratio:
+            if now - self._decreased_at >= 1:
+                self.rate = max(self.min_rate, self.rate * 0.5)
+                self._decreased_at = now
+        elif not throttled:
+            self.rate = min(self.max_rate, self.rate + 1)
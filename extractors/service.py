@@ -0,0 +1,240 @@
+import datetime
+import json
+import logging as log
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Optional
+
+from .core import DateInterval
+from .metrics import METRIC_PREFIX, RunSummary
+from .options import ExtractionOptions, FetchMode
+
+if TYPE_CHECKING:
+    import httpx
+
+# time between two polls for new days
+POLL_INTERVAL_SEC = 15 * 60
+# days checked by each poll, ending today. Extracted days are skipped through
+# the manifest, so a poll only fetches the days that are new since the last one
+LOOKBACK_DAYS = 7
+# port of the health and metrics endpoints, 0 picks a free port
+HEALTH_PORT = 8080
+
+
+@dataclass
+class ServiceStatus:
+    """State of the service, reported by the health endpoint.
+
+    Attributes:
+        started_at (str): ISO timestamp of the start of the service
+        runs (int): Polls that ran an extraction
+        failures (int): Polls whose extraction failed
+        last_run_at (str): ISO timestamp of the start of the last poll
+        last_success_at (str): ISO timestamp of the end of the last successful poll
+        last_error (str): Error of the last poll, if it failed
+        last_summary (RunSummary): Metrics of the last successful poll
+    """
+
+    started_at: str
+    runs: int = 0
+    failures: int = 0
+    last_run_at: Optional[str] = None
+    last_success_at: Optional[str] = None
+    last_error: Optional[str] = None
+    last_summary: Optional[RunSummary] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.last_error is None
+
+    def to_dict(self) -> dict:
+        return {
+            "status": "ok" if self.healthy else "failing",
+            "started_at": self.started_at,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_success_at": self.last_success_at,
+            "last_error": self.last_error,
+        }
+
+    def to_prometheus(self) -> str:
+        """Returns the service gauges followed by the metrics of the last run."""
+        lines = []
+        for name, help_text, value in (
+            ("service_runs", "Polls that ran an extraction.", self.runs),
+            ("service_failures", "Polls whose extraction failed.", self.failures),
+            ("service_up", "Whether the last poll succeeded.", int(self.healthy)),
+        ):
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+            lines.append(f"{METRIC_PREFIX}_{name} {value}")
+        text = "\n".join(lines) + "\n"
+        if self.last_summary:
+            text += self.last_summary.to_prometheus()
+        return text
+
+
+class ExtractionService:
+    """Long running extraction that polls for new days instead of cold starting.
+
+    Every `poll_interval_sec` the last `lookback_days` days are extracted with
+    `run_weather_extractors`. The manifest skips the days already extracted, so
+    once caught up a poll costs one request and one small write per new day and
+    type. The process, its imports (pandas, parsers) and the keep-alive
+    connections of the sync HTTP client stay warm between polls.
+
+    `GET /healthz` returns the status of the service as JSON (503 after a
+    failed poll) and `GET /metrics` the service gauges and the metrics of the
+    last run in the Prometheus text format.
+
+    SIGTERM and SIGINT stop the service after the poll in progress, so that
+    the partitions being written are finished and recorded in the manifest.
+
+    Example:
+        service = ExtractionService(api_key, ExtractionOptions(manifest_path=...))
+        service.serve_forever()
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        options: ExtractionOptions,
+        poll_interval_sec: float = POLL_INTERVAL_SEC,
+        lookback_days: int = LOOKBACK_DAYS,
+        host: str = "0.0.0.0",
+        port: Optional[int] = HEALTH_PORT,
+    ):
+        if not options.manifest_path:
+            raise ValueError("the service requires a manifest to skip extracted days")
+        if lookback_days < 1:
+            raise ValueError("lookback_days must be at least 1")
+        self.api_key = api_key
+        self.options = options
+        self.poll_interval_sec = poll_interval_sec
+        self.lookback_days = lookback_days
+        self.status = ServiceStatus(started_at=_now())
+        self._stop = threading.Event()
+        self._client: Optional["httpx.Client"] = None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._address = (host, port)
+
+    @property
+    def port(self) -> Optional[int]:
+        """Port of the health endpoint, once started."""
+        return self._server.server_address[1] if self._server else None
+
+    def start(self):
+        """Loads the pipeline, opens the HTTP client and the health endpoint."""
+        # imported once for the lifetime of the service, runs start warm
+        from .weather import make_http_client
+
+        if self.options.fetch_mode == FetchMode.SYNC and not self.options.offline:
+            self._client = make_http_client(self.options.max_concurrency)
+        if self._address[1] is not None:
+            self._server = ThreadingHTTPServer(
+                self._address, _make_handler(self.status)
+            )
+            threading.Thread(
+                target=self._server.serve_forever, name="health", daemon=True
+            ).start()
+            log.info(f"health and metrics endpoints listening on port {self.port}")
+
+    def poll(self, today: Optional[datetime.date] = None) -> Optional[RunSummary]:
+        """Extracts the days of the lookback window that were not extracted yet.
+
+        Errors are logged and reported by the health endpoint, the next poll
+        retries the days that failed.
+
+        Args:
+            today (datetime.date, optional): Last day of the window, the current
+                date by default
+
+        Returns:
+            Optional[RunSummary]: Metrics of the run, None when it failed
+        """
+        from .weather import run_weather_extractors
+
+        today = today or datetime.date.today()
+        timespan = DateInterval(
+            today - datetime.timedelta(days=self.lookback_days - 1), today
+        )
+        self.status.last_run_at = _now()
+        self.status.runs += 1
+        try:
+            summary = run_weather_extractors(
+                timespan, self.api_key, self.options, client=self._client
+            )
+        except Exception as e:
+            self.status.failures += 1
+            self.status.last_error = f"{type(e).__name__}: {e}"
+            log.exception(f"extraction of {timespan} failed, retried next poll")
+            return None
+        self.status.last_error = None
+        self.status.last_success_at = _now()
+        self.status.last_summary = summary
+        return summary
+
+    def stop(self, *_):
+        """Asks the service to stop after the poll in progress, signal safe."""
+        if not self._stop.is_set():
+            log.info("stopping after the poll in progress")
+        self._stop.set()
+
+    def close(self):
+        """Closes the health endpoint and the HTTP client."""
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._client:
+            self._client.close()
+            self._client = None
+
+    def serve_forever(self):
+        """Polls until SIGTERM/SIGINT (or `stop`), then closes the service."""
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self.stop)
+            signal.signal(signal.SIGINT, self.stop)
+        self.start()
+        try:
+            while not self._stop.is_set():
+                start = time.monotonic()
+                self.poll()
+                elapsed = time.monotonic() - start
+                self._stop.wait(max(self.poll_interval_sec - elapsed, 0))
+        finally:
+            self.close()
+        log.info(f"service stopped after {self.status.runs} polls")
+
+
+def _now() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def _make_handler(status: ServiceStatus) -> type:
+    class HealthHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/healthz":
+                code = 200 if status.healthy else 503
+                body = json.dumps(status.to_dict()).encode()
+                content_type = "application/json"
+            elif self.path == "/metrics":
+                code = 200
+                body = status.to_prometheus().encode()
+                content_type = "text/plain; version=0.0.4"
+            else:
+                code, body, content_type = 404, b"not found", "text/plain"
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            log.debug(f"health endpoint: {format % args}")
+
+    return HealthHandler
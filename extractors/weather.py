@@ -1,193 +1,1151 @@
-import enum
+import asyncio
+import dataclasses
+import datetime
+import io
 import logging as log
 import time
-import urllib
-import urllib.error
-import uuid
-from typing import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
 
+import httpx
+import numpy as np
 import pandas as pd
 
-from .core import DateInterval, write_to_file
-from .error import InvalidDateError, ResourceDownError
+from .cache import RawCache
+from .compaction import remove_compacted_days
+from .core import DateInterval, WriterOptions, write_to_file
+from .error import (
+    AuthorizationError,
+    InvalidDateError,
+    ResourceDownError,
+    SchemaError,
+)
+from .manifest import Manifest, Watermarks
+from .metrics import RunMetrics, RunSummary, StageMetrics
+from .options import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_SEC,
+    OUTPUT_DIR,
+    ExtractionOptions,
+    FetchMode,
+    WeatherExtractionType,
+    get_pending_dates,
+)
+from .parsers import ReaderEngine, arrow_available, read_csv_arrow, read_json_arrow
+from .profiling import StageProfiler, profile_stage
+from .registry import (
+    COLUMN_MAPPING,
+    DAY_PARTITIONING,
+    RAW_SCHEMA,
+    ExtractorSpec,
+    ExtractorType,
+    get_extractor,
+    get_extractors,
+    register_extractor,
+)
+from .rollups import compute_rollup, make_rollup_filepath
+from .scheduler import RequestScheduler
 
 # weather API configuraiton
-# retries are performed when API unresponsive using these configurations
+# retries are performed when API unresponsive using these configurations,
+# delays between retries grow exponentially (with jitter) from the base delay
 WEATHER_API_ENDPOINT = "http://localhost:8000"
-MAX_RETRIES = 3
-RETRY_DELAY_SEC = 1
+MAX_RETRIES = 5
+RETRY_BASE_DELAY_SEC = 0.1
+RETRY_MAX_DELAY_SEC = 5
+HTTP_TIMEOUT_SEC = 30
 
-# extractor output is written to disk
-OUTPUT_DIR = "./output"
+# fetched rows are tagged with the day they were requested for, a day's output
+# only holds the rows of its own response (see `_transform_and_load`)
+REQUESTED_DATE_COLUMN = "_requested_date"
 
 
-def run_weather_extractors(timespan: DateInterval, api_key: str):
+def run_weather_extractors(
+    timespan: DateInterval,
+    api_key: str,
+    options: Optional[ExtractionOptions] = None,
+    client: Optional[httpx.Client] = None,
+) -> RunSummary:
     """Extracts weather data for a particular timespan and writes output to file.
 
     Args:
         timespan (DateInterval): Timespan with date range
         api_key (str): API key to use to fetch data
+        options (ExtractionOptions, optional): Pipeline options, defaults are used
+            when not provided
+        client (httpx.Client, optional): Client of the sync fetches, kept open
+            after the run so that its connections are reused by the next one.
+            A client is created for the run when not provided
 
     Raises:
         InvalidDateError: Raised when timespan is invalid
+        ValueError: Raised when running offline without a cache directory
+
+    Returns:
+        RunSummary: Metrics of the run: wall time of each extractor that had days
+            to extract, time/rows/bytes of each stage and request statistics
     """
     if timespan.to_date < timespan.from_date:
         raise InvalidDateError()
 
-    log.info(f"extracting data for timespan: {timespan}")
+    options = options or ExtractionOptions()
+    log.info(f"extracting data for timespan: {timespan}, mode: {options.fetch_mode}")
+    if options.reader_engine == ReaderEngine.ARROW and not arrow_available():
+        log.warning("pyarrow is not installed, falling back to pandas readers")
+        options = dataclasses.replace(options, reader_engine=ReaderEngine.PANDAS)
+    if options.offline and not options.cache_dir:
+        raise ValueError("offline runs require a cache directory")
+    if not options.profile_dir:
+        return _extract(timespan, api_key, options, client)
+    with StageProfiler(options.profile_dir):
+        return _extract(timespan, api_key, options, client)
 
-    output_type = "parquet"
-    # extract solar and then extract wind
-    extractors = {
-        WeatherExtractionType.SOLAR: run_solar_extraction,
-        WeatherExtractionType.WIND: run_wind_extraction,
-    }
-    for extractor_type, extraction_fn in extractors.items():
-        log.info(f"running extractor {extractor_type}")
-        df = extraction_fn(timespan, api_key)
 
-        df = clean_columns(df)
+def _extract(
+    timespan: DateInterval,
+    api_key: str,
+    options: ExtractionOptions,
+    client: Optional[httpx.Client],
+) -> RunSummary:
+    """Runs the pipelines of the pending days, see `run_weather_extractors`."""
+    metrics = RunMetrics()
+    scheduler = make_request_scheduler(options.max_request_rate)
+    cache = None
+    if options.cache_dir:
+        # refreshes must see the current upstream data, fetched days are still
+        # written through so that later runs and offline rebuilds can use them
+        write_only = (options.full_refresh or options.refresh) and not options.offline
+        cache = RawCache(
+            options.cache_dir,
+            options.cache_ttl_sec,
+            options.cache_max_bytes,
+            write_only=write_only,
+        )
+
+    manifest = Manifest(options.manifest_path) if options.manifest_path else None
+    skip_extracted = not (options.full_refresh or options.refresh)
+    pending = get_pending_dates(
+        get_extractors(options.extractors),
+        timespan,
+        manifest if skip_extracted else None,
+    )
+    watermarks = None
+    if manifest:
+        refresh = options.refresh and not options.full_refresh
+        watermarks = _get_watermarks(pending, manifest) if refresh else Watermarks()
+    if options.offline:
+        pending = _get_cached_dates(pending, cache)
+    if not pending:
+        log.info("all days already extracted, nothing to do")
+        return _finish_run(metrics, scheduler, options)
+
+    fetched = {}
+    if options.fetch_mode == FetchMode.ASYNC and not options.batch_days:
+        # fetch every day of every extractor at once, then transform one by one
+        with profile_stage("fetch"):
+            fetched = asyncio.run(
+                _fetch_async(
+                    pending,
+                    api_key,
+                    options.max_concurrency,
+                    scheduler=scheduler,
+                    reader_engine=options.reader_engine,
+                    metrics=metrics,
+                    cache=cache,
+                    offline=options.offline,
+                    watermarks=watermarks,
+                )
+            )
+
+    # pipelines share no state: fetch in threads (io bound), and optionally
+    # clean and write in processes (cpu bound). Sync fetches of all pipelines
+    # share one keep-alive connection pool.
+    workers = len(pending) if options.parallel else 1
+    transform_pool = None
+    if options.use_processes:
+        transform_pool = ProcessPoolExecutor(
+            workers,
+            initializer=init_worker,
+            initargs=(OUTPUT_DIR, WEATHER_API_ENDPOINT, get_extractors(pending)),
+        )
+    owns_client = client is None and options.fetch_mode == FetchMode.SYNC
+    if owns_client:
+        client = make_http_client(options.max_concurrency)
+    try:
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {
+                extractor_type: pool.submit(
+                    _run_pipeline,
+                    extractor_type,
+                    dates,
+                    api_key,
+                    scheduler,
+                    options,
+                    metrics,
+                    fetched.pop(extractor_type, None),
+                    transform_pool,
+                    manifest,
+                    client,
+                    cache,
+                    watermarks,
+                )
+                for extractor_type, dates in pending.items()
+            }
+            for future in futures.values():
+                future.result()
+    finally:
+        if transform_pool:
+            transform_pool.shutdown()
+        if owns_client:
+            client.close()
+
+    return _finish_run(metrics, scheduler, options)
+
+
+def _get_cached_dates(
+    pending: Dict[ExtractorType, List[datetime.date]], cache: RawCache
+) -> Dict[ExtractorType, List[datetime.date]]:
+    """Returns the pending dates that can be extracted offline from the cache."""
+    cached = {}
+    for extraction_type, dates in pending.items():
+        hits = [
+            date
+            for date in dates
+            if cache.contains(
+                get_data_url(extraction_type, date.isoformat(), ""), ignore_ttl=True
+            )
+        ]
+        if len(hits) < len(dates):
+            log.warning(
+                f"extractor:{extraction_type} {len(dates) - len(hits)} days are "
+                "not cached, skipped offline"
+            )
+        if hits:
+            cached[extraction_type] = hits
+    return cached
+
+
+def _get_watermarks(
+    pending: Dict[ExtractorType, List[datetime.date]], manifest: Manifest
+) -> Watermarks:
+    """Returns the watermarks of the pending days found in the manifest."""
+    watermarks = Watermarks()
+    for extraction_type, dates in pending.items():
+        for date in dates:
+            entry = manifest.get(extraction_type.value, date)
+            if not entry:
+                continue
+            key = _day_key(extraction_type, date)
+            if entry.get("etag"):
+                watermarks.sent[key] = entry["etag"]
+            if entry.get("last_modified_utc"):
+                watermarks.last_modified[key] = entry["last_modified_utc"]
+    return watermarks
+
+
+def _finish_run(
+    metrics: RunMetrics, scheduler: RequestScheduler, options: ExtractionOptions
+) -> RunSummary:
+    """Logs the summary of a run and writes it to the configured metrics files."""
+    summary = metrics.summary(scheduler.stats)
+    log.info(f"extraction done in {summary.elapsed_sec:.2f}s")
+    log.info(f"requests: {scheduler.stats}")
+    summary.log()
+    summary.write(options.metrics_json_path, options.metrics_prometheus_path)
+    return summary
+
+
+def _run_pipeline(
+    extractor_type: ExtractorType,
+    dates: List[datetime.date],
+    api_key: str,
+    scheduler: RequestScheduler,
+    options: ExtractionOptions,
+    metrics: RunMetrics,
+    df: Optional[pd.DataFrame] = None,
+    transform_pool: Optional[Executor] = None,
+    manifest: Optional[Manifest] = None,
+    client: Optional[httpx.Client] = None,
+    cache: Optional[RawCache] = None,
+    watermarks: Optional[Watermarks] = None,
+) -> float:
+    """Fetches (unless already fetched), cleans and writes data of one extractor.
+
+    Days are processed in batches of `options.batch_days`, or all at once.
+    Days answered with 304 Not Modified are skipped.
+
+    Returns:
+        float: Wall time of the pipeline in seconds
+    """
+    start = time.perf_counter()
+    log.info(f"running extractor {extractor_type}")
+    watermarks = watermarks or Watermarks()
+    batch_days = options.batch_days or len(dates)
+    for i in range(0, len(dates), batch_days):
+        batch = dates[i : i + batch_days]
+        if df is None:
+            df = _fetch_batch(
+                extractor_type,
+                batch,
+                api_key,
+                scheduler,
+                options,
+                metrics,
+                client,
+                cache,
+                watermarks,
+            )
+
+        keys = {date: _day_key(extractor_type, date) for date in batch}
+        changed = [date for date in batch if keys[date] not in watermarks.unchanged]
+        if len(changed) < len(batch):
+            log.info(
+                f"extractor:{extractor_type} {len(batch) - len(changed)} days not "
+                "modified, skipped"
+            )
+        last_modified = {}
+        if changed:
+            previous = {
+                date: watermarks.last_modified[keys[date]]
+                for date in changed
+                if keys[date] in watermarks.last_modified
+            }
+            transform_args = (
+                extractor_type,
+                df,
+                changed,
+                options.compact_values,
+                options.writer,
+                options.rollups,
+                previous,
+            )
+            if transform_pool:
+                last_modified, transform_metrics = transform_pool.submit(
+                    _transform_and_load, *transform_args
+                ).result()
+            else:
+                last_modified, transform_metrics = _transform_and_load(*transform_args)
+            metrics.merge(transform_metrics)
+        # release the batch before fetching the next one
+        df = None
+
+        if manifest:
+            _record_days(manifest, extractor_type, changed, last_modified, watermarks)
+
+    elapsed = time.perf_counter() - start
+    log.info(f"extractor:{extractor_type} finished in {elapsed:.2f}s")
+    metrics.record_extractor(extractor_type.value, elapsed)
+    return elapsed
+
+
+def _record_days(
+    manifest: Manifest,
+    extractor_type: ExtractorType,
+    dates: List[datetime.date],
+    last_modified: Dict[str, str],
+    watermarks: Watermarks,
+):
+    """Records the extracted days and their watermarks in the manifest.
+
+    Days that were not written because their watermark did not advance keep
+    their entry, which is only updated when the ETag of the day changed. Days
+    that returned no data are not recorded, so that the next run fetches them
+    again (e.g. days not published yet).
+    """
+    for date in dates:
+        key = _day_key(extractor_type, date)
+        etag = watermarks.received.get(key)
+        fields = {"etag": etag} if etag else {}
+        day_last_modified = last_modified.get(date.isoformat())
+        if day_last_modified is None:
+            if key not in watermarks.last_modified:
+                continue
+            if not etag or etag == watermarks.sent.get(key):
+                continue
+            day_last_modified = watermarks.last_modified[key]
+        manifest.record(extractor_type.value, date, day_last_modified, **fields)
+
+
+def _fetch_batch(
+    extractor_type: ExtractorType,
+    dates: List[datetime.date],
+    api_key: str,
+    scheduler: RequestScheduler,
+    options: ExtractionOptions,
+    metrics: Optional[RunMetrics] = None,
+    client: Optional[httpx.Client] = None,
+    cache: Optional[RawCache] = None,
+    watermarks: Optional[Watermarks] = None,
+) -> pd.DataFrame:
+    """Fetches the given days of one extractor using the configured fetch mode."""
+    if options.fetch_mode == FetchMode.ASYNC:
+        with profile_stage("fetch"):
+            fetched = asyncio.run(
+                _fetch_async(
+                    {extractor_type: dates},
+                    api_key,
+                    options.max_concurrency,
+                    scheduler=scheduler,
+                    reader_engine=options.reader_engine,
+                    metrics=metrics,
+                    cache=cache,
+                    offline=options.offline,
+                    watermarks=watermarks,
+                )
+            )
+        return fetched[extractor_type]
+    return _run_extraction(
+        extractor_type,
+        dates,
+        api_key,
+        scheduler,
+        options.reader_engine,
+        metrics,
+        client,
+        cache,
+        options.offline,
+        watermarks,
+    )
+
+
+def _transform_and_load(
+    extractor_type: ExtractorType,
+    df: pd.DataFrame,
+    dates: List[datetime.date],
+    compact_values: bool = False,
+    writer: Optional[WriterOptions] = None,
+    rollups: Sequence[str] = (),
+    previous_last_modified: Optional[Dict[datetime.date, str]] = None,
+) -> Tuple[Dict[str, str], RunMetrics]:
+    """Cleans extracted data and writes one file per extracted day.
+
+    Rows are partitioned by the date of their timestamp. A day's response ends
+    with midnight of the next day, which also starts the next day's response:
+    rows tagged with the day they were requested for (REQUESTED_DATE_COLUMN)
+    are only kept when they fall on that day, so a day's output does not depend
+    on the other days of the batch. Rows falling outside of the extracted days
+    are left out. The rollups of
+    the written days are computed for the whole batch and written per day too,
+    replacing the rollups of days extracted again. Rows of the written days are
+    removed from the files of earlier compactions.
 
-        log.info(f"extraction complete for extractor:{extractor_type}, writing to file")
-        filepath = make_output_filepath(timespan, extractor_type, output_type)
-        write_to_file(filepath, df, filetype=output_type)
+    Days of `previous_last_modified` are only written when their latest
+    `last_modified_utc` is more recent than the given watermark.
+
+    Returns:
+        Tuple[Dict[str, str], RunMetrics]: Latest `last_modified_utc` of each
+            written day, and metrics of the clean, write and rollup stages
+    """
+    writer = writer or WriterOptions()
+    metrics = RunMetrics()
+    requested_dates = None
+    if REQUESTED_DATE_COLUMN in df.columns:
+        requested_dates = df[REQUESTED_DATE_COLUMN]
+        df = df.drop(columns=REQUESTED_DATE_COLUMN)
+    with metrics.stage("clean") as call:
+        column_mapping = get_extractor(extractor_type).column_mapping
+        df = clean_columns(df, compact_values, column_mapping)
+        call.rows = len(df)
+
+    log.info(f"extraction complete for extractor:{extractor_type}, writing to file")
+    extracted_dates = set(dates)
+    previous_last_modified = previous_last_modified or {}
+    last_modified, unchanged, written = {}, set(), []
+    row_dates = df["timestamp"].dt.date
+    if requested_dates is not None:
+        # e.g. the midnight row closing the previous day's response
+        own_rows = (row_dates == requested_dates).to_numpy()
+        if not own_rows.all():
+            log.debug(f"skipping {(~own_rows).sum()} rows of neighbouring days")
+            df, row_dates = df[own_rows], row_dates[own_rows]
+    for date, day_df in df.groupby(row_dates, sort=True):
+        if date not in extracted_dates:
+            log.debug(f"skipping {len(day_df)} rows of {date}, day not extracted")
+            continue
+        previous = previous_last_modified.get(date)
+        if previous and day_df["last_modified_utc"].max() <= pd.Timestamp(previous):
+            unchanged.add(date)
+            continue
+        filepath = make_output_filepath(date, extractor_type, writer.filetype)
+        day_df = day_df.reset_index(drop=True)
+        with metrics.stage("write") as call:
+            call.bytes = write_to_file(
+                filepath, day_df, filetype=writer.filetype, options=writer
+            )
+            call.rows = len(day_df)
+        written.append(filepath)
+        last_modified[date] = day_df["last_modified_utc"].max().isoformat()
+    remove_compacted_days(written, writer)
+
+    if unchanged:
+        log.info(
+            f"extractor:{extractor_type} {len(unchanged)} days not modified since "
+            "their last extraction, not written"
+        )
+    for date in sorted(extracted_dates.difference(last_modified, unchanged)):
+        log.warning(
+            f"extractor:{extractor_type} returned no data for {date}, not recorded"
+        )
+    if rollups:
+        # rollups of the rows written above only
+        written_df = df[row_dates.isin(set(last_modified))]
+        _write_rollups(extractor_type, written_df, rollups, writer, metrics)
+    last_modified = {date.isoformat(): ts for date, ts in last_modified.items()}
+    return last_modified, metrics
+
+
+def _write_rollups(
+    extractor_type: ExtractorType,
+    df: pd.DataFrame,
+    granularities: Sequence[str],
+    writer: WriterOptions,
+    metrics: RunMetrics,
+):
+    """Computes the rollups of clean data at once and writes them per day."""
+    # rollups are sorted already, and have no `value` column to sort by
+    writer = dataclasses.replace(writer, sort_by=None)
+    for granularity in granularities:
+        with metrics.stage("rollup") as call:
+            rollup = compute_rollup(df, granularity)
+            written = []
+            for date, day_rollup in rollup.groupby(rollup["timestamp"].dt.date):
+                filepath = make_rollup_filepath(
+                    date, extractor_type, granularity, writer.filetype, OUTPUT_DIR
+                )
+                call.bytes += write_to_file(
+                    filepath,
+                    day_rollup.reset_index(drop=True),
+                    filetype=writer.filetype,
+                    options=writer,
+                )
+                call.rows += len(day_rollup)
+                written.append(filepath)
+            remove_compacted_days(written, writer)
 
 
-def run_solar_extraction(timespan: DateInterval, api_key: str) -> pd.DataFrame:
-    """Extracts solar data from weather api and returns them as a DataFrame.
+def run_extraction(
+    extraction_type: ExtractorType,
+    timespan: DateInterval,
+    api_key: str,
+    scheduler: Optional[RequestScheduler] = None,
+    client: Optional[httpx.Client] = None,
+) -> pd.DataFrame:
+    """Extracts data of a registered type from weather api and returns them as
+    a DataFrame.
 
     Args:
+        extraction_type (ExtractorType): Spec or name of the data type
         timespan (DateInterval): Date range for which data is extracted
         api_key (str): API key to use to fetch data
+        scheduler (RequestScheduler, optional): Scheduler shared by requests of a
+            run, a new one is used when not provided
+        client (httpx.Client, optional): Client to reuse, a keep-alive client is
+            created (and closed) for the call when not provided
 
     Returns:
-        pd.DataFrame: Combined solar data across timespan specified
+        pd.DataFrame: Combined raw data across timespan specified
     """
-    frames = []
-    for date in timespan.get_date_range():
-        url = get_data_url(
-            WeatherExtractionType.SOLAR, date.strftime("%Y-%m-%d"), api_key
-        )
-        df = _get_df_from_url(
-            url, pd.read_json, convert_dates=["Naive_Timestamp ", "Last Modified utc"]
-        )
-        frames.append(df)
-    df = pd.concat(frames)
-    return df.reset_index(drop=True)
+    df = _run_extraction(
+        extraction_type,
+        timespan.iter_dates(),
+        api_key,
+        scheduler,
+        client=client,
+    )
+    return df.drop(columns=REQUESTED_DATE_COLUMN)
+
+
+def run_solar_extraction(
+    timespan: DateInterval,
+    api_key: str,
+    scheduler: Optional[RequestScheduler] = None,
+    client: Optional[httpx.Client] = None,
+) -> pd.DataFrame:
+    """Extracts solar data from weather api, see `run_extraction`."""
+    return run_extraction(
+        WeatherExtractionType.SOLAR, timespan, api_key, scheduler, client
+    )
+
 
+def run_wind_extraction(
+    timespan: DateInterval,
+    api_key: str,
+    scheduler: Optional[RequestScheduler] = None,
+    client: Optional[httpx.Client] = None,
+) -> pd.DataFrame:
+    """Extracts wind data from weather api, see `run_extraction`."""
+    return run_extraction(
+        WeatherExtractionType.WIND, timespan, api_key, scheduler, client
+    )
 
-def run_wind_extraction(timespan: DateInterval, api_key: str) -> pd.DataFrame:
-    """Extracts wind data from weather api and returns them as a DataFrame.
+
+async def run_extractions_async(
+    extraction_types: Iterable[ExtractorType],
+    timespan: DateInterval,
+    api_key: str,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    client: Optional[httpx.AsyncClient] = None,
+    scheduler: Optional[RequestScheduler] = None,
+) -> Dict[ExtractorType, pd.DataFrame]:
+    """Concurrently extracts every day of the timespan for all extraction types.
+
+    Requests share a pooled HTTP client and at most `max_concurrency` of them are
+    in flight at any time.
 
     Args:
+        extraction_types (Iterable[ExtractorType]): Weather data types
         timespan (DateInterval): Date range for which data is extracted
         api_key (str): API key to use to fetch data
+        max_concurrency (int, optional): Max in-flight requests
+        client (httpx.AsyncClient, optional): Client to reuse, a pooled client is
+            created (and closed) for the call when not provided
+        scheduler (RequestScheduler, optional): Scheduler shared by requests of a
+            run, a new one is used when not provided
 
     Returns:
-        pd.DataFrame: Combined wind data across timespan specified
+        Dict[ExtractorType, pd.DataFrame]: Combined data per extraction type,
+            identical to what the synchronous extractors return
+    """
+    dates = list(timespan.iter_dates())
+    pending = {extraction_type: dates for extraction_type in extraction_types}
+    results = await _fetch_async(pending, api_key, max_concurrency, client, scheduler)
+    return {
+        extraction_type: df.drop(columns=REQUESTED_DATE_COLUMN)
+        for extraction_type, df in results.items()
+    }
+
+
+async def _fetch_async(
+    pending: Dict[ExtractorType, List[datetime.date]],
+    api_key: str,
+    max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+    client: Optional[httpx.AsyncClient] = None,
+    scheduler: Optional[RequestScheduler] = None,
+    reader_engine: ReaderEngine = ReaderEngine.PANDAS,
+    metrics: Optional[RunMetrics] = None,
+    cache: Optional[RawCache] = None,
+    offline: bool = False,
+    watermarks: Optional[Watermarks] = None,
+) -> Dict[ExtractorType, pd.DataFrame]:
+    """Concurrently fetches the given dates of each extraction type.
+
+    Days found in `cache` are read from it, fetched days are added to it. Days
+    answered with 304 Not Modified (see `watermarks`) are left out.
     """
+    if client is None:
+        limits = httpx.Limits(
+            max_connections=max_concurrency, max_keepalive_connections=max_concurrency
+        )
+        async with httpx.AsyncClient(limits=limits, timeout=HTTP_TIMEOUT_SEC) as client:
+            return await _fetch_async(
+                pending,
+                api_key,
+                max_concurrency,
+                client,
+                scheduler,
+                reader_engine,
+                metrics,
+                cache,
+                offline,
+                watermarks,
+            )
+
+    scheduler = scheduler or make_request_scheduler()
+    metrics = metrics or RunMetrics()
+    semaphore = asyncio.Semaphore(max_concurrency)
+    requests = []
+    for extraction_type, dates in pending.items():
+        df_reader_fn, kwargs = _get_reader(extraction_type, reader_engine)
+        for date in dates:
+            url = get_data_url(extraction_type, date.isoformat(), api_key)
+            requests.append(
+                _get_df_from_url_async(
+                    client,
+                    semaphore,
+                    scheduler,
+                    metrics,
+                    url,
+                    df_reader_fn,
+                    cache=cache,
+                    offline=offline,
+                    watermarks=watermarks,
+                    **kwargs,
+                )
+            )
+    frames = iter(await asyncio.gather(*requests))
+
+    results = {}
+    for extraction_type, dates in pending.items():
+        results[extraction_type] = _concat_days([next(frames) for _ in dates], dates)
+    return results
+
+
+def make_request_scheduler(rate: float = MAX_REQUESTS_PER_SEC) -> RequestScheduler:
+    """Returns a request scheduler configured for the weather API.
+
+    Args:
+        rate (float, optional): Initial requests per second
+
+    Returns:
+        RequestScheduler: Scheduler to share between all requests of a run
+    """
+    return RequestScheduler(
+        rate=rate,
+        max_rate=max(rate, MAX_REQUESTS_PER_SEC) * 4,
+        max_retries=MAX_RETRIES,
+        base_delay_sec=RETRY_BASE_DELAY_SEC,
+        max_delay_sec=RETRY_MAX_DELAY_SEC,
+    )
+
+
+def _run_extraction(
+    extraction_type: ExtractorType,
+    dates: Iterable[datetime.date],
+    api_key: str,
+    scheduler: Optional[RequestScheduler] = None,
+    reader_engine: ReaderEngine = ReaderEngine.PANDAS,
+    metrics: Optional[RunMetrics] = None,
+    client: Optional[httpx.Client] = None,
+    cache: Optional[RawCache] = None,
+    offline: bool = False,
+    watermarks: Optional[Watermarks] = None,
+) -> pd.DataFrame:
+    """Fetches the given days one after the other and combines them.
+
+    Requests go through `client`, or a client created for the call, so that
+    the days are fetched over the same keep-alive connection. Days found in
+    `cache` are read from it, fetched days are added to it. Days answered with
+    304 Not Modified (see `watermarks`) are left out.
+    """
+    if client is None:
+        with make_http_client() as client:
+            return _run_extraction(
+                extraction_type,
+                dates,
+                api_key,
+                scheduler,
+                reader_engine,
+                metrics,
+                client,
+                cache,
+                offline,
+                watermarks,
+            )
+
+    scheduler = scheduler or make_request_scheduler()
+    metrics = metrics or RunMetrics()
+    df_reader_fn, kwargs = _get_reader(extraction_type, reader_engine)
+    dates = list(dates)
     frames = []
-    for date in timespan.get_date_range():
-        url = get_data_url(
-            WeatherExtractionType.WIND, date.strftime("%Y-%m-%d"), api_key
+    for date in dates:
+        url = get_data_url(extraction_type, date.isoformat(), api_key)
+        df = _get_df_from_url(
+            client,
+            url,
+            df_reader_fn,
+            scheduler,
+            metrics,
+            cache=cache,
+            offline=offline,
+            watermarks=watermarks,
+            **kwargs,
         )
-        df = _get_df_from_url(url, pd.read_csv)
         frames.append(df)
-    df = pd.concat(frames)
-    return df.reset_index(drop=True)
+    return _concat_days(frames, dates)
 
 
-class WeatherExtractionType(enum.Enum):
-    SOLAR = "solar"
-    WIND = "wind"
+def _concat_days(
+    frames: List[Optional[pd.DataFrame]],
+    dates: Optional[List[datetime.date]] = None,
+) -> pd.DataFrame:
+    """Combines the frames of fetched days, days not modified (None) are left out.
 
+    With `dates`, the date each frame was requested for, rows are tagged with
+    it in REQUESTED_DATE_COLUMN.
+    """
+    columns = list(RAW_SCHEMA)
+    if dates is not None:
+        frames = [
+            df.assign(**{REQUESTED_DATE_COLUMN: date})
+            for df, date in zip(frames, dates)
+            if df is not None
+        ]
+        columns.append(REQUESTED_DATE_COLUMN)
+    frames = [df for df in frames if df is not None]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
 
-def get_data_url(
-    extraction_type: WeatherExtractionType, date: str, api_key: str
-) -> str:
+
+def init_worker(output_dir: str, endpoint: str, extractors: List[ExtractorSpec]):
+    """Configures a worker process of the extractors like its parent.
+
+    Workers started with spawn or forkserver do not inherit the configuration
+    of the parent (`OUTPUT_DIR`, `WEATHER_API_ENDPOINT`), nor the types
+    registered at runtime. Pass it as the initializer of process pools.
+
+    Args:
+        output_dir (str): Output directory of the parent
+        endpoint (str): Endpoint of the weather api used by the parent
+        extractors (List[ExtractorSpec]): Specs of the extracted types
+    """
+    global OUTPUT_DIR, WEATHER_API_ENDPOINT
+    OUTPUT_DIR = output_dir
+    WEATHER_API_ENDPOINT = endpoint
+    for spec in extractors:
+        register_extractor(spec, replace=True)
+
+
+def make_http_client(max_connections: int = MAX_CONCURRENT_REQUESTS) -> httpx.Client:
+    """Returns a thread safe HTTP client keeping connections to the API alive.
+
+    The client asks for gzip/deflate compressed responses and decodes them.
+
+    Args:
+        max_connections (int, optional): Size of the connection pool
+
+    Returns:
+        httpx.Client: Client to share between the sync requests of a run
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections, max_keepalive_connections=max_connections
+    )
+    return httpx.Client(limits=limits, timeout=HTTP_TIMEOUT_SEC)
+
+
+def get_data_url(extraction_type: ExtractorType, date: str, api_key: str) -> str:
     """Return appropriate API location of weather data type
 
     Args:
-        extraction_type (WeatherExtractionType): Weather data type
+        extraction_type (ExtractorType): Weather data type
         date (str): API request parameter date
         api_key (str): API key to use to fetch data
 
     Raises:
-        NotImplementedError: raised when extraction_type is not recognized
+        NotImplementedError: raised when extraction_type is not registered
 
     Returns:
         str: absolute http url to GET data from
     """
-    paths = {
-        WeatherExtractionType.SOLAR: "solargen.json",
-        WeatherExtractionType.WIND: "windgen.csv",
-    }
-    path = paths.get(extraction_type)
-    if not path:
-        raise NotImplementedError(f"No registered endpoint for: {extraction_type}")
-    return f"{WEATHER_API_ENDPOINT}/{date}/renewables/{path}?api_key={api_key}"
+    path = get_extractor(extraction_type).path.format(date=date)
+    return f"{WEATHER_API_ENDPOINT}/{path}?api_key={api_key}"
+
+
+def _get_reader(
+    extraction_type: ExtractorType,
+    engine: ReaderEngine = ReaderEngine.PANDAS,
+) -> Tuple[Callable, dict]:
+    """Returns the dataframe reader function and its arguments for a data type."""
+    spec = get_extractor(extraction_type)
+    if engine == ReaderEngine.ARROW:
+        if spec.wire_format == "json":
+            return read_json_arrow, {
+                "schema": spec.schema,
+                "timestamp_unit": spec.timestamp_unit,
+            }
+        return read_csv_arrow, {"schema": spec.schema}
+    if spec.wire_format == "json":
+        return pd.read_json, {
+            "convert_dates": False,
+            "keep_default_dates": False,
+            "dtype": spec.dtypes,
+            **spec.reader_options,
+        }
+    return pd.read_csv, {"dtype": spec.dtypes, **spec.reader_options}
 
 
 def make_output_filepath(
-    timespan: DateInterval, extraction_type: WeatherExtractionType, filetype: str
+    date: datetime.date, extraction_type: ExtractorType, filetype: str
 ) -> str:
-    """Returns a local filepath where weather output data can be stored.
+    """Returns the local filepath where weather data of a single day is stored.
 
-    Example path structure: solar/year=2024/month=06/day=18/datafile.parquet
+    Paths are deterministic so that extracting a day again replaces its file.
+
+    Example path structure: solar/year=2024/month=06/day=18/data.parquet
 
     Args:
-        timespan (DateInterval): Timespan that extraction ran on
-        extraction_type (WeatherExtractionType): Type of extracted data
+        date (datetime.date): Day of the data stored in the file
+        extraction_type (ExtractorType): Type of extracted data
         filetype (str): Output file type: json,parquet
 
     Returns:
         str: Filepath on local filesystem
     """
-    week_format = timespan.from_date.strftime("year=%Y/month=%m/day=%d")
-    path_to_output = f"{OUTPUT_DIR}/{extraction_type.value}/{week_format}"
-    filepath = f"{path_to_output}/data-{uuid.uuid4()}.{filetype}"
-    return filepath
+    day_format = date.strftime(DAY_PARTITIONING)
+    path_to_output = f"{OUTPUT_DIR}/{extraction_type.value}/{day_format}"
+    return f"{path_to_output}/data.{filetype}"
 
 
-def clean_columns(df: pd.DataFrame) -> pd.DataFrame:
+def clean_columns(
+    df: pd.DataFrame,
+    compact_values: bool = False,
+    column_mapping: Dict[str, str] = COLUMN_MAPPING,
+) -> pd.DataFrame:
     """Renames and validates columns of data frame returning a clean one.
 
+    Timestamps are parsed with the API's formats (ISO 8601 strings or epoch
+    milliseconds) without format inference, columns already in their final
+    type are only validated and not copied.
+
     Args:
         df (pd.DataFrame): Dataframe with raw data from weather endpoints
+        compact_values (bool, optional): Store `value` as float32
+        column_mapping (Dict[str, str], optional): Raw columns of the data type
+            mapped to the clean columns
+
+    Raises:
+        SchemaError: raised when columns are missing or cannot be converted
 
     Returns:
         pd.DataFrame: Dataframe with standardized columns
     """
-    # rename columns to cleaner names
-    column_mapping = {
-        "Naive_Timestamp ": "timestamp",
-        " Variable": "variable",
-        "Last Modified utc": "last_modified_utc",
-    }
+    if set(df.columns) != set(column_mapping):
+        raise SchemaError(
+            f"unexpected columns: {sorted(df.columns)}, "
+            f"expected: {sorted(column_mapping)}"
+        )
+    df = df.rename(columns=column_mapping, copy=False)
 
-    df = df.rename(columns=column_mapping)
-    df["timestamp"] = pd.to_datetime(df["timestamp"], utc=True)
-    df["last_modified_utc"] = pd.to_datetime(df["last_modified_utc"], utc=True)
+    df["timestamp"] = _to_utc(df["timestamp"])
+    df["last_modified_utc"] = _to_utc(df["last_modified_utc"])
 
-    # make sure correct columns and correct types
-    transformed_columns = {"last_modified_utc", "timestamp", "value", "variable"}
-    assert set(df.columns) == transformed_columns
-    assert isinstance(df.last_modified_utc.dtype, pd.DatetimeTZDtype)
-    assert isinstance(df.timestamp.dtype, pd.DatetimeTZDtype)
-    assert pd.api.types.is_float_dtype(df.value.dtype)
-    assert pd.api.types.is_integer_dtype(df.variable.dtype)
+    variable = df["variable"]
+    if not pd.api.types.is_integer_dtype(variable.dtype):
+        raise SchemaError(f"column `variable` must be integer, got {variable.dtype}")
+    if variable.dtype != "int16":
+        info = np.iinfo(np.int16)
+        if len(variable) and (variable.min() < info.min or variable.max() > info.max):
+            raise SchemaError("column `variable` out of int16 range")
+        df["variable"] = variable.astype("int16")
+
+    value = df["value"]
+    if not pd.api.types.is_float_dtype(value.dtype):
+        raise SchemaError(f"column `value` must be float, got {value.dtype}")
+    value_dtype = "float32" if compact_values else "float64"
+    if value.dtype != value_dtype:
+        df["value"] = value.astype(value_dtype)
 
     return df
 
 
-def _get_df_from_url(url: str, df_reader_fn: Callable, **kwargs) -> pd.DataFrame:
-    """Utility function to fetch data from url and do retries on failures."""
-    # note: blocking io which can be optimized
-    for _ in range(MAX_RETRIES):
+def _to_utc(series: pd.Series) -> pd.Series:
+    """Returns a series as UTC timestamps, parsing it only when not parsed yet."""
+    if isinstance(series.dtype, pd.DatetimeTZDtype):
+        return series if str(series.dt.tz) == "UTC" else series.dt.tz_convert("UTC")
+    if pd.api.types.is_datetime64_dtype(series.dtype):
+        # naive timestamps of the API are UTC
+        return series.dt.tz_localize("UTC")
+    try:
+        if pd.api.types.is_integer_dtype(series.dtype):
+            return pd.to_datetime(series, unit="ms", utc=True)
+        return pd.to_datetime(series, format="ISO8601", utc=True)
+    except (ValueError, TypeError) as e:
+        raise SchemaError(f"column `{series.name}` is not a timestamp: {e}") from e
+
+
+def _get_df_from_url(
+    client: httpx.Client,
+    url: str,
+    df_reader_fn: Callable,
+    scheduler: RequestScheduler,
+    metrics: RunMetrics,
+    cache: Optional[RawCache] = None,
+    offline: bool = False,
+    watermarks: Optional[Watermarks] = None,
+    **kwargs,
+) -> Optional[pd.DataFrame]:
+    """Utility function to fetch data from url and do retries on failures.
+
+    Reads through `cache` when given: cached days are not fetched, fetched days
+    are cached. Offline, days missing from the cache raise ResourceDownError.
+    With `watermarks`, the request is conditional on the ETag of the extracted
+    version of the day and None is returned when it was not modified. Days
+    with an ETag are always checked with the API first, never read from the
+    cache, so that their changes are detected.
+    """
+    key = _strip_query(url)
+    headers = watermarks.request_headers(key) if watermarks else {}
+    if offline or not headers:
+        df = _read_cache(cache, url, metrics, offline)
+        if df is not None:
+            return df
+    for attempt in range(scheduler.max_retries):
+        scheduler.acquire()
+        start = time.perf_counter()
         try:
-            return df_reader_fn(url, **kwargs)
-        except urllib.error.HTTPError as e:
-            log.warning(f"failed to GET from url:{url}, error:`{e}`, retrying")
-        time.sleep(RETRY_DELAY_SEC)
+            with profile_stage("fetch"):
+                response = client.get(url, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            status, error = e.response.status_code, e
+        except httpx.TransportError as e:
+            status, error = None, e
+        else:
+            latency = time.perf_counter() - start
+            scheduler.record_success(latency, key)
+            if not _is_modified(response, latency, metrics, watermarks, key):
+                return None
+            df = _parse_response(response, latency, metrics, df_reader_fn, **kwargs)
+            _write_cache(cache, url, df, metrics)
+            return df
+
+        if _handle_failure(scheduler, url, status, error, attempt):
+            time.sleep(scheduler.backoff(attempt))
+
+    scheduler.record_giveup()
+    raise ResourceDownError(
+        f"url unresponsive after {scheduler.max_retries} tries: {url}"
+    )
+
+
+async def _get_df_from_url_async(
+    client: httpx.AsyncClient,
+    semaphore: asyncio.Semaphore,
+    scheduler: RequestScheduler,
+    metrics: RunMetrics,
+    url: str,
+    df_reader_fn: Callable,
+    cache: Optional[RawCache] = None,
+    offline: bool = False,
+    watermarks: Optional[Watermarks] = None,
+    **kwargs,
+) -> Optional[pd.DataFrame]:
+    """Async counterpart of `_get_df_from_url` using a shared client."""
+    key = _strip_query(url)
+    headers = watermarks.request_headers(key) if watermarks else {}
+    if offline or not headers:
+        df = _read_cache(cache, url, metrics, offline)
+        if df is not None:
+            return df
+    for attempt in range(scheduler.max_retries):
+        await scheduler.acquire_async()
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers=headers)
+                if response.status_code != 304:
+                    response.raise_for_status()
+            except httpx.HTTPStatusError as e:
+                status, error = e.response.status_code, e
+            except httpx.TransportError as e:
+                status, error = None, e
+            else:
+                latency = time.perf_counter() - start
+                scheduler.record_success(latency, key)
+                if not _is_modified(response, latency, metrics, watermarks, key):
+                    return None
+                df = _parse_response(response, latency, metrics, df_reader_fn, **kwargs)
+                _write_cache(cache, url, df, metrics)
+                return df
+
+        # sleep outside of the semaphore so that other requests can proceed
+        if _handle_failure(scheduler, url, status, error, attempt):
+            await asyncio.sleep(scheduler.backoff(attempt))
+
+    scheduler.record_giveup()
+    raise ResourceDownError(
+        f"url unresponsive after {scheduler.max_retries} tries: {url}"
+    )
+
+
+def _is_modified(
+    response: httpx.Response,
+    latency: float,
+    metrics: RunMetrics,
+    watermarks: Optional[Watermarks],
+    key: str,
+) -> bool:
+    """Records the ETag of a successful response, or the request of a day that
+    was not modified, and returns whether the response has a body to parse."""
+    if response.status_code == 304:
+        metrics.record("fetch", StageMetrics(calls=1, seconds=latency))
+        watermarks.unchanged.add(key)
+        return False
+    etag = response.headers.get("ETag")
+    if watermarks is not None and etag:
+        watermarks.received[key] = etag
+    return True
+
+
+def _parse_response(
+    response: httpx.Response,
+    latency: float,
+    metrics: RunMetrics,
+    df_reader_fn: Callable,
+    **kwargs,
+) -> pd.DataFrame:
+    """Parses the body of a successful response and records its metrics."""
+    # bytes on the wire before decompression, unknown for preloaded responses
+    wire_bytes = response.num_bytes_downloaded or len(response.content)
+    metrics.record("fetch", StageMetrics(calls=1, seconds=latency, bytes=wire_bytes))
+    with metrics.stage("parse") as call:
+        # a BytesIO created from bytes shares their buffer instead of copying it
+        df = df_reader_fn(io.BytesIO(response.content), **kwargs)
+        call.rows = len(df)
+    return df
+
+
+def _read_cache(
+    cache: Optional[RawCache], url: str, metrics: RunMetrics, offline: bool
+) -> Optional[pd.DataFrame]:
+    """Returns the cached frame of an url, if any.
+
+    Raises:
+        ResourceDownError: raised offline when the url is not cached
+    """
+    if cache is None or cache.write_only:
+        return None
+    with metrics.stage("cache_read") as call:
+        df = cache.get(url, ignore_ttl=offline)
+        call.rows = len(df) if df is not None else 0
+    if df is None and offline:
+        raise ResourceDownError(f"url not cached, offline: {_strip_query(url)}")
+    return df
+
+
+def _write_cache(
+    cache: Optional[RawCache], url: str, df: pd.DataFrame, metrics: RunMetrics
+):
+    if cache is None:
+        return
+    with metrics.stage("cache_write") as call:
+        call.bytes = cache.put(url, df)
+        call.rows = len(df)
+
+
+def _handle_failure(
+    scheduler: RequestScheduler,
+    url: str,
+    status: Optional[int],
+    error: Exception,
+    attempt: int,
+) -> bool:
+    """Records a failed request and returns whether it should be retried.
+
+    Raises:
+        AuthorizationError: raised when the api key is rejected
+        ResourceDownError: raised on failures that are not transient
+    """
+    scheduler.record_failure(status)
+    if status == 403:
+        scheduler.record_giveup()
+        raise AuthorizationError(f"api key rejected by url: {url}") from error
+    if not scheduler.is_retryable(status):
+        scheduler.record_giveup()
+        raise ResourceDownError(f"url failed with status {status}: {url}") from error
+    if attempt + 1 == scheduler.max_retries:
+        return False
+    log.warning(f"failed to GET from url:{url}, error:`{error}`, retrying")
+    return True
+
+
+def _day_key(extraction_type: ExtractorType, date: datetime.date) -> str:
+    """Returns the key of a day in the watermarks, its url without query."""
+    return _strip_query(get_data_url(extraction_type, date.isoformat(), ""))
+
 
-    raise ResourceDownError(f"url unresponsive after {MAX_RETRIES} tries: {url}")
+def _strip_query(url: str) -> str:
+    """Returns an url without its query string, which holds the api key."""
+    return url.split("?", 1)[0]
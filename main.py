@@ -1,13 +1,37 @@
+import dataclasses
 import logging as log
 import os
 from argparse import ArgumentParser
 from datetime import date, timedelta
 
+import extractors
 from extractors import (
+    AuthorizationError,
     DateInterval,
+    ExtractionOptions,
+    FetchMode,
     InvalidDateError,
+    ReaderEngine,
     ResourceDownError,
-    run_weather_extractors,
+)
+from extractors.backfill import SHARD_DAYS
+from extractors.core import CODECS, FILETYPES, PARQUET_ENGINES, WriterOptions
+from extractors.manifest import Manifest
+from extractors.metrics import RunMetrics, RunSummary
+from extractors.options import (
+    CACHE_DIR,
+    MANIFEST_PATH,
+    OUTPUT_DIR,
+    PROFILE_DIR,
+    get_pending_dates,
+)
+from extractors.registry import get_extractors
+from extractors.rollups import ROLLUPS, rollup_dir
+from extractors.service import (
+    HEALTH_PORT,
+    LOOKBACK_DAYS,
+    POLL_INTERVAL_SEC,
+    ExtractionService,
 )
 
 log.basicConfig(level=log.DEBUG)
@@ -27,23 +51,363 @@ def main():
         type=date.fromisoformat,
         default=date.today(),
     )
+    parser.add_argument(
+        "--extractors",
+        help="names of the data types to extract, every registered type (solar "
+        "and wind) by default",
+        nargs="+",
+    )
+    parser.add_argument(
+        "--async",
+        help="fetch all days concurrently instead of one after the other",
+        action="store_true",
+        dest="async_fetch",
+    )
+    parser.add_argument(
+        "--concurrency",
+        help="max in-flight requests when fetching with --async",
+        type=int,
+        default=ExtractionOptions.max_concurrency,
+    )
+    parser.add_argument(
+        "--sequential",
+        help="run the solar and wind pipelines one after the other",
+        action="store_false",
+        dest="parallel",
+    )
+    parser.add_argument(
+        "--processes",
+        help="clean and write data in a process pool",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--max-rate",
+        help="initial requests per second, adapted to throttling during the run",
+        type=float,
+        default=ExtractionOptions.max_request_rate,
+    )
+    parser.add_argument(
+        "--full-refresh",
+        help="extract every day of the range, even days extracted by earlier runs",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--refresh",
+        help="also check the days extracted by earlier runs for changes, only "
+        "days whose Last Modified utc advanced are rewritten",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--batch-days",
+        help="fetch, clean and write this many days at a time to bound memory use",
+        type=int,
+    )
+    parser.add_argument(
+        "--compact-values",
+        help="store values as float32 instead of float64",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--reader",
+        help="engine parsing API responses, arrow requires pyarrow",
+        choices=[engine.value for engine in ReaderEngine],
+        default=ReaderEngine.PANDAS.value,
+    )
+    parser.add_argument(
+        "--metrics-json",
+        help="write the metrics of the run to this JSON file",
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        help="write the metrics of the run to this Prometheus textfile",
+    )
+    parser.add_argument(
+        "--backfill",
+        help="extract the range in date shards processed by a pool of processes",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        help="worker processes of a --backfill, defaults to the number of cores",
+        type=int,
+    )
+    parser.add_argument(
+        "--shard-days",
+        help="days extracted by one worker task of a --backfill",
+        type=int,
+        default=SHARD_DAYS,
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="directory caching raw API responses",
+        default=CACHE_DIR,
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="do not read or write the raw response cache",
+        action="store_false",
+        dest="cache",
+    )
+    parser.add_argument(
+        "--cache-ttl-days",
+        help="fetch days cached longer ago again",
+        type=float,
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        help="evict least recently used responses above this cache size",
+        type=int,
+    )
+    parser.add_argument(
+        "--offline",
+        help="rebuild outputs from the raw cache only, combine with --full-refresh "
+        "to rebuild days already extracted",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--compact",
+        help="merge the day files of each year=/month= partition of the output "
+        "after the run",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--compact-target-mb",
+        help="size aimed for by the files written by --compact",
+        type=int,
+        default=128,
+    )
+    parser.add_argument(
+        "--rollups",
+        help="also write the mean/min/max/count per variable and period of the "
+        "extracted days to OUTPUT_DIR/rollups/<granularity>",
+        nargs="+",
+        choices=list(ROLLUPS),
+    )
+    parser.add_argument(
+        "--profile",
+        help="profile fetch, parse, clean and write (cProfile, memory and stack "
+        "samples for flame graphs) and write the reports to DIR "
+        f"(default: {PROFILE_DIR})",
+        metavar="DIR",
+        nargs="?",
+        const=PROFILE_DIR,
+    )
+    parser.add_argument(
+        "--serve",
+        help="keep running and extract new days every --poll-interval-min, "
+        "instead of extracting --from/--to once. Stops on SIGTERM",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--poll-interval-min",
+        help="minutes between two polls for new days with --serve",
+        type=float,
+        default=POLL_INTERVAL_SEC / 60,
+    )
+    parser.add_argument(
+        "--lookback-days",
+        help="days, ending today, checked by each poll with --serve",
+        type=int,
+        default=LOOKBACK_DAYS,
+    )
+    parser.add_argument(
+        "--health-port",
+        help="port of the /healthz and /metrics endpoints with --serve",
+        type=int,
+        default=HEALTH_PORT,
+    )
+    parser.add_argument(
+        "--writer-config",
+        help="JSON file with the output writer options, overridden by the flags "
+        'below, e.g. {"compression": "zstd", "sort_by": ["timestamp"]}',
+    )
+    parser.add_argument(
+        "--output-format",
+        help="format of the output files, feather (Arrow IPC) requires pyarrow",
+        choices=FILETYPES,
+        dest="filetype",
+    )
+    parser.add_argument(
+        "--compression",
+        help="codec of the output files, default of the format when not set",
+        choices=CODECS,
+    )
+    parser.add_argument("--compression-level", help="level of the codec", type=int)
+    parser.add_argument(
+        "--row-group-size",
+        help="max rows of each parquet row group or feather record batch",
+        type=int,
+    )
+    parser.add_argument(
+        "--sort-by",
+        help="columns the output rows are sorted by, e.g. timestamp",
+        nargs="+",
+    )
+    parser.add_argument(
+        "--page-index",
+        help="write the parquet page index (pyarrow)",
+        action="store_const",
+        const=True,
+    )
+    parser.add_argument(
+        "--no-statistics",
+        help="do not write parquet column statistics",
+        action="store_const",
+        const=False,
+        dest="statistics",
+    )
+    parser.add_argument(
+        "--no-dictionary",
+        help="do not dictionary encode parquet columns (pyarrow)",
+        action="store_const",
+        const=False,
+        dest="dictionary",
+    )
+    parser.add_argument(
+        "--parquet-engine",
+        help="engine writing parquet files, auto uses pyarrow when installed",
+        choices=PARQUET_ENGINES,
+        dest="engine",
+    )
     args = parser.parse_args()
+    if args.offline and not args.cache:
+        parser.error(
+            "--offline reads from the cache, it cannot be used with --no-cache"
+        )
+    try:
+        get_extractors(args.extractors)
+    except NotImplementedError as e:
+        parser.error(str(e))
     if not args.from_:
         args.from_ = args.to - timedelta(days=7)
     log.debug(f"transforming data in range {args.from_} -> {args.to}")
 
+    try:
+        writer = _get_writer_options(args)
+    except (OSError, ValueError) as e:
+        parser.error(f"invalid writer options: {e}")
+
     # get API key from environment
     api_key = os.getenv("WEATHER_API_KEY")
-    if not api_key:
+    if not api_key and not args.offline:
         raise RuntimeError("ENV variable `WEATHER_API_KEY` required")
     try:
-        run_weather_extractors(DateInterval(args.from_, args.to), api_key)
+        options = ExtractionOptions(
+            fetch_mode=FetchMode.ASYNC if args.async_fetch else FetchMode.SYNC,
+            max_concurrency=args.concurrency,
+            parallel=args.parallel,
+            use_processes=args.processes,
+            max_request_rate=args.max_rate,
+            manifest_path=MANIFEST_PATH,
+            extractors=args.extractors,
+            full_refresh=args.full_refresh,
+            refresh=args.refresh,
+            batch_days=args.batch_days,
+            compact_values=args.compact_values,
+            reader_engine=ReaderEngine(args.reader),
+            metrics_json_path=args.metrics_json,
+            metrics_prometheus_path=args.metrics_prom,
+            cache_dir=args.cache_dir if args.cache else None,
+            cache_ttl_sec=(
+                args.cache_ttl_days * 86400 if args.cache_ttl_days else None
+            ),
+            cache_max_bytes=args.cache_max_mb * 2**20 if args.cache_max_mb else None,
+            offline=args.offline,
+            writer=writer,
+            rollups=args.rollups or (),
+            profile_dir=args.profile,
+        )
+        timespan = DateInterval(args.from_, args.to)
+        if timespan.to_date < timespan.from_date:
+            raise InvalidDateError()
+        if args.serve:
+            service = ExtractionService(
+                api_key,
+                options,
+                poll_interval_sec=args.poll_interval_min * 60,
+                lookback_days=args.lookback_days,
+                port=args.health_port,
+            )
+            service.serve_forever()
+        elif not _has_pending_days(timespan, options):
+            # finish without loading the pipeline (pandas, httpx)
+            log.info("all days already extracted, nothing to do")
+            RunMetrics().summary().write(args.metrics_json, args.metrics_prom)
+        elif args.backfill:
+            result = extractors.run_backfill(
+                timespan, api_key, options, args.workers, args.shard_days
+            )
+            if result.failed_shards:
+                raise ResourceDownError(
+                    f"{len(result.failed_shards)} shards failed after retries"
+                )
+            _log_summary(result.summary)
+        else:
+            _log_summary(extractors.run_weather_extractors(timespan, api_key, options))
+        if args.compact:
+            extractors.compact_output(
+                OUTPUT_DIR,
+                target_bytes=args.compact_target_mb * 2**20,
+                writer=writer,
+            )
+            # rollups have no `value` column to sort by
+            rollup_writer = dataclasses.replace(writer, sort_by=None)
+            for granularity in args.rollups or ():
+                extractors.compact_output(
+                    rollup_dir(granularity, OUTPUT_DIR),
+                    target_bytes=args.compact_target_mb * 2**20,
+                    writer=rollup_writer,
+                )
     except InvalidDateError:
         parser.error("FROM date must be before TO date")
+    except AuthorizationError:
+        log.error("extractor failed: api key rejected by remote resource")
+        raise
     except ResourceDownError:
         log.error("extractor failed: cannot fetch data from remote resource")
         raise
 
 
+def _get_writer_options(args) -> WriterOptions:
+    """Returns the writer options of the config file overridden by the flags."""
+    writer = WriterOptions()
+    if args.writer_config:
+        writer = WriterOptions.from_file(args.writer_config)
+    overrides = {}
+    for name in (
+        "filetype",
+        "compression",
+        "compression_level",
+        "row_group_size",
+        "sort_by",
+        "page_index",
+        "statistics",
+        "dictionary",
+        "engine",
+    ):
+        if getattr(args, name) is not None:
+            overrides[name] = getattr(args, name)
+    return dataclasses.replace(writer, **overrides)
+
+
+def _log_summary(summary: RunSummary):
+    for extractor, elapsed in summary.extractors.items():
+        log.info(f"extractor:{extractor} wall time {elapsed:.2f}s")
+    for stage, metrics in summary.stages.items():
+        log.info(
+            f"stage:{stage} {metrics.seconds:.2f}s rows:{metrics.rows} "
+            f"bytes:{metrics.bytes}"
+        )
+
+
+def _has_pending_days(timespan: DateInterval, options: ExtractionOptions) -> bool:
+    """Returns whether any day of the timespan is missing from the manifest."""
+    if options.full_refresh or options.refresh or not options.manifest_path:
+        return True
+    manifest = Manifest(options.manifest_path)
+    extractors = get_extractors(options.extractors)
+    return bool(get_pending_dates(extractors, timespan, manifest))
+
+
 if __name__ == "__main__":
     main()
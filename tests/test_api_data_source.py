@@ -0,0 +1,233 @@
+import asyncio
+import io
+import json
+import math
+import time
+from datetime import date
+from random import Random
+
+import httpx
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from api_data_source.backend import (
+    CHUNK_ROWS,
+    _serialize,
+    generate_dataframe,
+    get_payload,
+    iter_csv_chunks,
+)
+from api_data_source.main import create_app
+from api_data_source.middleware import (
+    ERROR_STATUSES,
+    LATENCY_DISTRIBUTIONS,
+    BlockHosts,
+    LoadProfile,
+    get_throttle_rate,
+)
+from benchmarks.server import serve_api
+
+API_KEY = "ADU8S67Ddy!d7f?"
+URL = f"/2024-06-20/renewables/solargen.json?api_key={API_KEY}"
+
+
+def test_throttle_rate_disabled():
+    client = TestClient(create_app(throttle_rate=0))
+    assert all(client.get(URL).status_code == 200 for _ in range(20))
+
+
+def test_throttle_rate_always():
+    client = TestClient(create_app(throttle_rate=1))
+    assert all(client.get(URL).status_code == 429 for _ in range(20))
+    # health checks are never throttled
+    assert client.get("/status").status_code == 200
+
+
+def test_throttle_rate_from_environment(monkeypatch):
+    monkeypatch.setenv("API_THROTTLE_RATE", "0.5")
+    assert get_throttle_rate() == 0.5
+    with pytest.raises(ValueError):
+        BlockHosts(create_app(), throttle_rate=1.5)
+
+
+def test_load_profile_from_environment(monkeypatch):
+    assert LoadProfile.from_env() == LoadProfile()
+    monkeypatch.setenv("API_LATENCY_MS", "80")
+    monkeypatch.setenv("API_LATENCY_DISTRIBUTION", "exponential")
+    monkeypatch.setenv("API_MAX_CONCURRENCY", "4")
+    assert LoadProfile.from_env() == LoadProfile(
+        latency_ms=80, latency_distribution="exponential", max_concurrency=4
+    )
+    with pytest.raises(ValueError):
+        LoadProfile(latency_distribution="pareto")
+    with pytest.raises(ValueError):
+        LoadProfile(error_rate=0.6, truncate_rate=0.6)
+    with pytest.raises(ValueError):
+        LoadProfile(max_concurrency=0)
+
+
+@pytest.mark.parametrize("distribution", LATENCY_DISTRIBUTIONS)
+def test_latency_distributions(distribution):
+    load = LoadProfile(latency_ms=50, latency_distribution=distribution)
+    rng = Random(0)
+    latencies = [load.sample_latency(rng) for _ in range(20000)]
+    assert min(latencies) >= 0
+    assert sum(latencies) / len(latencies) == pytest.approx(0.05, rel=0.05)
+    assert LoadProfile(latency_distribution=distribution).sample_latency(rng) == 0
+
+
+def test_latency_and_server_errors():
+    load = LoadProfile(latency_ms=50, error_rate=1)
+    client = TestClient(create_app(throttle_rate=0, load=load))
+    start = time.perf_counter()
+    assert client.get(URL).status_code in ERROR_STATUSES
+    assert time.perf_counter() - start >= 0.05
+    # health checks are not affected
+    assert client.get("/status").status_code == 200
+
+
+def test_dripped_responses():
+    load = LoadProfile(drip_rate=1, drip_delay_ms=0)
+    client = TestClient(create_app(throttle_rate=0, load=load))
+    response = client.get(URL, headers={"Accept-Encoding": "identity"})
+    assert response.content == get_payload("2024-06-20", "json").body
+    url = f"/renewables/windgen.csv?api_key={API_KEY}&from=2024-06-19&to=2024-06-20"
+    assert len(pd.read_csv(io.BytesIO(client.get(url).content))) == 2 * 289
+
+
+def test_truncated_responses():
+    load = LoadProfile(truncate_rate=1)
+    with serve_api(0, throttle_rate=0, load=load) as endpoint:
+        with pytest.raises(httpx.RemoteProtocolError):
+            httpx.get(f"{endpoint}{URL}")
+
+
+def test_concurrency_cap():
+    async def slow_app(scope, receive, send):
+        await asyncio.sleep(0.05)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def get_concurrently(app, requests: int):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport) as client:
+            url = f"http://api{URL}"
+            responses = await asyncio.gather(
+                *(client.get(url) for _ in range(requests))
+            )
+        return sorted(response.status_code for response in responses)
+
+    app = BlockHosts(slow_app, throttle_rate=0, load=LoadProfile(max_concurrency=2))
+    assert asyncio.run(get_concurrently(app, 3)) == [200, 200, 429]
+    assert app.in_flight == 0
+    assert asyncio.run(get_concurrently(app, 2)) == [200, 200]
+
+
+def test_forbidden_without_api_key():
+    client = TestClient(create_app(throttle_rate=0))
+    assert client.get("/2024-06-20/renewables/windgen.csv").status_code == 403
+
+
+def test_generated_data_is_deterministic_per_date():
+    assert generate_dataframe("2024-06-20").equals(generate_dataframe("2024-06-20"))
+    assert not generate_dataframe("2024-06-20").equals(generate_dataframe("2024-06-21"))
+
+
+def test_payload_cache():
+    _serialize.cache_clear()
+    payload = get_payload("2024-06-20", "csv")
+    # dates and date strings share cache entries
+    assert get_payload(date(2024, 6, 20), "csv") is payload
+    assert _serialize.cache_info().hits == 1
+    expected = generate_dataframe("2024-06-20").to_csv(index=False).encode()
+    assert payload.body == expected
+    with pytest.raises(ValueError):
+        get_payload("2024-06-20", "xml")
+
+
+def test_etag_not_modified():
+    client = TestClient(create_app(throttle_rate=0))
+    response = client.get(URL)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+
+    response = client.get(URL, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = client.get(URL, headers={"If-None-Match": '"stale", W/' + etag})
+    assert response.status_code == 304
+    response = client.get(URL, headers={"If-None-Match": '"stale"'})
+    assert response.status_code == 200
+
+
+def test_csv_range_streams_concatenated_days():
+    client = TestClient(create_app(throttle_rate=0))
+    url = f"/renewables/windgen.csv?api_key={API_KEY}&from=2024-06-19&to=2024-06-21"
+    response = client.get(url)
+    assert response.status_code == 200
+    df = pd.read_csv(io.BytesIO(response.content))
+    expected = pd.concat(
+        generate_dataframe(d) for d in ("2024-06-19", "2024-06-20", "2024-06-21")
+    )
+    assert len(df) == len(expected)
+    assert df[" Variable"].tolist() == expected[" Variable"].tolist()
+
+
+def test_csv_chunks():
+    chunks = list(iter_csv_chunks(["2024-06-20", "2024-06-21"]))
+    rows = len(generate_dataframe("2024-06-20"))
+    # the header, then chunks of at most CHUNK_ROWS rows of one day
+    assert len(chunks) == 1 + 2 * math.ceil(rows / CHUNK_ROWS)
+    assert b"".join(chunks[:3]) == get_payload("2024-06-20", "csv").body
+
+
+def test_json_range():
+    client = TestClient(create_app(throttle_rate=0))
+    url = f"/renewables/solargen.json?api_key={API_KEY}&from=2024-06-20&to=2024-06-21"
+    records = client.get(url).json()
+    assert len(records) == 2 * len(generate_dataframe("2024-06-20"))
+    assert records[0] == json.loads(get_payload("2024-06-20", "json").body)[0]
+
+
+def test_invalid_range():
+    client = TestClient(create_app(throttle_rate=0))
+    url = f"/renewables/windgen.csv?api_key={API_KEY}&from=2024-06-21&to=2024-06-20"
+    assert client.get(url).status_code == 400
+    url = f"/renewables/windgen.csv?api_key={API_KEY}&from=2020-01-01&to=2024-06-20"
+    assert client.get(url).status_code == 400
+
+
+def test_gzip_responses():
+    client = TestClient(create_app(throttle_rate=0))
+    response = client.get(URL, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.content == get_payload("2024-06-20", "json").body
+
+    response = client.get(URL, headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_gzip_etag():
+    client = TestClient(create_app(throttle_rate=0))
+    etag = client.get(URL, headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    assert etag.endswith('-gzip"')
+    response = client.get(
+        URL, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    # the tag of the compressed body does not match the identity body
+    response = client.get(
+        URL, headers={"Accept-Encoding": "identity", "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+
+def test_gzip_range_responses():
+    client = TestClient(create_app(throttle_rate=0))
+    url = f"/renewables/windgen.csv?api_key={API_KEY}&from=2024-06-19&to=2024-06-20"
+    response = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(pd.read_csv(io.BytesIO(response.content))) == 2 * 289
@@ -0,0 +1,110 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import httpx
+import pytest
+
+from extractors.backfill import run_backfill, split_timespan
+from extractors.core import DateInterval
+from extractors.manifest import Manifest
+from extractors.options import ExtractionOptions
+from extractors.weather import MAX_RETRIES
+from tests.test_weather import _day_api_handler, _patch_http_client
+
+TIMESPAN = DateInterval(date(2024, 6, 1), date(2024, 6, 10))
+
+
+@pytest.fixture(autouse=True)
+def thread_pool(monkeypatch, tmp_path):
+    # mocks do not reach worker processes, shards run in threads instead
+    monkeypatch.setattr("extractors.backfill.ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+
+
+def test_split_timespan():
+    shards = split_timespan(TIMESPAN, 4)
+    assert shards == [
+        DateInterval(date(2024, 6, 1), date(2024, 6, 4)),
+        DateInterval(date(2024, 6, 5), date(2024, 6, 8)),
+        DateInterval(date(2024, 6, 9), date(2024, 6, 10)),
+    ]
+    assert split_timespan(TIMESPAN, 30) == [TIMESPAN]
+    with pytest.raises(ValueError):
+        split_timespan(TIMESPAN, 0)
+
+
+def test_run_backfill(tmp_path):
+    options = ExtractionOptions(manifest_path=str(tmp_path / "_manifest.jsonl"))
+    with _patch_http_client(_day_api_handler):
+        result = run_backfill(TIMESPAN, "apikey", options, workers=2, shard_days=3)
+
+    assert [shard.attempts for shard in result.shards] == [1, 1, 1, 1]
+    assert result.failed_shards == []
+    assert result.summary.requests["successes"] == 20
+    assert result.summary.stages["write"].calls == 20
+    assert set(result.summary.extractors) == {"solar", "wind"}
+    manifest = Manifest(options.manifest_path)
+    assert manifest.missing_dates("wind", TIMESPAN.iter_dates()) == []
+    day_dir = tmp_path / "solar" / "year=2024" / "month=06" / "day=07"
+    assert (day_dir / "data.parquet").exists()
+
+    # extracted shards are not submitted again
+    result = run_backfill(TIMESPAN, "apikey", options, workers=2, shard_days=3)
+    assert result.shards == []
+
+
+def test_run_backfill_retries_failed_shards(tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.time.sleep", lambda seconds: None)
+    paths = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        paths.append(request.url.path)
+        # a day of the second shard is down during the first attempt
+        if request.url.path == "/2024-06-05/renewables/windgen.csv":
+            if paths.count(request.url.path) <= MAX_RETRIES:
+                return httpx.Response(503)
+        return _day_api_handler(request)
+
+    options = ExtractionOptions(
+        manifest_path=str(tmp_path / "_manifest.jsonl"), parallel=False
+    )
+    with _patch_http_client(handler):
+        result = run_backfill(TIMESPAN, "apikey", options, workers=2, shard_days=4)
+
+    assert [shard.attempts for shard in result.shards] == [1, 2, 1]
+    assert result.failed_shards == []
+    # the retry only fetches the days missing from the manifest
+    assert sum(path.endswith("solargen.json") for path in paths) == 10
+    manifest = Manifest(options.manifest_path)
+    assert manifest.missing_dates("wind", TIMESPAN.iter_dates()) == []
+
+
+def test_run_backfill_gives_up(tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.time.sleep", lambda seconds: None)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.startswith("/2024-06-10/"):
+            return httpx.Response(503)
+        return _day_api_handler(request)
+
+    with _patch_http_client(handler):
+        result = run_backfill(
+            TIMESPAN, "apikey", workers=2, shard_days=4, max_attempts=2
+        )
+
+    failed = result.failed_shards
+    assert [shard.shard for shard in failed] == [split_timespan(TIMESPAN, 4)[2]]
+    assert failed[0].attempts == 2
+    assert failed[0].error.startswith("ResourceDownError")
+    assert result.summary.stages["write"].calls == 16
+
+
+def test_run_backfill_does_not_retry_rejected_api_key(tmp_path):
+    with _patch_http_client(lambda request: httpx.Response(403)):
+        result = run_backfill(
+            TIMESPAN, "apikey", workers=2, shard_days=4, max_attempts=3
+        )
+
+    assert len(result.failed_shards) == 3
+    assert all(shard.attempts == 1 for shard in result.shards)
+    assert all(shard.error.startswith("AuthorizationError") for shard in result.shards)
@@ -0,0 +1,73 @@
+import os
+import time
+
+import pandas as pd
+
+from extractors.cache import RawCache
+
+URL = "http://localhost:8000/2024-06-20/renewables/windgen.csv"
+
+
+def _raw_df(rows: int = 3) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Naive_Timestamp ": ["2024-06-20 00:00:00+00:00"] * rows,
+            " Variable": pd.Series([991] * rows, dtype="int16"),
+            "value": [31.4485644825] * rows,
+            "Last Modified utc": ["2024-06-20 00:00:00+00:00"] * rows,
+        }
+    )
+
+
+def test_raw_cache_roundtrip(tmp_path):
+    cache = RawCache(str(tmp_path))
+    assert cache.get(URL) is None
+    size = cache.put(f"{URL}?api_key=secret", _raw_df())
+    assert size == cache.size > 0
+
+    # the api key is not part of the key
+    df = cache.get(f"{URL}?api_key=other")
+    pd.testing.assert_frame_equal(df, _raw_df())
+    assert cache.contains(URL)
+    assert not cache.contains(URL.replace("windgen.csv", "solargen.json"))
+    assert os.path.dirname(cache.path(URL)) == str(tmp_path / RawCache.key(URL)[:2])
+    # a reopened cache knows its size
+    assert RawCache(str(tmp_path)).size == size
+
+
+def test_raw_cache_ttl(tmp_path):
+    cache = RawCache(str(tmp_path), ttl_sec=60)
+    cache.put(URL, _raw_df())
+    assert cache.get(URL) is not None
+
+    old = time.time() - 120
+    os.utime(cache.path(URL), (old, old))
+    assert cache.get(URL) is None
+    assert not cache.contains(URL)
+    assert cache.get(URL, ignore_ttl=True) is not None
+    # reading an entry does not make it fresh again
+    assert cache.get(URL) is None
+
+
+def test_raw_cache_write_only(tmp_path):
+    cache = RawCache(str(tmp_path), write_only=True)
+    cache.put(URL, _raw_df())
+    assert cache.get(URL) is None
+    assert RawCache(str(tmp_path)).get(URL) is not None
+
+
+def test_raw_cache_evicts_least_recently_used(tmp_path):
+    urls = [URL.replace("06-20", f"06-0{day}") for day in range(1, 4)]
+    size = RawCache(str(tmp_path / "probe")).put(URL, _raw_df())
+    cache = RawCache(str(tmp_path / "cache"), max_bytes=int(size * 2.5))
+    for i, url in enumerate(urls[:2]):
+        cache.put(url, _raw_df())
+        os.utime(cache.path(url), (i, i))
+    # reading the oldest entry makes it the most recently used
+    assert cache.get(urls[0]) is not None
+
+    cache.put(urls[2], _raw_df())
+    assert cache.contains(urls[0])
+    assert not cache.contains(urls[1])
+    assert cache.contains(urls[2])
+    assert cache.size <= cache.max_bytes
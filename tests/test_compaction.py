@@ -0,0 +1,137 @@
+import math
+import os
+
+import pandas as pd
+
+from extractors.compaction import (
+    compact_output,
+    compact_partition,
+    remove_compacted_days,
+)
+from extractors.core import write_to_file
+from extractors.options import WeatherExtractionType
+
+
+def _day_df(day: int, last_modified: str, value: float = 1.0) -> pd.DataFrame:
+    timestamps = pd.date_range(f"2024-06-{day:02d}", periods=3, freq="5min", tz="UTC")
+    return pd.DataFrame(
+        {
+            "timestamp": timestamps,
+            "variable": pd.Series([991, 991, 992], dtype="int16"),
+            "value": [value] * 3,
+            "last_modified_utc": pd.Timestamp(last_modified, tz="UTC"),
+        }
+    )
+
+
+def _write_day(output_dir, day: int, df: pd.DataFrame) -> str:
+    path = output_dir / "wind" / "year=2024" / "month=06" / f"day={day:02d}"
+    write_to_file(str(path / "data.parquet"), df, filetype="parquet")
+    return str(path)
+
+
+def test_compact_partition(tmp_path):
+    for day in (21, 20, 22):
+        _write_day(tmp_path, day, _day_df(day, "2024-06-23"))
+    partition_dir = tmp_path / "wind" / "year=2024" / "month=06"
+
+    stats = compact_partition(str(partition_dir))
+    assert (stats.files_in, stats.files_out, stats.rows_out) == (3, 1, 9)
+    [part] = os.listdir(partition_dir)
+    assert part.startswith("part-")
+    df = pd.read_parquet(partition_dir / part)
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["variable"].dtype == "int16"
+    assert str(df["timestamp"].dt.tz) == "UTC"
+
+
+def test_compact_partition_dedupes_latest(tmp_path):
+    partition_dir = tmp_path / "wind" / "year=2024" / "month=06"
+    _write_day(tmp_path, 20, _day_df(20, "2024-06-21", value=1.0))
+    compact_partition(str(partition_dir))
+    # the day is extracted again with newer data after the compaction
+    _write_day(tmp_path, 20, _day_df(20, "2024-06-22", value=2.0))
+
+    stats = compact_partition(str(partition_dir))
+    assert (stats.rows_in, stats.rows_out) == (6, 3)
+    [part] = os.listdir(partition_dir)
+    df = pd.read_parquet(partition_dir / part)
+    assert df["value"].tolist() == [2.0] * 3
+
+
+def test_remove_compacted_days(tmp_path):
+    for day in (20, 21):
+        _write_day(tmp_path, day, _day_df(day, "2024-06-22"))
+    partition_dir = tmp_path / "wind" / "year=2024" / "month=06"
+    compact_partition(str(partition_dir))
+    # the day is extracted again with newer data after the compaction
+    day_dir = _write_day(tmp_path, 20, _day_df(20, "2024-06-23", value=2.0))
+
+    day_file = os.path.join(day_dir, "data.parquet")
+    assert remove_compacted_days([day_file]) == 3
+    df = pd.read_parquet(tmp_path / "wind")
+    assert not df.duplicated(["timestamp", "variable"]).any()
+    assert sorted(df["value"].tolist()) == [1.0] * 3 + [2.0] * 3
+    # the last day of a compacted file removes the file
+    _write_day(tmp_path, 21, _day_df(21, "2024-06-23"))
+    day_file = str(partition_dir / "day=21" / "data.parquet")
+    assert remove_compacted_days([day_file]) == 3
+    assert not [name for name in os.listdir(partition_dir) if name.startswith("part-")]
+    assert remove_compacted_days([day_file]) == 0
+
+
+def test_compact_partition_day_written_while_compacting(tmp_path, monkeypatch):
+    for day in (20, 21):
+        _write_day(tmp_path, day, _day_df(day, "2024-06-22"))
+    partition_dir = tmp_path / "wind" / "year=2024" / "month=06"
+
+    def write_part(path, df, **kwargs):
+        # the day is extracted again before the compacted file is in place
+        if not written:
+            _write_day(tmp_path, 20, _day_df(20, "2024-06-23", value=2.0))
+        written.append(path)
+        return write_to_file(path, df, **kwargs)
+
+    written = []
+
+    monkeypatch.setattr("extractors.compaction.write_to_file", write_part)
+    compact_partition(str(partition_dir))
+
+    assert (partition_dir / "day=20" / "data.parquet").exists()
+    df = pd.read_parquet(tmp_path / "wind")
+    assert not df.duplicated(["timestamp", "variable"]).any()
+    assert df[df["timestamp"].dt.day == 20]["value"].tolist() == [2.0] * 3
+
+
+def test_compact_partition_target_size(tmp_path):
+    for day in range(1, 5):
+        _write_day(tmp_path, day, _day_df(day, "2024-06-23"))
+    partition_dir = tmp_path / "wind" / "year=2024" / "month=06"
+    bytes_in = sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(partition_dir)
+        for name in names
+    )
+
+    # about 3 rows per file, the exact count depends on the parquet engine
+    target_bytes = bytes_in // 4
+    rows_per_file = max(1, int(target_bytes / (bytes_in / 12)))
+    stats = compact_partition(str(partition_dir), target_bytes=target_bytes)
+    assert stats.files_out == math.ceil(12 / rows_per_file) > 1
+    parts = os.listdir(partition_dir)
+    assert len(parts) == stats.files_out
+    sizes = [len(pd.read_parquet(partition_dir / part)) for part in parts]
+    assert sum(sizes) == 12 and max(sizes) == rows_per_file
+
+
+def test_compact_output(tmp_path):
+    _write_day(tmp_path, 20, _day_df(20, "2024-06-23"))
+    _write_day(tmp_path, 21, _day_df(21, "2024-06-23"))
+    solar_dir = tmp_path / "solar" / "year=2024" / "month=06" / "day=20"
+    write_to_file(str(solar_dir / "data.parquet"), _day_df(20, "2024-06-23"), "parquet")
+
+    stats = compact_output(str(tmp_path))
+    # a partition with a single file is left as is
+    assert stats.partitions == 1
+    assert (solar_dir / "data.parquet").exists()
+    assert compact_output(str(tmp_path), [WeatherExtractionType.WIND]).partitions == 0
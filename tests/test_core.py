@@ -1,9 +1,26 @@
 import os
+from datetime import date
 
+import numpy as np
 import pandas as pd
 import pytest
 
-from extractors.core import write_to_file
+from extractors.core import DateInterval, WriterOptions, write_to_file
+from extractors.parsers import arrow_available
+
+requires_arrow = pytest.mark.skipif(not arrow_available(), reason="pyarrow needed")
+
+
+def _output_df(rows: int = 100) -> pd.DataFrame:
+    timestamps = pd.date_range("2024-06-20", periods=rows, freq="5min", tz="UTC")
+    return pd.DataFrame(
+        {
+            "timestamp": timestamps[::-1],
+            "variable": pd.Series(np.arange(rows) % 3, dtype="int16"),
+            "value": np.linspace(0, 1, rows),
+            "last_modified_utc": timestamps[-1],
+        }
+    )
 
 
 def test_write_to_file_json():
@@ -20,3 +37,99 @@ def test_write_to_file_json():
 def test_write_to_file_invalid_type():
     with pytest.raises(ValueError):
         write_to_file("test_path.invalid", pd.DataFrame(), "invalid")
+
+
+def test_date_interval_iter_dates():
+    timespan = DateInterval(date(2024, 6, 30), date(2024, 7, 2))
+    assert list(timespan.iter_dates()) == [
+        date(2024, 6, 30),
+        date(2024, 7, 1),
+        date(2024, 7, 2),
+    ]
+    assert list(DateInterval(date(2024, 7, 2), date(2024, 7, 1)).iter_dates()) == []
+
+
+@requires_arrow
+def test_write_to_file_parquet_options(tmp_path):
+    import pyarrow.parquet as pq
+
+    path = str(tmp_path / "data.parquet")
+    options = WriterOptions(
+        compression="zstd",
+        compression_level=9,
+        row_group_size=30,
+        sort_by=["timestamp"],
+        page_index=True,
+        engine="pyarrow",
+    )
+    write_to_file(path, _output_df(), "parquet", options)
+
+    metadata = pq.ParquetFile(path).metadata
+    assert metadata.num_row_groups == 4
+    row_group = metadata.row_group(0)
+    assert row_group.column(0).compression == "ZSTD"
+    assert row_group.sorting_columns[0].column_index == 0
+    assert metadata.row_group(0).column(0).has_offset_index
+    df = pd.read_parquet(path)
+    assert df["timestamp"].is_monotonic_increasing
+    assert len(df) == 100
+
+
+def test_write_to_file_fastparquet_options(tmp_path):
+    path = str(tmp_path / "data.parquet")
+    options = WriterOptions(
+        compression="lz4",
+        row_group_size=30,
+        sort_by=["timestamp"],
+        statistics=False,
+        engine="fastparquet",
+    )
+    write_to_file(path, _output_df(), "parquet", options)
+
+    df = pd.read_parquet(path, engine="fastparquet")
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["variable"].dtype == "int16"
+    if arrow_available():
+        import pyarrow.parquet as pq
+
+        metadata = pq.ParquetFile(path).metadata
+        assert metadata.num_row_groups == 4
+        assert metadata.row_group(0).column(0).compression == "LZ4"
+        assert not metadata.row_group(0).column(0).statistics.has_min_max
+
+
+@requires_arrow
+def test_write_to_file_feather(tmp_path):
+    import pyarrow.feather as feather
+
+    path = str(tmp_path / "data.feather")
+    options = WriterOptions(filetype="feather", compression="none")
+    write_to_file(path, _output_df(), options.filetype, options)
+
+    # uncompressed files are memory mapped without copying
+    table = feather.read_table(path, memory_map=True)
+    assert table.num_rows == 100
+    assert str(table.schema.field("variable").type) == "int16"
+
+
+def test_writer_options_invalid(tmp_path):
+    with pytest.raises(ValueError):
+        WriterOptions(compression="brotli")
+    with pytest.raises(ValueError):
+        WriterOptions(filetype="csv")
+    with pytest.raises(ValueError):
+        WriterOptions(row_group_size=0)
+    with pytest.raises(ValueError):
+        WriterOptions(compression_level=3)
+    if arrow_available():
+        with pytest.raises(ValueError):
+            WriterOptions(filetype="feather", compression="snappy")
+    with pytest.raises(ValueError):
+        WriterOptions.from_dict({"codec": "zstd"})
+
+
+def test_writer_options_from_file(tmp_path):
+    path = tmp_path / "writer.json"
+    path.write_text('{"compression": "zstd", "sort_by": ["timestamp"]}')
+    options = WriterOptions.from_file(str(path))
+    assert options == WriterOptions(compression="zstd", sort_by=["timestamp"])
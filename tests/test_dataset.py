@@ -0,0 +1,114 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from extractors.compaction import compact_output, remove_compacted_days
+from extractors.core import WriterOptions, write_to_file
+from extractors.dataset import DatasetFilter, WeatherDataset
+from extractors.options import WeatherExtractionType
+from extractors.parsers import arrow_available
+
+requires_arrow = pytest.mark.skipif(not arrow_available(), reason="pyarrow needed")
+
+
+@pytest.fixture
+def output_dir(tmp_path):
+    # 2024-05-30 -> 2024-06-02, 3 variables every 5 minutes, values rise by day of year
+    for day in pd.date_range("2024-05-30", "2024-06-02"):
+        timestamps = pd.date_range(day, periods=288, freq="5min", tz="UTC")
+        df = pd.DataFrame(
+            {
+                "timestamp": timestamps.repeat(3),
+                "variable": np.tile(np.array([991, 992, 993], dtype="int16"), 288),
+                "value": np.linspace(0, 1, 864) + day.dayofyear,
+                "last_modified_utc": timestamps[-1],
+            }
+        )
+        path = day.strftime(f"{tmp_path}/wind/year=%Y/month=%m/day=%d/data.parquet")
+        write_to_file(path, df, "parquet", WriterOptions(row_group_size=100))
+    return tmp_path
+
+
+def test_dataset_partition_pruning(output_dir):
+    dataset = WeatherDataset(WeatherExtractionType.WIND, str(output_dir))
+    assert len(dataset.files()) == 4
+    june = dataset.files(DatasetFilter(from_date=date(2024, 6, 1)))
+    assert [path.split("/")[-2] for path in june] == ["day=01", "day=02"]
+    assert dataset.files(DatasetFilter(to_date=date(2024, 5, 1))) == []
+    assert WeatherDataset(WeatherExtractionType.SOLAR, str(output_dir)).files() == []
+
+    # compacted files are pruned by month
+    compact_output(str(output_dir))
+    may = dataset.files(DatasetFilter(date(2024, 5, 30), date(2024, 5, 30)))
+    assert len(may) == 1 and "month=05/part-" in may[0]
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+def test_dataset_day_extracted_after_compaction(output_dir, monkeypatch, arrow):
+    if arrow and not arrow_available():
+        pytest.skip("pyarrow needed")
+    monkeypatch.setattr("extractors.dataset.arrow_available", lambda: arrow)
+    compact_output(str(output_dir))
+    day = DatasetFilter(date(2024, 6, 1), date(2024, 6, 1))
+    dataset = WeatherDataset(WeatherExtractionType.WIND, str(output_dir))
+    df = dataset.to_pandas(day)
+    # the day is extracted again, as the extractors write it
+    path = f"{output_dir}/wind/year=2024/month=06/day=01/data.parquet"
+    write_to_file(path, df.assign(value=0.0), "parquet")
+    remove_compacted_days([path])
+
+    df = dataset.to_pandas(day)
+    assert len(df) == 864
+    assert (df["value"] == 0.0).all()
+
+
+@pytest.mark.parametrize("arrow", [True, False])
+def test_dataset_iter_frames(output_dir, monkeypatch, arrow):
+    if arrow and not arrow_available():
+        pytest.skip("pyarrow needed")
+    monkeypatch.setattr("extractors.dataset.arrow_available", lambda: arrow)
+    dataset = WeatherDataset(WeatherExtractionType.WIND, str(output_dir))
+    filter = DatasetFilter(
+        date(2024, 5, 31), date(2024, 6, 1), variables=[992], min_value=152.5
+    )
+
+    df = dataset.to_pandas(filter, columns=["timestamp", "value"])
+    assert list(df.columns) == ["timestamp", "value"]
+    # second half of may 31st and all of june 1st
+    assert len(df) == 144 + 288
+    assert df["timestamp"].min() >= pd.Timestamp("2024-05-31", tz="UTC")
+    assert df["timestamp"].max() < pd.Timestamp("2024-06-02", tz="UTC")
+    assert df["value"].min() >= 152.5
+    assert len(dataset.to_pandas(DatasetFilter(min_value=1000))) == 0
+
+
+@requires_arrow
+def test_dataset_iter_batches(output_dir):
+    import pyarrow as pa
+
+    dataset = WeatherDataset(WeatherExtractionType.WIND, str(output_dir))
+    filter = DatasetFilter(date(2024, 6, 2), date(2024, 6, 2), variables=[991])
+    batches = list(dataset.iter_batches(filter, batch_rows=50))
+    assert all(isinstance(batch, pa.RecordBatch) for batch in batches)
+    assert max(batch.num_rows for batch in batches) <= 50
+    assert sum(batch.num_rows for batch in batches) == 288
+
+
+@requires_arrow
+def test_dataset_feather_files(tmp_path):
+    writer = WriterOptions(filetype="feather")
+    df = pd.DataFrame(
+        {
+            "timestamp": pd.date_range("2024-06-20", periods=3, freq="h", tz="UTC"),
+            "variable": np.array([991, 992, 991], dtype="int16"),
+            "value": [1.0, 2.0, 3.0],
+        }
+    )
+    path = tmp_path / "solar" / "year=2024" / "month=06" / "day=20" / "data.feather"
+    write_to_file(str(path), df, writer.filetype, writer)
+
+    dataset = WeatherDataset(WeatherExtractionType.SOLAR, str(tmp_path))
+    result = dataset.to_pandas(DatasetFilter(variables=[991]))
+    assert result["value"].tolist() == [1.0, 3.0]
@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import pytest
+
+import extractors
+from extractors import weather
+from extractors.manifest import Manifest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_python(code: str, cwd: str = ROOT_DIR) -> subprocess.CompletedProcess:
+    env = {**os.environ, "PYTHONPATH": ROOT_DIR, "WEATHER_API_KEY": "apikey"}
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+        cwd=cwd,
+        env=env,
+    )
+
+
+def test_package_import_is_lazy():
+    result = _run_python(
+        "import sys\n"
+        "from extractors import DateInterval, ExtractionOptions, ReaderEngine\n"
+        "print(sorted(m for m in ('pandas', 'httpx') if m in sys.modules))"
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_package_exports():
+    assert extractors.run_weather_extractors is weather.run_weather_extractors
+    assert "run_weather_extractors" in dir(extractors)
+    with pytest.raises(AttributeError):
+        extractors.does_not_exist
+
+
+def test_noop_run_does_not_import_pandas(tmp_path):
+    manifest = Manifest(str(tmp_path / "output" / "_manifest.jsonl"))
+    to_date = date(2024, 6, 20)
+    for days in range(8):
+        for extraction_type in ("solar", "wind"):
+            manifest.record(extraction_type, to_date - timedelta(days=days))
+
+    result = _run_python(
+        "import runpy, sys\n"
+        "sys.argv = ['main.py', '--to', '2024-06-20', '--metrics-json', 'run.json']\n"
+        f"runpy.run_path({os.path.join(ROOT_DIR, 'main.py')!r}, run_name='__main__')\n"
+        "print('pandas' in sys.modules)",
+        cwd=str(tmp_path),
+    )
+    assert result.stdout.strip() == "False"
+    assert "nothing to do" in result.stderr
+    summary = json.loads((tmp_path / "run.json").read_text())
+    assert summary["extractors"] == {}
@@ -0,0 +1,36 @@
+from datetime import date
+
+from extractors.manifest import Manifest
+
+
+def test_manifest_record_and_reload(tmp_path):
+    path = str(tmp_path / "state" / "_manifest.jsonl")
+    manifest = Manifest(path)
+    manifest.record("solar", date(2024, 6, 20), "2024-06-20T00:00:00+00:00")
+    manifest.record("wind", date(2024, 6, 20))
+    assert manifest.is_extracted("solar", date(2024, 6, 20))
+    assert not manifest.is_extracted("solar", date(2024, 6, 21))
+
+    reloaded = Manifest(path)
+    entry = reloaded.get("solar", date(2024, 6, 20))
+    assert entry["last_modified_utc"] == "2024-06-20T00:00:00+00:00"
+    assert reloaded.missing_dates(
+        "wind", [date(2024, 6, 19), date(2024, 6, 20), date(2024, 6, 21)]
+    ) == [date(2024, 6, 19), date(2024, 6, 21)]
+
+
+def test_manifest_last_entry_wins(tmp_path):
+    path = str(tmp_path / "_manifest.jsonl")
+    Manifest(path).record("solar", date(2024, 6, 20), "2024-06-20T00:00:00+00:00")
+    Manifest(path).record("solar", date(2024, 6, 20), "2024-06-21T00:00:00+00:00")
+    entry = Manifest(path).get("solar", date(2024, 6, 20))
+    assert entry["last_modified_utc"] == "2024-06-21T00:00:00+00:00"
+
+
+def test_manifest_skips_truncated_line(tmp_path):
+    path = tmp_path / "_manifest.jsonl"
+    path.write_text('{"type": "solar", "date": "2024-06-20"}\n{"type": "sol')
+    manifest = Manifest(str(path))
+    assert manifest.is_extracted("solar", date(2024, 6, 20))
+    manifest.record("wind", date(2024, 6, 20))
+    assert Manifest(str(path)).is_extracted("wind", date(2024, 6, 20))
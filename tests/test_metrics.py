@@ -0,0 +1,72 @@
+import json
+import pickle
+
+from extractors.metrics import RunMetrics, StageMetrics
+from extractors.scheduler import RequestScheduler
+
+
+def test_run_metrics_stages():
+    metrics = RunMetrics()
+    with metrics.stage("write") as call:
+        call.rows = 10
+        call.bytes = 512
+    metrics.record("fetch", StageMetrics(calls=1, seconds=0.5, bytes=100))
+    metrics.record("fetch", StageMetrics(calls=1, seconds=0.25, bytes=50))
+    metrics.record_extractor("solar", 1.5)
+
+    summary = metrics.summary()
+    # stages are listed in pipeline order
+    assert list(summary.stages) == ["fetch", "write"]
+    assert summary.stages["fetch"] == StageMetrics(calls=2, seconds=0.75, bytes=150)
+    assert summary.stages["write"].rows == 10
+    assert summary.stages["write"].seconds >= 0
+    assert summary.extractors == {"solar": 1.5}
+
+
+def test_run_metrics_merge_after_pickling():
+    metrics = RunMetrics()
+    metrics.record("clean", StageMetrics(calls=1, seconds=1.0, rows=5))
+    # collectors of worker processes are sent back pickled
+    worker_metrics = pickle.loads(pickle.dumps(metrics))
+    worker_metrics.record("clean", StageMetrics(calls=1, seconds=1.0, rows=5))
+
+    metrics.merge(worker_metrics)
+    assert metrics.summary().stages["clean"] == StageMetrics(
+        calls=3, seconds=3.0, rows=15
+    )
+
+
+def test_run_summary_requests():
+    scheduler = RequestScheduler()
+    scheduler.record_failure(429)
+    scheduler.record_success(0.2, "http://localhost:8000/2024-06-20/solargen.json")
+    summary = RunMetrics().summary(scheduler.stats)
+    assert summary.requests["requests"] == 2
+    assert summary.requests["throttled"] == 1
+    assert summary.requests["latency_p50"] == 0.2
+    assert summary.url_latencies == {
+        "http://localhost:8000/2024-06-20/solargen.json": 0.2
+    }
+
+
+def test_run_summary_files(tmp_path):
+    metrics = RunMetrics()
+    metrics.record("write", StageMetrics(calls=1, seconds=0.5, rows=3, bytes=512))
+    metrics.record_extractor("wind", 2.0)
+    summary = metrics.summary(RequestScheduler().stats)
+
+    json_path = tmp_path / "metrics" / "run.json"
+    summary.write_json(str(json_path))
+    written = json.loads(json_path.read_text())
+    assert written["stages"]["write"]["bytes"] == 512
+    assert written["extractors"] == {"wind": 2.0}
+
+    prom_path = tmp_path / "weather_etl.prom"
+    summary.write_prometheus(str(prom_path))
+    lines = prom_path.read_text().splitlines()
+    assert "# TYPE weather_etl_run_seconds gauge" in lines
+    assert 'weather_etl_extractor_seconds{extractor="wind"} 2.0' in lines
+    assert 'weather_etl_stage_bytes{stage="write"} 512' in lines
+    assert 'weather_etl_requests{outcome="failures"} 0' in lines
+    # no temporary files are left behind
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics", "weather_etl.prom"]
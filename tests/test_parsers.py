@@ -0,0 +1,47 @@
+import io
+
+import pandas as pd
+import pytest
+
+from extractors.parsers import read_csv_arrow, read_json_arrow
+
+pytest.importorskip("pyarrow")
+
+SCHEMA = {
+    "Naive_Timestamp ": "timestamp",
+    " Variable": "int16",
+    "value": "float64",
+    "Last Modified utc": "timestamp",
+}
+
+
+def test_read_csv_arrow():
+    body = (
+        b"Naive_Timestamp , Variable,value,Last Modified utc\n"
+        b"2024-06-10 00:05:00+00:00,850,40.9958961662297,2024-06-10 00:00:00+00:00\n"
+    )
+    df = read_csv_arrow(body, SCHEMA)
+    assert list(df.columns) == list(SCHEMA)
+    assert df[" Variable"].dtype == "int16"
+    assert df["Naive_Timestamp "][0] == pd.Timestamp("2024-06-10 00:05", tz="UTC")
+    # file objects are read too
+    assert read_csv_arrow(io.BytesIO(body), SCHEMA).equals(df)
+
+
+def test_read_json_arrow():
+    body = (
+        b'[{"Naive_Timestamp ":1717977900000," Variable":991,'
+        b'"value":31.4485644825,"Last Modified utc":1717977600000}]'
+    )
+    df = read_json_arrow(body, SCHEMA)
+    assert df[" Variable"].dtype == "int16"
+    assert df["value"][0] == 31.4485644825
+    assert df["Naive_Timestamp "][0] == pd.Timestamp("2024-06-10 00:05", tz="UTC")
+    assert isinstance(df["Last Modified utc"].dtype, pd.DatetimeTZDtype)
+
+
+def test_read_json_arrow_invalid():
+    with pytest.raises(ValueError):
+        read_json_arrow(b'[{"value": 1.0}]', SCHEMA)
+    with pytest.raises(ValueError):
+        read_json_arrow(b'[{"value": 1.0', SCHEMA)
@@ -0,0 +1,76 @@
+import pstats
+import time
+from datetime import date
+
+import pytest
+
+from extractors import profiling
+from extractors.core import DateInterval
+from extractors.options import ExtractionOptions
+from extractors.profiling import StageProfiler, profile_stage
+from extractors.weather import run_weather_extractors
+from tests.test_weather import _day_api_handler, _patch_http_client
+
+
+def _busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_profile_stage_is_noop_when_inactive():
+    assert profiling._active is None
+    with profile_stage("parse"):
+        pass
+    assert profiling._active is None
+
+
+def test_stage_profiler_reports(tmp_path):
+    with StageProfiler(str(tmp_path)) as profiler:
+        with profile_stage("fetch"):
+            _busy(0.02)
+            with profile_stage("parse"):
+                data = [bytes(1024) for _ in range(1024)]
+                _busy(0.05)
+        with pytest.raises(RuntimeError):
+            StageProfiler(str(tmp_path)).start()
+    assert profiling._active is None
+    assert data
+
+    (run_dir,) = tmp_path.iterdir()
+    assert {path.name for path in run_dir.iterdir()} == {
+        "fetch.pstats",
+        "fetch.txt",
+        "parse.pstats",
+        "parse.txt",
+        "stacks.collapsed",
+        "memory.txt",
+    }
+    # the nested stage is attributed to parse only
+    parse = pstats.Stats(str(run_dir / "parse.pstats")).stats
+    fetch = pstats.Stats(str(run_dir / "fetch.pstats")).stats
+    assert any(name == "<listcomp>" for _, _, name in parse)
+    assert not any(name == "<listcomp>" for _, _, name in fetch)
+    # collapsed stacks are rooted at the stage and end with a sample count
+    stacks = (run_dir / "stacks.collapsed").read_text().splitlines()
+    assert stacks and all(line.split(";")[0] in ("fetch", "parse") for line in stacks)
+    assert any("test_profiling.py:_busy" in line for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+    memory = (run_dir / "memory.txt").read_text()
+    assert "parse: 1 calls, peak 1." in memory
+    assert profiler.samples
+
+
+def test_run_weather_extractors_profile(tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path / "output"))
+    options = ExtractionOptions(profile_dir=str(tmp_path / "profile"))
+    timespan = DateInterval(date(2024, 6, 19), date(2024, 6, 20))
+    with _patch_http_client(_day_api_handler):
+        run_weather_extractors(timespan, "apikey", options)
+
+    (run_dir,) = (tmp_path / "profile").iterdir()
+    names = {path.name for path in run_dir.iterdir()}
+    for stage in ("fetch", "parse", "clean", "write"):
+        assert f"{stage}.pstats" in names
+    assert "write_to_file" in (run_dir / "write.txt").read_text()
+    assert profiling._active is None
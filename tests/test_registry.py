@@ -0,0 +1,100 @@
+from datetime import date
+
+import httpx
+import pandas as pd
+import pytest
+
+from extractors.core import DateInterval
+from extractors.manifest import Manifest
+from extractors.options import ExtractionOptions, WeatherExtractionType
+from extractors.registry import (
+    ExtractorSpec,
+    get_extractor,
+    get_extractors,
+    register_extractor,
+    unregister_extractor,
+)
+from extractors.weather import get_data_url, run_weather_extractors
+from tests.test_weather import _day_api_handler, _patch_http_client
+
+# a type with its own endpoint and column names
+SENSOR = ExtractorSpec(
+    name="sensor",
+    path="{date}/sensors/readings.csv",
+    schema={"ts": "timestamp", "id": "int32", "reading": "float32", "at": "timestamp"},
+    column_mapping={
+        "ts": "timestamp",
+        "id": "variable",
+        "reading": "value",
+        "at": "last_modified_utc",
+    },
+)
+
+
+@pytest.fixture
+def sensor():
+    register_extractor(SENSOR)
+    yield SENSOR
+    unregister_extractor(SENSOR.name)
+
+
+def _sensor_handler(request: httpx.Request) -> httpx.Response:
+    if "/sensors/" not in request.url.path:
+        return _day_api_handler(request)
+    day = request.url.path.split("/")[1]
+    df = pd.DataFrame(
+        {
+            "ts": [f"{day} 00:00:00+00:00", f"{day} 12:00:00+00:00"],
+            "id": [7, 7],
+            "reading": [1.5, 2.5],
+            "at": f"{day} 00:00:00+00:00",
+        }
+    )
+    return httpx.Response(200, text=df.to_csv(index=False))
+
+
+def test_builtin_extractors():
+    assert [spec.name for spec in get_extractors()][:2] == ["solar", "wind"]
+    solar = get_extractor(WeatherExtractionType.SOLAR)
+    assert solar is get_extractor("solar")
+    assert (solar.wire_format, solar.value) == ("json", "solar")
+    assert get_extractor(solar) is solar
+    with pytest.raises(NotImplementedError):
+        get_extractor("unknown")
+
+
+def test_extractor_spec_validation():
+    with pytest.raises(ValueError):
+        ExtractorSpec(name="a", path="renewables/windgen.csv")
+    with pytest.raises(ValueError):
+        ExtractorSpec(name="a", path="{date}/a.xml", wire_format="xml")
+    with pytest.raises(ValueError):
+        ExtractorSpec(name="a", path="{date}/a.csv", column_mapping={"x": "value"})
+
+
+def test_register_extractor(sensor):
+    with pytest.raises(ValueError):
+        register_extractor(sensor)
+    assert register_extractor(sensor, replace=True) is sensor
+    url = get_data_url("sensor", "2024-06-20", "apikey")
+    assert url.endswith("/2024-06-20/sensors/readings.csv?api_key=apikey")
+
+
+def test_run_weather_extractors_registered_type(sensor, tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    options = ExtractionOptions(
+        extractors=["wind", "sensor"], manifest_path=str(tmp_path / "m.jsonl")
+    )
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 21))
+    with _patch_http_client(_sensor_handler):
+        summary = run_weather_extractors(timespan, "apikey", options)
+
+    assert set(summary.extractors) == {"wind", "sensor"}
+    day_dir = tmp_path / "sensor" / "year=2024" / "month=06" / "day=20"
+    df = pd.read_parquet(day_dir / "data.parquet")
+    assert list(df.columns) == ["timestamp", "variable", "value", "last_modified_utc"]
+    assert df["value"].tolist() == [1.5, 2.5]
+    assert df["variable"].dtype == "int16"
+    manifest = Manifest(options.manifest_path)
+    assert manifest.missing_dates("sensor", timespan.iter_dates()) == []
+    assert not (tmp_path / "solar").exists()
@@ -0,0 +1,59 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from extractors.options import WeatherExtractionType
+from extractors.rollups import compute_rollup, make_rollup_filepath
+
+
+def _clean_df() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "timestamp": pd.to_datetime(
+                [
+                    "2024-06-20 00:00",
+                    "2024-06-20 00:55",
+                    "2024-06-20 00:00",
+                    "2024-06-20 01:00",
+                ],
+                utc=True,
+            ),
+            "variable": pd.Series([991, 991, 992, 991], dtype="int16"),
+            "value": [1.0, 3.0, 5.0, 7.0],
+            "last_modified_utc": pd.to_datetime(
+                ["2024-06-20", "2024-06-21", "2024-06-20", "2024-06-20"], utc=True
+            ),
+        }
+    )
+
+
+def test_compute_rollup_hourly():
+    df = compute_rollup(_clean_df(), "hourly")
+    assert df["timestamp"].dt.hour.tolist() == [0, 0, 1]
+    assert df["variable"].tolist() == [991, 992, 991]
+    assert df["variable"].dtype == "int16"
+    assert df["mean"].tolist() == [2.0, 5.0, 7.0]
+    assert df["min"].tolist() == [1.0, 5.0, 7.0]
+    assert df["max"].tolist() == [3.0, 5.0, 7.0]
+    assert df["count"].tolist() == [2, 1, 1]
+    assert df["last_modified_utc"][0] == pd.Timestamp("2024-06-21", tz="UTC")
+
+
+def test_compute_rollup_daily():
+    df = compute_rollup(_clean_df(), "daily")
+    assert df["variable"].tolist() == [991, 992]
+    assert df["count"].tolist() == [3, 1]
+    assert str(df["timestamp"].dt.tz) == "UTC"
+
+
+def test_compute_rollup_unsupported():
+    with pytest.raises(ValueError):
+        compute_rollup(_clean_df(), "weekly")
+
+
+def test_make_rollup_filepath():
+    path = make_rollup_filepath(
+        date(2024, 6, 18), WeatherExtractionType.SOLAR, "hourly", "parquet", "out"
+    )
+    assert path == "out/rollups/hourly/solar/year=2024/month=06/day=18/data.parquet"
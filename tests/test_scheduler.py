@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+from extractors.scheduler import RequestScheduler, RequestStats
+
+
+def test_backoff_grows_exponentially_with_jitter():
+    scheduler = RequestScheduler(base_delay_sec=0.1, max_delay_sec=1)
+    with patch("extractors.scheduler.random.uniform", side_effect=lambda a, b: b):
+        delays = [scheduler.backoff(attempt) for attempt in range(6)]
+    assert delays == [0.1, 0.2, 0.4, 0.8, 1, 1]
+    assert scheduler.stats.retries == 6
+
+
+def test_rate_adapts_to_throttling():
+    scheduler = RequestScheduler(rate=10, max_rate=20, min_rate=1)
+    for _ in range(20):
+        scheduler.record_success(0.01)
+    assert scheduler.rate == 20
+
+    # sustained throttling cuts the rate
+    for _ in range(10):
+        scheduler.record_failure(429)
+    assert scheduler.rate < 20
+    assert scheduler.stats.throttled == 10
+
+
+def test_occasional_throttling_keeps_rate():
+    scheduler = RequestScheduler(rate=10, max_rate=20)
+    for i in range(100):
+        if i % 5 == 0:
+            scheduler.record_failure(429)
+        else:
+            scheduler.record_success(0.01)
+    assert scheduler.rate == 20
+
+
+def test_acquire_waits_when_bucket_empty():
+    scheduler = RequestScheduler(rate=2)
+    with patch("extractors.scheduler.time.sleep") as mock_sleep:
+        for _ in range(3):
+            scheduler.acquire()
+    assert mock_sleep.call_count == 1
+
+
+def test_is_retryable():
+    assert RequestScheduler.is_retryable(429)
+    assert RequestScheduler.is_retryable(503)
+    assert RequestScheduler.is_retryable(None)
+    assert not RequestScheduler.is_retryable(403)
+    assert not RequestScheduler.is_retryable(404)
+
+
+def test_latency_percentile():
+    stats = RequestStats(latencies=[0.1, 0.2, 0.3, 0.4, 0.5])
+    assert stats.latency_percentile(50) == 0.3
+    assert stats.latency_percentile(100) == 0.5
+    assert RequestStats().latency_percentile(99) == 0.0
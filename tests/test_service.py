@@ -0,0 +1,112 @@
+import json
+import os
+import signal
+import threading
+import urllib.error
+import urllib.request
+from datetime import date
+
+import httpx
+import pytest
+
+from extractors.manifest import Manifest
+from extractors.options import ExtractionOptions
+from extractors.service import ExtractionService
+from tests.test_weather import _day_api_handler, _patch_http_client
+
+
+@pytest.fixture
+def options(tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    return ExtractionOptions(manifest_path=str(tmp_path / "_manifest.jsonl"))
+
+
+def _get(service: ExtractionService, path: str):
+    url = f"http://127.0.0.1:{service.port}{path}"
+    try:
+        with urllib.request.urlopen(url) as response:
+            return response.status, response.read().decode()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read().decode()
+
+
+def test_service_polls_new_days_only(options):
+    requests = []
+
+    def handler(request):
+        requests.append(request.url.path)
+        return _day_api_handler(request)
+
+    service = ExtractionService("apikey", options, lookback_days=3, port=None)
+    with _patch_http_client(handler):
+        service.start()
+        client = service._client
+        service.poll(date(2024, 6, 20))
+        assert len(requests) == 2 * 3
+        # the next day costs one request per type, over the same client
+        summary = service.poll(date(2024, 6, 21))
+        service.close()
+
+    assert len(requests) == 2 * 4
+    assert summary.stages["write"].calls == 2
+    assert client.is_closed
+    manifest = Manifest(options.manifest_path)
+    assert manifest.missing_dates("wind", [date(2024, 6, 21)]) == []
+    assert (service.status.runs, service.status.failures) == (2, 0)
+
+
+def test_service_health_endpoint(options):
+    service = ExtractionService("apikey", options, port=0)
+    failing = [True]
+
+    def handler(request):
+        if failing[0]:
+            return httpx.Response(403)
+        return _day_api_handler(request)
+
+    with _patch_http_client(handler):
+        service.start()
+        try:
+            assert service.poll(date(2024, 6, 20)) is None
+            code, body = _get(service, "/healthz")
+            assert code == 503
+            assert json.loads(body)["last_error"].startswith("AuthorizationError")
+
+            failing[0] = False
+            service.poll(date(2024, 6, 20))
+            code, body = _get(service, "/healthz")
+            assert (code, json.loads(body)["status"]) == (200, "ok")
+            code, body = _get(service, "/metrics")
+            assert "weather_etl_service_failures 1" in body
+            assert 'weather_etl_stage_calls{stage="write"} 14' in body
+            assert _get(service, "/other")[0] == 404
+        finally:
+            service.close()
+
+
+def test_service_stops_after_poll_on_sigterm(options):
+    service = ExtractionService("apikey", options, poll_interval_sec=3600, port=None)
+    polls = []
+
+    def poll(today=None):
+        polls.append(today)
+        # delivered while the poll is in progress, which is finished
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    service.poll = poll
+    previous = signal.getsignal(signal.SIGTERM)
+    try:
+        with _patch_http_client(_day_api_handler):
+            thread = threading.Timer(5, service.stop)
+            thread.start()
+            service.serve_forever()
+            thread.cancel()
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+    assert len(polls) == 1
+    assert service._client is None
+
+
+def test_service_requires_manifest():
+    with pytest.raises(ValueError):
+        ExtractionService("apikey", ExtractionOptions())
@@ -1,24 +1,85 @@
-import urllib
-import urllib.error
+import asyncio
+import dataclasses
+import functools
+import gzip
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date
 from unittest.mock import Mock, patch
 
+import httpx
 import pandas as pd
 import pytest
 
-from extractors.core import DateInterval
-from extractors.error import ResourceDownError
+from extractors.cache import RawCache
+from extractors.compaction import compact_output
+from extractors.core import DateInterval, WriterOptions
+from extractors.error import AuthorizationError, ResourceDownError, SchemaError
+from extractors.manifest import Manifest, Watermarks
+from extractors.metrics import RunMetrics
+from extractors.parsers import ReaderEngine, arrow_available
+from extractors.registry import COLUMN_MAPPING
+from extractors.rollups import rollup_dir
+from extractors.scheduler import RequestScheduler
 from extractors.weather import (
+    WEATHER_API_ENDPOINT,
+    ExtractionOptions,
+    FetchMode,
     WeatherExtractionType,
     clean_columns,
     get_data_url,
+    get_pending_dates,
     make_output_filepath,
+    make_request_scheduler,
+    run_extractions_async,
     run_solar_extraction,
     run_weather_extractors,
     run_wind_extraction,
+    _fetch_async,
+    _run_extraction,
+    _transform_and_load,
 )
 
 
+@pytest.fixture(autouse=True)
+def mock_http_client():
+    with _patch_http_client(_mock_api_handler):
+        yield
+
+
+def _patch_http_client(handler):
+    """Routes sync requests of the extractors to `handler`."""
+    client_cls = httpx.Client
+    return patch(
+        "extractors.weather.make_http_client",
+        lambda *args, **kwargs: client_cls(transport=httpx.MockTransport(handler)),
+    )
+
+
+def _patch_async_client(handler):
+    """Routes async requests of the extractors to `handler`."""
+    client_cls = httpx.AsyncClient
+    return patch(
+        "extractors.weather.httpx.AsyncClient",
+        lambda **kwargs: client_cls(transport=httpx.MockTransport(handler)),
+    )
+
+
+def _day_api_handler(request: httpx.Request) -> httpx.Response:
+    # one row at midnight of the requested day, e.g. /2024-06-20/renewables/...
+    day = request.url.path.split("/")[1]
+    row = {
+        "Naive_Timestamp ": f"{day} 00:00:00+00:00",
+        " Variable": 991,
+        "value": 31.4485644825,
+        "Last Modified utc": f"{day} 00:00:00+00:00",
+    }
+    if request.url.path.endswith(".json"):
+        return httpx.Response(200, json=[row])
+    return httpx.Response(200, text=pd.DataFrame([row]).to_csv(index=False))
+
+
 def test_clean_columns():
     data = {
         "Naive_Timestamp ": [1717977600000],
@@ -31,13 +92,52 @@ def test_clean_columns():
     assert 4 == len(df.columns)
     assert "Naive_Timestamp " not in df.columns
     assert "last_modified_utc" in df.columns
+    assert df["variable"].dtype == "int16"
+    assert df["value"].dtype == "float64"
+
+
+def test_clean_columns_parsed_timestamps():
+    data = {
+        "Naive_Timestamp ": pd.to_datetime(["2024-06-20 00:05:00"]),
+        " Variable": pd.Series([991], dtype="int16"),
+        "value": [31.4485644825],
+        "Last Modified utc": pd.to_datetime(["2024-06-20 00:00:00+00:00"]),
+    }
+    df = clean_columns(pd.DataFrame(data), compact_values=True)
+    assert str(df["timestamp"].dt.tz) == "UTC"
+    assert df["timestamp"][0] == pd.Timestamp("2024-06-20 00:05:00", tz="UTC")
+    assert df["value"].dtype == "float32"
+
+
+def test_clean_columns_invalid():
+    data = {
+        "Naive_Timestamp ": [1717977600000],
+        " Variable": [991],
+        "value": [31.4485644825],
+    }
+    with pytest.raises(SchemaError):
+        clean_columns(pd.DataFrame(data))
+
+    data["Last Modified utc"] = [1717977600000]
+    data[" Variable"] = [99999]
+    with pytest.raises(SchemaError):
+        clean_columns(pd.DataFrame(data))
+
+    data[" Variable"] = ["not a number"]
+    with pytest.raises(SchemaError):
+        clean_columns(pd.DataFrame(data))
 
 
 def test_make_output_filepath():
-    timespan = DateInterval(from_date=date(2024, 6, 10), to_date=date(2024, 6, 12))
-    path = make_output_filepath(timespan, WeatherExtractionType.SOLAR, "parquet")
+    path = make_output_filepath(
+        date(2024, 6, 10), WeatherExtractionType.SOLAR, "parquet"
+    )
     assert path.startswith("./output/solar/year=2024/month=06/day=10")
     assert path.endswith("parquet")
+    # paths are deterministic so that reruns replace the file
+    assert path == make_output_filepath(
+        date(2024, 6, 10), WeatherExtractionType.SOLAR, "parquet"
+    )
 
 
 def test_get_data_url():
@@ -80,17 +180,16 @@ def test_run_wind_extraction(mock_read_csv):
 
 
 @patch("extractors.weather.time.sleep")
-@patch("extractors.weather.pd.read_csv")
-def test_run_wind_extraction_api_failure(mock_read_csv: Mock, mock_sleep: Mock):
+def test_run_wind_extraction_api_failure(mock_sleep: Mock):
     timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
-    # simulate an HTTPError
-    mock_read_csv.side_effect = urllib.error.HTTPError(
-        "url", 429, "api is dead", Mock(), Mock()
-    )
-    with pytest.raises(ResourceDownError):
-        run_wind_extraction(timespan, "apikey")
+    # simulate an api throttling every request
+    with _patch_http_client(lambda request: httpx.Response(429)):
+        with pytest.raises(ResourceDownError):
+            run_wind_extraction(timespan, "apikey")
+        # the error reports the retry limit of the scheduler
+        with pytest.raises(ResourceDownError, match="after 2 tries"):
+            run_wind_extraction(timespan, "apikey", RequestScheduler(max_retries=2))
 
-    assert mock_read_csv.called
     # check that we did retries
     assert mock_sleep.called
 
@@ -101,10 +200,10 @@ def test_run_wind_extraction_api_failure(mock_read_csv: Mock, mock_sleep: Mock):
 def test_run_weather_extractors(mock_read_json, mock_read_csv, mock_write_to_file):
     timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
     data = {
-        "Naive_Timestamp ": [1717977600000],
+        "Naive_Timestamp ": ["2024-06-20 00:00:00+00:00"],
         " Variable": [991],
         "value": [31.4485644825],
-        "Last Modified utc": [1717977600000],
+        "Last Modified utc": ["2024-06-20 00:00:00+00:00"],
     }
     expected_df = pd.DataFrame(data)
     mock_read_json.return_value = expected_df
@@ -114,3 +213,679 @@ def test_run_weather_extractors(mock_read_json, mock_read_csv, mock_write_to_fil
     assert mock_read_csv.called
     assert mock_write_to_file.called
     assert mock_write_to_file.call_count == 2
+
+
+def _mock_api_handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith(".json"):
+        return httpx.Response(
+            200,
+            json=[
+                {
+                    "Naive_Timestamp ": 1717977600000,
+                    " Variable": 991,
+                    "value": 31.4485644825,
+                    "Last Modified utc": 1717977600000,
+                }
+            ],
+        )
+    return httpx.Response(
+        200,
+        text="Naive_Timestamp , Variable,value,Last Modified utc\n"
+        "2024-06-10 00:00:00+00:00,850,40.9958961662297,2024-06-10 00:00:00+00:00\n",
+    )
+
+
+def test_run_extractions_async():
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 22))
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_mock_api_handler))
+    results = asyncio.run(
+        run_extractions_async(
+            [WeatherExtractionType.SOLAR, WeatherExtractionType.WIND],
+            timespan,
+            "apikey",
+            client=client,
+        )
+    )
+    assert set(results) == {WeatherExtractionType.SOLAR, WeatherExtractionType.WIND}
+    assert len(results[WeatherExtractionType.SOLAR]) == 3
+    assert len(results[WeatherExtractionType.WIND]) == 3
+    assert results[WeatherExtractionType.WIND][" Variable"].tolist() == [850] * 3
+
+
+def test_fetch_async_metrics():
+    pending = {WeatherExtractionType.SOLAR: [date(2024, 6, 20), date(2024, 6, 21)]}
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_mock_api_handler))
+    scheduler = make_request_scheduler()
+    metrics = RunMetrics()
+    asyncio.run(
+        _fetch_async(
+            pending, "apikey", client=client, scheduler=scheduler, metrics=metrics
+        )
+    )
+    summary = metrics.summary(scheduler.stats)
+    assert summary.stages["fetch"].calls == 2
+    assert summary.stages["fetch"].bytes > 0
+    assert summary.stages["parse"].rows == 2
+    # urls are recorded without the api key
+    assert sorted(summary.url_latencies) == [
+        f"{WEATHER_API_ENDPOINT}/2024-06-20/renewables/solargen.json",
+        f"{WEATHER_API_ENDPOINT}/2024-06-21/renewables/solargen.json",
+    ]
+
+
+@patch("extractors.weather.asyncio.sleep")
+def test_run_extractions_async_api_failure(mock_sleep: Mock):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    transport = httpx.MockTransport(lambda request: httpx.Response(429))
+    client = httpx.AsyncClient(transport=transport)
+    scheduler = RequestScheduler(max_retries=2)
+    with pytest.raises(ResourceDownError, match="after 2 tries"):
+        asyncio.run(
+            run_extractions_async(
+                [WeatherExtractionType.WIND],
+                timespan,
+                "apikey",
+                client=client,
+                scheduler=scheduler,
+            )
+        )
+    assert mock_sleep.called
+
+
+@patch("extractors.weather.write_to_file")
+@patch("extractors.weather._fetch_async")
+def test_run_weather_extractors_async(mock_fetch_async, mock_write_to_file):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    data = {
+        "Naive_Timestamp ": ["2024-06-20 00:00:00+00:00"],
+        " Variable": [991],
+        "value": [31.4485644825],
+        "Last Modified utc": ["2024-06-20 00:00:00+00:00"],
+    }
+
+    async def fetch(pending, *args, **kwargs):
+        return {t: pd.DataFrame(data) for t in pending}
+
+    mock_fetch_async.side_effect = fetch
+    options = ExtractionOptions(fetch_mode=FetchMode.ASYNC)
+    run_weather_extractors(timespan, "apikey", options)
+    assert mock_fetch_async.call_count == 1
+    assert mock_write_to_file.call_count == 2
+
+
+@patch("extractors.weather.write_to_file")
+@patch("extractors.weather.pd.read_csv")
+@patch("extractors.weather.pd.read_json")
+def test_run_weather_extractors_sequential(
+    mock_read_json, mock_read_csv, mock_write_to_file
+):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    data = {
+        "Naive_Timestamp ": ["2024-06-20 00:00:00+00:00"],
+        " Variable": [991],
+        "value": [31.4485644825],
+        "Last Modified utc": ["2024-06-20 00:00:00+00:00"],
+    }
+    mock_read_json.return_value = pd.DataFrame(data)
+    mock_read_csv.return_value = pd.DataFrame(data)
+    mock_write_to_file.return_value = 1024
+    summary = run_weather_extractors(
+        timespan, "apikey", ExtractionOptions(parallel=False)
+    )
+    assert set(summary.extractors) == {"solar", "wind"}
+    assert all(elapsed >= 0 for elapsed in summary.extractors.values())
+    assert summary.stages["fetch"].calls == 2
+    assert summary.stages["clean"].rows == 2
+    assert summary.stages["write"].rows == 2
+    assert summary.stages["write"].bytes == 2048
+    assert summary.requests["successes"] == 2
+    assert mock_write_to_file.call_count == 2
+
+
+@patch("extractors.weather.write_to_file")
+@patch("extractors.weather.pd.read_csv")
+@patch("extractors.weather.pd.read_json")
+def test_run_weather_extractors_failure_propagates(
+    mock_read_json, mock_read_csv, mock_write_to_file
+):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    data = {
+        "Naive_Timestamp ": ["2024-06-20 00:00:00+00:00"],
+        " Variable": [991],
+        "value": [31.4485644825],
+        "Last Modified utc": ["2024-06-20 00:00:00+00:00"],
+    }
+    mock_read_json.return_value = pd.DataFrame(data)
+    mock_read_csv.side_effect = ResourceDownError("down")
+    with pytest.raises(ResourceDownError):
+        run_weather_extractors(timespan, "apikey")
+    # the solar pipeline still completes
+    assert mock_write_to_file.call_count == 1
+
+
+@patch("extractors.weather.time.sleep")
+def test_run_wind_extraction_forbidden(mock_sleep: Mock):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    requests = []
+
+    def forbidden(request):
+        requests.append(request)
+        return httpx.Response(403)
+
+    scheduler = RequestScheduler()
+    with _patch_http_client(forbidden), pytest.raises(AuthorizationError):
+        run_wind_extraction(timespan, "apikey", scheduler)
+    # no retries on forbidden
+    assert len(requests) == 1
+    assert not mock_sleep.called
+    assert scheduler.stats.failures == 1
+
+
+@patch("extractors.weather.time.sleep")
+def test_run_wind_extraction_retry_stats(mock_sleep: Mock):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    statuses = iter([429, 200])
+
+    def throttle_once(request):
+        if next(statuses) == 429:
+            return httpx.Response(429)
+        return _mock_api_handler(request)
+
+    scheduler = RequestScheduler()
+    with _patch_http_client(throttle_once):
+        run_wind_extraction(timespan, "apikey", scheduler)
+    assert scheduler.stats.requests == 2
+    assert scheduler.stats.throttled == 1
+    assert scheduler.stats.retries == 1
+    assert mock_sleep.call_count == 1
+
+
+@patch("extractors.weather.write_to_file")
+def test_run_weather_extractors_incremental(mock_write_to_file, tmp_path):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return _day_api_handler(request)
+
+    def count(suffix):
+        return sum(path.endswith(suffix) for path in paths)
+
+    options = ExtractionOptions(manifest_path=str(tmp_path / "_manifest.jsonl"))
+
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 21))
+    with _patch_http_client(handler):
+        run_weather_extractors(timespan, "apikey", options)
+    assert count(".json") == 2
+    manifest = Manifest(options.manifest_path)
+    entry = manifest.get("solar", date(2024, 6, 20))
+    assert entry["last_modified_utc"] == "2024-06-20T00:00:00+00:00"
+
+    # only the new day is fetched on the next run
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 22))
+    with _patch_http_client(handler):
+        run_weather_extractors(timespan, "apikey", options)
+        # nothing left to fetch
+        assert run_weather_extractors(timespan, "apikey", options).extractors == {}
+    assert count(".json") == 3
+    assert count(".csv") == 3
+
+    # one file per type and day
+    assert mock_write_to_file.call_count == 6
+
+
+def test_get_pending_dates(tmp_path):
+    manifest = Manifest(str(tmp_path / "_manifest.jsonl"))
+    manifest.record("solar", date(2024, 6, 20))
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 21))
+    pending = get_pending_dates(
+        [WeatherExtractionType.SOLAR, WeatherExtractionType.WIND], timespan, manifest
+    )
+    assert pending[WeatherExtractionType.SOLAR] == [date(2024, 6, 21)]
+    assert len(pending[WeatherExtractionType.WIND]) == 2
+
+
+@patch("extractors.weather.pd.read_csv")
+@patch("extractors.weather.pd.read_json")
+def test_run_weather_extractors_day_partitions(
+    mock_read_json, mock_read_csv, tmp_path, monkeypatch
+):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    data = {
+        "Naive_Timestamp ": [
+            "2024-06-20 00:00:00+00:00",
+            "2024-06-20 23:55:00+00:00",
+            "2024-06-21 00:00:00+00:00",
+        ],
+        " Variable": [991, 992, 993],
+        "value": [31.4485644825, 1.0, 2.0],
+        "Last Modified utc": ["2024-06-20 00:00:00+00:00"] * 3,
+    }
+    mock_read_json.return_value = pd.DataFrame(data)
+    mock_read_csv.return_value = pd.DataFrame(data)
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    run_weather_extractors(timespan, "apikey")
+    # rerun replaces the day's file instead of adding one
+    run_weather_extractors(timespan, "apikey")
+
+    day_dir = tmp_path / "wind" / "year=2024" / "month=06" / "day=20"
+    assert [p.name for p in day_dir.iterdir()] == ["data.parquet"]
+    df = pd.read_parquet(day_dir / "data.parquet")
+    assert len(df) == 2
+    # the next day's midnight belongs to the next day's extraction
+    assert not (tmp_path / "wind" / "year=2024" / "month=06" / "day=21").exists()
+
+
+def _overlapping_day_handler(request: httpx.Request) -> httpx.Response:
+    # rows of the requested day then midnight of the next day, with variables
+    # and modification times of the requested day, like the api
+    day = pd.Timestamp(request.url.path.split("/")[1], tz="UTC")
+    times = [day, day + pd.Timedelta(hours=12), day + pd.Timedelta(days=1)]
+    rows = pd.DataFrame(
+        {
+            "Naive_Timestamp ": [str(t) for t in times],
+            " Variable": day.day,
+            "value": [1.0, 2.0, 3.0],
+            "Last Modified utc": str(day),
+        }
+    )
+    return httpx.Response(200, text=rows.to_csv(index=False))
+
+
+@pytest.mark.parametrize("fetch_mode", list(FetchMode))
+def test_day_output_does_not_depend_on_batch(tmp_path, monkeypatch, fetch_mode):
+    dates = [date(2024, 6, 10), date(2024, 6, 11), date(2024, 6, 12)]
+    options = ExtractionOptions(extractors=["wind"], fetch_mode=fetch_mode)
+
+    def extract(output_dir, timespan):
+        monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(output_dir))
+        with _patch_http_client(_overlapping_day_handler), _patch_async_client(
+            _overlapping_day_handler
+        ):
+            run_weather_extractors(timespan, "apikey", options)
+
+    extract(tmp_path / "batch", DateInterval(dates[0], dates[-1]))
+    for day in dates:
+        extract(tmp_path / "single", DateInterval(day, day))
+
+    for day in dates:
+        relative = f"wind/year=2024/month=06/day={day.day}/data.parquet"
+        batch = pd.read_parquet(tmp_path / "batch" / relative)
+        single = pd.read_parquet(tmp_path / "single" / relative)
+        pd.testing.assert_frame_equal(batch, single)
+        assert len(batch) == 2
+        assert batch["variable"].tolist() == [day.day] * 2
+
+
+@patch("extractors.weather.write_to_file")
+def test_run_weather_extractors_batches(mock_write_to_file, tmp_path):
+    manifest_path = str(tmp_path / "_manifest.jsonl")
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 24))
+    options = ExtractionOptions(batch_days=2, manifest_path=manifest_path)
+    with _patch_http_client(_day_api_handler), patch(
+        "extractors.weather._transform_and_load",
+        wraps=_transform_and_load,
+    ) as mock_transform:
+        run_weather_extractors(timespan, "apikey", options)
+
+    # 3 batches per type: 2 + 2 + 1 days
+    batch_sizes = sorted(len(c.args[1]) for c in mock_transform.call_args_list)
+    assert batch_sizes == [1, 1, 2, 2, 2, 2]
+    assert mock_write_to_file.call_count == 10
+    assert Manifest(manifest_path).missing_dates("wind", timespan.iter_dates()) == []
+
+
+@patch("extractors.weather.write_to_file")
+def test_days_without_data_are_not_recorded(mock_write_to_file, tmp_path):
+    manifest_path = str(tmp_path / "_manifest.jsonl")
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 21))
+    options = ExtractionOptions(extractors=["wind"], manifest_path=manifest_path)
+    header = ",".join(COLUMN_MAPPING) + "\n"
+
+    def handler(request):
+        # the last day is not published yet
+        if request.url.path.startswith("/2024-06-21"):
+            return httpx.Response(200, text=header)
+        return _day_api_handler(request)
+
+    with _patch_http_client(handler):
+        run_weather_extractors(timespan, "apikey", options)
+    assert mock_write_to_file.call_count == 1
+    manifest = Manifest(manifest_path)
+    assert manifest.missing_dates("wind", timespan.iter_dates()) == [date(2024, 6, 21)]
+
+    # published since, extracted by the next run
+    with _patch_http_client(_day_api_handler):
+        run_weather_extractors(timespan, "apikey", options)
+    assert mock_write_to_file.call_count == 2
+    assert Manifest(manifest_path).missing_dates("wind", timespan.iter_dates()) == []
+
+
+@pytest.mark.skipif(not arrow_available(), reason="pyarrow not installed")
+@patch("extractors.weather.write_to_file")
+def test_run_weather_extractors_arrow_readers(mock_write_to_file):
+    timespan = DateInterval(date(2024, 6, 10), date(2024, 6, 10))
+    options = ExtractionOptions(
+        fetch_mode=FetchMode.ASYNC, reader_engine=ReaderEngine.ARROW
+    )
+    transport = httpx.MockTransport(_mock_api_handler)
+    client_cls = httpx.AsyncClient
+    with patch(
+        "extractors.weather.httpx.AsyncClient",
+        lambda **kwargs: client_cls(transport=transport),
+    ):
+        run_weather_extractors(timespan, "apikey", options)
+
+    assert mock_write_to_file.call_count == 2
+    for call in mock_write_to_file.call_args_list:
+        df = call.args[1]
+        assert df["variable"].dtype == "int16"
+        assert str(df["timestamp"].dt.tz) == "UTC"
+
+
+@patch("extractors.weather.arrow_available", return_value=False)
+@patch("extractors.weather.write_to_file")
+@patch("extractors.weather.pd.read_csv")
+@patch("extractors.weather.pd.read_json")
+def test_run_weather_extractors_arrow_fallback(
+    mock_read_json, mock_read_csv, mock_write_to_file, mock_arrow_available
+):
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    data = {
+        "Naive_Timestamp ": ["2024-06-20 00:00:00+00:00"],
+        " Variable": [991],
+        "value": [31.4485644825],
+        "Last Modified utc": ["2024-06-20 00:00:00+00:00"],
+    }
+    mock_read_json.return_value = pd.DataFrame(data)
+    mock_read_csv.return_value = pd.DataFrame(data)
+    options = ExtractionOptions(reader_engine=ReaderEngine.ARROW)
+    run_weather_extractors(timespan, "apikey", options)
+    assert mock_read_json.called
+    assert mock_read_csv.called
+
+
+def test_run_extraction_reuses_compressed_connection():
+    accept_encodings = []
+    bodies = []
+
+    def gzip_handler(request):
+        accept_encodings.append(request.headers["Accept-Encoding"])
+        body = gzip.compress(_mock_api_handler(request).content)
+        bodies.append(body)
+        return httpx.Response(
+            200, stream=httpx.ByteStream(body), headers={"Content-Encoding": "gzip"}
+        )
+
+    clients = []
+    client_cls = httpx.Client
+
+    def make_client(*args, **kwargs):
+        clients.append(client_cls(transport=httpx.MockTransport(gzip_handler)))
+        return clients[-1]
+
+    dates = [date(2024, 6, 20), date(2024, 6, 21), date(2024, 6, 22)]
+    metrics = RunMetrics()
+    with patch("extractors.weather.make_http_client", make_client):
+        df = _run_extraction(
+            WeatherExtractionType.WIND, dates, "apikey", metrics=metrics
+        )
+    assert len(df) == 3
+    # one client (connection pool) for all days, asking for compression
+    assert len(clients) == 1
+    assert all("gzip" in encoding for encoding in accept_encodings)
+    # bytes on the wire are counted
+    assert metrics.summary().stages["fetch"].bytes == sum(map(len, bodies))
+
+
+@patch("extractors.weather.write_to_file", return_value=1024)
+def test_run_weather_extractors_raw_cache(mock_write_to_file, tmp_path):
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return _day_api_handler(request)
+
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 21))
+    options = ExtractionOptions(cache_dir=str(tmp_path))
+    with _patch_http_client(handler):
+        run_weather_extractors(timespan, "apikey", options)
+        summary = run_weather_extractors(timespan, "apikey", options)
+    # the second run reads every day from the cache
+    assert len(paths) == 4
+    assert summary.stages["cache_read"].rows == 4
+    assert "fetch" not in summary.stages
+
+    # refreshes fetch from the api and write through the cache
+    for refresh in ({"full_refresh": True}, {"refresh": True}):
+        paths.clear()
+        refresh_options = dataclasses.replace(options, **refresh)
+        with _patch_http_client(handler):
+            summary = run_weather_extractors(timespan, "apikey", refresh_options)
+        assert len(paths) == 4
+        assert "cache_read" not in summary.stages
+        assert summary.stages["cache_write"].calls == 4
+    paths.clear()
+
+    # offline runs rebuild cached days and skip the others
+    timespan = DateInterval(date(2024, 6, 19), date(2024, 6, 21))
+    options = ExtractionOptions(cache_dir=str(tmp_path), offline=True)
+    with _patch_http_client(handler):
+        summary = run_weather_extractors(timespan, "apikey", options)
+    assert paths == []
+    assert summary.stages["write"].calls == 4
+    written = sorted(c.args[0] for c in mock_write_to_file.call_args_list[-4:])
+    assert "day=19" not in " ".join(written)
+
+    with pytest.raises(ValueError):
+        run_weather_extractors(timespan, "apikey", ExtractionOptions(offline=True))
+
+
+def test_run_extractions_async_raw_cache(tmp_path):
+    cache = RawCache(str(tmp_path))
+    pending = {WeatherExtractionType.WIND: [date(2024, 6, 20)]}
+    with pytest.raises(ResourceDownError):
+        asyncio.run(_fetch_async(pending, "apikey", cache=cache, offline=True))
+
+    metrics = RunMetrics()
+    client = httpx.AsyncClient(transport=httpx.MockTransport(_day_api_handler))
+    asyncio.run(
+        _fetch_async(pending, "apikey", client=client, cache=cache, metrics=metrics)
+    )
+    result = asyncio.run(_fetch_async(pending, "apikey", cache=cache, offline=True))
+    assert metrics.stages["cache_write"].calls == 1
+    assert len(result[WeatherExtractionType.WIND]) == 1
+
+
+@pytest.mark.skipif(not arrow_available(), reason="pyarrow not installed")
+def test_run_weather_extractors_writer_options(tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    writer = WriterOptions(filetype="feather", compression="zstd")
+    options = ExtractionOptions(writer=writer)
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    with _patch_http_client(_day_api_handler):
+        run_weather_extractors(timespan, "apikey", options)
+
+    day_dir = tmp_path / "solar" / "year=2024" / "month=06" / "day=20"
+    assert [p.name for p in day_dir.iterdir()] == ["data.feather"]
+    df = pd.read_feather(day_dir / "data.feather")
+    assert str(df["timestamp"].dt.tz) == "UTC"
+
+
+def test_run_weather_extractors_rollups(tmp_path, monkeypatch):
+    def handler(request):
+        day = request.url.path.split("/")[1]
+        rows = [
+            {
+                "Naive_Timestamp ": f"{day} {time}+00:00",
+                " Variable": 991,
+                "value": value,
+                "Last Modified utc": f"{day} 00:00:00+00:00",
+            }
+            for time, value in (("00:00:00", 1.0), ("00:05:00", 3.0), ("01:00:00", 8.0))
+        ]
+        if request.url.path.endswith(".json"):
+            return httpx.Response(200, json=rows)
+        return httpx.Response(200, text=pd.DataFrame(rows).to_csv(index=False))
+
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    options = ExtractionOptions(rollups=("hourly", "daily"))
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    with _patch_http_client(handler):
+        summary = run_weather_extractors(timespan, "apikey", options)
+
+    day = "wind/year=2024/month=06/day=20/data.parquet"
+    hourly = pd.read_parquet(tmp_path / "rollups" / "hourly" / day)
+    assert hourly["mean"].tolist() == [2.0, 8.0]
+    assert hourly["count"].tolist() == [2, 1]
+    daily = pd.read_parquet(tmp_path / "rollups" / "daily" / day)
+    assert (daily["min"][0], daily["max"][0], daily["count"][0]) == (1.0, 8.0, 3)
+    assert summary.stages["rollup"].rows == 2 * (2 + 1)
+
+
+def test_run_weather_extractors_spawned_processes(tmp_path, monkeypatch):
+    # spawned workers start from a fresh interpreter, the output directory of
+    # the run must be handed to them
+    spawn = multiprocessing.get_context("spawn")
+    monkeypatch.setattr(
+        "extractors.weather.ProcessPoolExecutor",
+        functools.partial(ProcessPoolExecutor, mp_context=spawn),
+    )
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    options = ExtractionOptions(use_processes=True)
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+    with _patch_http_client(_day_api_handler):
+        run_weather_extractors(timespan, "apikey", options)
+
+    for name in ("solar", "wind"):
+        day = tmp_path / name / "year=2024" / "month=06" / "day=20"
+        assert len(list(day.iterdir())) == 1
+
+
+def test_run_weather_extractors_after_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    timespan = DateInterval(date(2024, 6, 19), date(2024, 6, 20))
+    options = ExtractionOptions(rollups=("daily",))
+    with _patch_http_client(_day_api_handler):
+        run_weather_extractors(timespan, "apikey", options)
+        compact_output(str(tmp_path))
+        compact_output(rollup_dir("daily", str(tmp_path)))
+        # the day is extracted again, next to the compacted file of its month
+        day = DateInterval(date(2024, 6, 20), date(2024, 6, 20))
+        options = dataclasses.replace(options, full_refresh=True)
+        run_weather_extractors(day, "apikey", options)
+
+    for directory in (tmp_path / "wind", tmp_path / "rollups" / "daily" / "wind"):
+        df = pd.read_parquet(directory)
+        assert len(df) == 2
+        assert not df.duplicated(["timestamp", "variable"]).any()
+
+
+def _versioned_api_handler(versions: dict, requests: list):
+    """Serves the days of `versions` (date: version) with ETags, and 304 Not
+    Modified responses to requests for their current version."""
+
+    def handler(request):
+        day = request.url.path.split("/")[1]
+        version = versions.get(day, 0)
+        etag = f'"{day}-{version}"'
+        requests.append(request.url.path)
+        if request.headers.get("If-None-Match") == etag:
+            return httpx.Response(304, headers={"ETag": etag})
+        response = _day_api_handler(request)
+        rows = response.json() if request.url.path.endswith(".json") else None
+        last_modified = f"{day} 0{version}:00:00+00:00"
+        if rows is not None:
+            rows[0]["Last Modified utc"] = last_modified
+            return httpx.Response(200, json=rows, headers={"ETag": etag})
+        df = pd.read_csv(io.BytesIO(response.content))
+        df["Last Modified utc"] = last_modified
+        return httpx.Response(200, text=df.to_csv(index=False), headers={"ETag": etag})
+
+    return handler
+
+
+@pytest.mark.parametrize("cached", [False, True])
+@pytest.mark.parametrize("fetch_mode", [FetchMode.SYNC, FetchMode.ASYNC])
+def test_run_weather_extractors_refresh(tmp_path, monkeypatch, fetch_mode, cached):
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    manifest_path = str(tmp_path / "_manifest.jsonl")
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 22))
+    versions, requests = {}, []
+    handler = _versioned_api_handler(versions, requests)
+    options = ExtractionOptions(
+        fetch_mode=fetch_mode,
+        manifest_path=manifest_path,
+        cache_dir=str(tmp_path / "cache") if cached else None,
+    )
+    with _patch_http_client(handler), _patch_async_client(handler):
+        run_weather_extractors(timespan, "apikey", options)
+        entry = Manifest(manifest_path).get("wind", date(2024, 6, 21))
+        assert entry["etag"] == '"2024-06-21-0"'
+
+        # only one day changed since the last run
+        versions["2024-06-21"] = 1
+        refresh = dataclasses.replace(options, refresh=True)
+        summary = run_weather_extractors(timespan, "apikey", refresh)
+
+    assert len(requests) == 2 * 6
+    assert summary.stages["write"].calls == 2
+    assert summary.stages["parse"].calls == 2
+    assert summary.requests["successes"] == 6
+    manifest = Manifest(manifest_path)
+    entry = manifest.get("wind", date(2024, 6, 21))
+    assert entry["etag"] == '"2024-06-21-1"'
+    assert entry["last_modified_utc"] == "2024-06-21T01:00:00+00:00"
+    assert manifest.get("wind", date(2024, 6, 20))["etag"] == '"2024-06-20-0"'
+
+
+def test_conditional_requests_bypass_cache(tmp_path):
+    versions, requests = {}, []
+    handler = _versioned_api_handler(versions, requests)
+    cache = RawCache(str(tmp_path))
+    dates = [date(2024, 6, 20), date(2024, 6, 21)]
+    with _patch_http_client(handler):
+        _run_extraction(WeatherExtractionType.WIND, dates, "apikey", cache=cache)
+        watermarks = Watermarks()
+        for day in dates:
+            key = get_data_url(WeatherExtractionType.WIND, day.isoformat(), "")
+            watermarks.sent[key.split("?")[0]] = f'"{day}-0"'
+        versions["2024-06-21"] = 1
+        df = _run_extraction(
+            WeatherExtractionType.WIND,
+            dates,
+            "apikey",
+            cache=cache,
+            watermarks=watermarks,
+        )
+
+    # cached days with an ETag are checked with the api, not read from the cache
+    assert len(requests) == 4
+    assert len(watermarks.unchanged) == 1
+    assert df["Last Modified utc"].tolist() == ["2024-06-21 01:00:00+00:00"]
+
+
+def test_run_weather_extractors_refresh_watermark(tmp_path, monkeypatch):
+    # an API without ETags: days are parsed, but only rewritten when their
+    # `Last Modified utc` advanced
+    monkeypatch.setattr("extractors.weather.OUTPUT_DIR", str(tmp_path))
+    manifest_path = str(tmp_path / "_manifest.jsonl")
+    timespan = DateInterval(date(2024, 6, 20), date(2024, 6, 21))
+    versions = {}
+    versioned = _versioned_api_handler(versions, [])
+
+    def handler(request):
+        response = versioned(request)
+        return httpx.Response(response.status_code, content=response.content)
+
+    options = ExtractionOptions(manifest_path=manifest_path, refresh=True)
+    with _patch_http_client(handler):
+        run_weather_extractors(timespan, "apikey", options)
+        versions["2024-06-20"] = 2
+        summary = run_weather_extractors(timespan, "apikey", options)
+
+    assert summary.stages["parse"].calls == 4
+    assert summary.stages["write"].calls == 2
+    entry = Manifest(manifest_path).get("solar", date(2024, 6, 20))
+    assert entry["last_modified_utc"] == "2024-06-20T02:00:00+00:00"
+    assert "etag" not in entry